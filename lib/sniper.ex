@@ -21,6 +21,15 @@ defmodule Sniper do
     Sniper.PythonBridge.send_message(message)
   end
 
+  @doc """
+  Send a message to the Python bridge, passing every partial result to `on_partial`.
+
+  See `Sniper.PythonBridge.stream_message/3`.
+  """
+  def stream_message(message, on_partial) do
+    Sniper.PythonBridge.stream_message(message, on_partial)
+  end
+
   @doc """
   Simple health check function.
 
@@ -4,11 +4,21 @@ defmodule Sniper.PythonBridge do
 
   Handles communication between Elixir and Python processes
   using JSON messages over stdin/stdout.
+
+  Messages are framed with a 4 byte length prefix (`{:packet, 4}`) by default, so
+  the port hands over whole responses. Set `config :sniper, bridge_framing: :line`
+  to go back to newline delimited JSON.
   """
 
   use GenServer
   require Logger
 
+  # A streaming request fails after this long without any frame from Python
+  @stream_idle_timeout 120_000
+
+  # :packet (4 byte length prefix) or :line (newline delimited JSON)
+  @default_framing :packet
+
   @doc """
   Starts the Python bridge GenServer.
   """
@@ -23,8 +33,13 @@ defmodule Sniper.PythonBridge do
     pythonbridge_dir = Path.join([project_root, "pythonbridge"])
     python_path = Path.join([pythonbridge_dir, "main.py"])
 
+    framing = Application.get_env(:sniper, :bridge_framing, @default_framing)
+
     case File.exists?(python_path) do
       true ->
+        # Python is told the framing through BRIDGE_FRAMING, the port applies it on our side
+        packet_opts = if framing == :packet, do: [{:packet, 4}], else: []
+
         # Port opens a pipe to external process (stdin/stdout communication)
         port =
           Port.open(
@@ -34,13 +49,23 @@ defmodule Sniper.PythonBridge do
               :exit_status,
               args: [
                 "-c",
-                "PYTHONPATH=#{project_root} uv run --directory #{pythonbridge_dir} python -m pythonbridge.main"
+                "BRIDGE_FRAMING=#{framing} PYTHONPATH=#{project_root} uv run --directory #{pythonbridge_dir} python -m pythonbridge.main"
               ]
-            ]
+            ] ++ packet_opts
           )
 
-        # State: port connection, pending callers by message ID, incomplete data buffer, ID counter
-        {:ok, %{port: port, callers: %{}, buffer: "", id_counter: 0}}
+        # State: port connection, framing, pending callers by message ID,
+        # incomplete line (iodata, line framing only), ID counter
+        state = %{port: port, framing: framing, callers: %{}, buffer: "", id_counter: 0}
+
+        # Python answers "hello" as soon as it starts and imports the review modules
+        # lazily, warmup loads them in the background so the first review does not wait.
+        # It is sent without an _id, its response is only logged.
+        if Application.get_env(:sniper, :bridge_warmup, true) do
+          send_frame(state, %{"type" => "warmup"})
+        end
+
+        {:ok, state}
 
       false ->
         {:stop, "Python bridge file not found: #{python_path}"}
@@ -52,26 +77,53 @@ defmodule Sniper.PythonBridge do
   def handle_call({:send, message}, from, state) do
     message_id = state.id_counter + 1
     message_with_id = Map.put(message, "_id", message_id)
-    json_message = Jason.encode!(message_with_id)
-    Port.command(state.port, json_message <> "\n")
+    send_frame(state, message_with_id)
 
     # {:noreply, ...} means we'll reply later via GenServer.reply/2 when Python responds
     {:noreply,
      %{state | callers: Map.put(state.callers, message_id, from), id_counter: message_id}}
   end
 
-  # Called when data arrives from Python. Buffers partial chunks until complete lines are received.
+  # Streaming request: replies with its id right away, frames are then sent to the caller pid
+  @impl true
+  def handle_call({:stream, message, pid}, _from, state) do
+    message_id = state.id_counter + 1
+    message_with_id = message |> Map.put("stream", true) |> Map.put("_id", message_id)
+    send_frame(state, message_with_id)
+
+    callers = Map.put(state.callers, message_id, {:stream, pid})
+    {:reply, {:ok, message_id}, %{state | callers: callers, id_counter: message_id}}
+  end
+
+  # The caller of a streaming request gave up, drop it so late frames are ignored
+  @impl true
+  def handle_cast({:cancel, message_id}, state) do
+    {:noreply, %{state | callers: Map.delete(state.callers, message_id)}}
+  end
+
+  # Called when data arrives from Python. With {:packet, 4} the port delivers one whole
+  # response per message, nothing to buffer.
+  @impl true
+  def handle_info({_port, {:data, data}}, %{framing: :packet} = state) do
+    {:noreply, process_response(data, state)}
+  end
+
+  # Line framing: buffers partial chunks until complete lines are received.
+  # Only the new chunk is searched for newlines and the incomplete line grows as
+  # iodata, so a large response arriving in many chunks is not copied every time.
+  # Python answers requests concurrently, so a chunk can end in the middle of the next
+  # response line; that trailing piece is kept as the remaining buffer.
   @impl true
   def handle_info({_port, {:data, data}}, state) do
-    new_buffer = state.buffer <> data
+    case :binary.split(data, "\n", [:global]) do
+      [_incomplete] ->
+        {:noreply, %{state | buffer: [state.buffer, data]}}
 
-    case split_lines(new_buffer) do
-      {lines, remaining} ->
+      [first | rest] ->
+        {complete, [remaining]} = Enum.split(rest, -1)
+        lines = [IO.iodata_to_binary([state.buffer, first]) | complete]
         state = Enum.reduce(lines, state, &process_response/2)
         {:noreply, %{state | buffer: remaining}}
-
-      :incomplete ->
-        {:noreply, %{state | buffer: new_buffer}}
     end
   end
 
@@ -107,14 +159,63 @@ defmodule Sniper.PythonBridge do
     end
   end
 
-  # Splits buffered data into complete lines. Returns :incomplete if no newline found.
-  defp split_lines(data) do
-    case String.split(data, "\n") do
-      lines when length(lines) == 1 -> :incomplete
-      lines -> {Enum.filter(lines, &(&1 != "")), ""}
+  @doc """
+  Send a message to the Python bridge and stream its partial results.
+
+  Python sends `{"status": "partial"}` frames while it works (the review text as it
+  is generated) before the final response. Each partial `response` is passed to
+  `on_partial`. Instead of a hard deadline the request only times out when no frame
+  arrives for `idle_timeout` ms, so long reviews that keep producing output finish.
+
+  ## Parameters
+  - message: Map containing the message to send
+  - on_partial: Function called with the `response` of every partial frame
+  - idle_timeout: Max ms between two frames (default 120s)
+
+  ## Returns
+  - The final response map, or {:error, reason}
+
+  ## Examples
+      Sniper.PythonBridge.stream_message(%{type: "main", payload: pr}, &IO.inspect/1)
+  """
+  def stream_message(message, on_partial, idle_timeout \\ @stream_idle_timeout) do
+    try do
+      {:ok, message_id} = GenServer.call(__MODULE__, {:stream, message, self()})
+      await_stream(message_id, on_partial, idle_timeout)
+    catch
+      :exit, {:noproc, _} ->
+        {:error, "Python bridge not running"}
+
+      :exit, {:timeout, _} ->
+        {:error, "Python bridge timeout"}
     end
   end
 
+  # Every partial frame restarts the idle timeout
+  defp await_stream(message_id, on_partial, idle_timeout) do
+    receive do
+      {:python_bridge_partial, ^message_id, partial} ->
+        on_partial.(partial)
+        await_stream(message_id, on_partial, idle_timeout)
+
+      {:python_bridge_response, ^message_id, response} ->
+        response
+    after
+      idle_timeout ->
+        GenServer.cast(__MODULE__, {:cancel, message_id})
+        {:error, "Python bridge timeout"}
+    end
+  end
+
+  # Writes one message to Python, the port adds the length prefix in packet framing
+  defp send_frame(%{framing: :packet} = state, message) do
+    Port.command(state.port, Jason.encode_to_iodata!(message))
+  end
+
+  defp send_frame(state, message) do
+    Port.command(state.port, [Jason.encode_to_iodata!(message), "\n"])
+  end
+
   # Pattern match: skip empty lines
   defp process_response(line, state) when line == "", do: state
 
@@ -128,9 +229,29 @@ defmodule Sniper.PythonBridge do
             state
 
           id ->
+            partial? = response["status"] == "partial"
+
             case Map.get(state.callers, id) do
               nil ->
-                Logger.warning("Received response for unknown request id: #{id}")
+                # (partials of a cancelled stream keep coming until Python finishes)
+                unless partial? do
+                  Logger.warning("Received response for unknown request id: #{id}")
+                end
+
+                state
+
+              {:stream, pid} ->
+                # Streaming caller: forward every frame, only the final one completes it
+                if partial? do
+                  send(pid, {:python_bridge_partial, id, response["response"]})
+                  state
+                else
+                  send(pid, {:python_bridge_response, id, response})
+                  %{state | callers: Map.delete(state.callers, id)}
+                end
+
+              _from when partial? ->
+                # Blocking callers only get the final response
                 state
 
               from ->
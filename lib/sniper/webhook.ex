@@ -102,7 +102,12 @@ defmodule Sniper.Webhook do
 
     case parse_command(body) do
       "review" ->
-        Task.start(fn -> Sniper.send_message(%{type: "main", payload: pr}) end)
+        # Streamed so a long review is only cut off when Python stops making progress
+        Task.start(fn ->
+          Sniper.stream_message(%{type: "main", payload: pr}, fn partial ->
+            Logger.debug("Review progress for #{partial["files"] |> Enum.join(", ")}")
+          end)
+        end)
 
       "ping" ->
         user = payload["comment"]["user"]["login"]
@@ -1,12 +1,141 @@
-from tree_sitter import Language, Parser, Query, QueryCursor, Node
-from typing import Generator
+from tree_sitter import Language, Parser, Query, QueryCursor, Node, Tree
+from typing import Generator, Optional
 import tree_sitter_python as tspython
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from operator import attrgetter
+import hashlib
 import os
+import re
 
-# Set up the parser
-# PY_LANGUAGE = Language(tspython.language())
-# parser = Parser(PY_LANGUAGE)
+from pythonbridge.ast.compact import KIND_CODES, KIND_TYPES, CompactRelationships
+
+# Language and relationship query are shared by every AST_manager (and only compiled once)
+PY_LANGUAGE = Language(tspython.language())
+
+CALL = PY_LANGUAGE.id_for_node_kind("call", True)
+FUNCTION_DEFINITION = PY_LANGUAGE.id_for_node_kind("function_definition", True)
+CLASS_DEFINITION = PY_LANGUAGE.id_for_node_kind("class_definition", True)
+IMPORT_STATEMENT = PY_LANGUAGE.id_for_node_kind("import_statement", True)
+
+# Number of parsed trees kept in the content-hash cache
+MAX_CACHED_TREES = 1024
+
+# Every node get_relationships looks at
+RELATIONSHIP_QUERY = Query(
+    PY_LANGUAGE,
+    """
+    (import_statement) @import
+    (import_from_statement) @import_from
+    (class_definition) @class
+    (function_definition) @function
+    (call) @call
+    """,
+)
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def blob_sha(content: bytes) -> str:
+    """Git blob SHA of a file's content (the same "sha" GitHub reports for PR files)
+
+    Args:
+        content (bytes): The raw file content
+
+    Returns:
+        str: Hex SHA-1 of the git blob
+    """
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+@dataclass
+class ParsedFile:
+    """A parsed file along with the source its tree was built from"""
+
+    path: str
+    sha: str
+    source: bytes
+    tree: Tree
+
+
+@dataclass
+class Hunk:
+    """One hunk of a unified diff, as line numbers (0 based) and line contents"""
+
+    old_start: int
+    old_lines: list[bytes]
+    new_lines: list[bytes]
+
+
+def parse_hunks(patch: str) -> list[Hunk]:
+    """Split a unified diff (a GitHub file patch) into hunks
+
+    Args:
+        patch (str): Unified diff of a single file
+
+    Returns:
+        list[Hunk]: The hunks in file order
+    """
+    hunks = []
+    hunk = None
+    last = None
+    for line in patch.splitlines():
+        header = HUNK_HEADER.match(line)
+        if header:
+            old_start = int(header.group(1))
+            old_count = 1 if header.group(2) is None else int(header.group(2))
+            # An empty old side ("-0,0") means the hunk starts before the first line
+            hunk = Hunk(old_start - 1 if old_count else old_start, [], [])
+            hunks.append(hunk)
+            last = None
+        elif hunk is None:
+            # git headers (diff --git, index, ---, +++) before the first hunk
+            continue
+        elif line.startswith("\\"):
+            # "\ No newline at end of file" applies to the previous line
+            for side in last or ():
+                side[-1] = side[-1].removesuffix(b"\n")
+        else:
+            text = line[1:].encode("utf8") + b"\n"
+            if line.startswith("-"):
+                hunk.old_lines.append(text)
+                last = (hunk.old_lines,)
+            elif line.startswith("+"):
+                hunk.new_lines.append(text)
+                last = (hunk.new_lines,)
+            else:
+                hunk.old_lines.append(text)
+                hunk.new_lines.append(text)
+                last = (hunk.old_lines, hunk.new_lines)
+    return hunks
+
+
+# NOTE: points are plain (row, column) tuples, tree_sitter.Point() breaks the type's refcount
+def end_point(start: tuple[int, int], text: bytes) -> tuple[int, int]:
+    """(row, column) point reached after inserting text at start"""
+    newlines = text.count(b"\n")
+    if newlines == 0:
+        return (start[0], start[1] + len(text))
+    return (start[0] + newlines, len(text) - text.rfind(b"\n") - 1)
+
+
+def definition_span(node: Node) -> dict:
+    """Lines and signature of a class or function definition node
+
+    Args:
+        node (Node): A class_definition or function_definition node
+
+    Returns:
+        dict: "lines", the (first, last) 0 based lines of the definition, and
+            "signature", the source of its header with whitespace collapsed
+    """
+    body = node.child_by_field_name("body")
+    end = body.start_byte if body is not None else node.end_byte
+    header = node.text[: end - node.start_byte].decode("utf8", errors="replace")
+    return {
+        "lines": (node.start_point[0], node.end_point[0]),
+        "signature": " ".join(header.split()).rstrip(":").rstrip(),
+    }
 
 
 class AST_manager:
@@ -16,35 +145,173 @@ class AST_manager:
     This class uses tree-sitter to parse Python source code and extract structural information
     including imports, class definitions, function definitions, methods, and their relationships.
 
+    Trees are cached by the content's blob SHA, so unchanged files are never
+    parsed twice, and the latest tree of every file is kept so a patch can be
+    applied incrementally with tree.edit instead of re-parsing the whole file.
+
     Attributes:
         language (Language): The tree-sitter language object for Python
         parser (Parser): The tree-sitter parser instance
         tree (Tree): The parsed AST of the current file
         current_file_name (str): Base name of the currently parsed file
+        files (dict[str, ParsedFile]): Latest parsed version of every file by path
+        max_cached_trees (int): Size of the content-hash tree cache
     """
 
-    def __init__(self):
+    def __init__(self, max_cached_trees: int = MAX_CACHED_TREES):
         """Initialize the AST manager with a Python language parser."""
-        self.language = Language(tspython.language())
+        self.language = PY_LANGUAGE
         self.parser = Parser(self.language)
         self.tree = None
         self.current_file_name = None
+        self.files: dict[str, ParsedFile] = {}
+        self.max_cached_trees = max_cached_trees
+        self._trees: OrderedDict[str, Tree] = OrderedDict()
 
-    def create_ast(self, file_path: str):
+    def create_ast(self, file_path: str, content: Optional[bytes] = None):
         """
         Parse a Python file and create its Abstract Syntax Tree.
 
+        The tree is reused from the cache when a file with the same content was already parsed.
+
         Args:
             file_path (str): Absolute or relative path to the Python file to parse
+            content (Optional[bytes]): The file content, read from file_path when not given
+        """
+        if content is None:
+            try:
+                with open(file_path, "r") as file:
+                    content = bytes(file.read(), "utf8")
+            except FileNotFoundError as e:
+                print(f"file is not found: {e}")
+                return None
+
+        sha = blob_sha(content)
+        tree = self._cached_tree(sha)
+        if tree is None:
+            tree = self.parser.parse(content)
+            self._cache_tree(sha, tree)
+        self._select(ParsedFile(file_path, sha, content, tree))
+
+    def update_ast(self, file_path: str, content: bytes):
         """
-        try:
-            with open(file_path, "r") as file:
-                content = file.read()
-                self.tree = self.parser.parse(bytes(content, "utf8"))
-                self.current_file_name = os.path.basename(file_path)
-        except FileNotFoundError as e:
-            print(f"file is not found: {e}")
-            return None
+        Re-parse a file whose content changed, reusing its previous tree.
+
+        The changed byte range is found by comparing against the previous source, so only
+        that range is re-parsed. Falls back to create_ast for files that were never parsed.
+
+        Args:
+            file_path (str): Path of a file previously passed to create_ast
+            content (bytes): The new file content
+        """
+        old = self.files.get(file_path)
+        if old is None:
+            return self.create_ast(file_path, content)
+
+        sha = blob_sha(content)
+        if sha == old.sha:
+            return self._select(old)
+
+        tree = self._cached_tree(sha)
+        if tree is None:
+            old_source = old.source
+            prefix = len(os.path.commonprefix([old_source, content]))
+            max_suffix = min(len(old_source), len(content)) - prefix
+            suffix = 0
+            while (
+                suffix < max_suffix and old_source[-1 - suffix] == content[-1 - suffix]
+            ):
+                suffix += 1
+
+            tree = old.tree.copy()
+            start = end_point((0, 0), old_source[:prefix])
+            tree.edit(
+                start_byte=prefix,
+                old_end_byte=len(old_source) - suffix,
+                new_end_byte=len(content) - suffix,
+                start_point=start,
+                old_end_point=end_point(
+                    start, old_source[prefix : len(old_source) - suffix]
+                ),
+                new_end_point=end_point(start, content[prefix : len(content) - suffix]),
+            )
+            tree = self.parser.parse(content, tree)
+            self._cache_tree(sha, tree)
+        self._select(ParsedFile(file_path, sha, content, tree))
+
+    def apply_patch(self, file_path: str, patch: str) -> bytes:
+        """
+        Apply a unified diff to a previously parsed file and incrementally re-parse it.
+
+        Every hunk becomes one tree.edit (applied bottom up so earlier offsets stay valid),
+        then the file is re-parsed once with the edited tree, so only the changed ranges are
+        parsed again.
+
+        Args:
+            file_path (str): Path of a file previously passed to create_ast (the patch's base)
+            patch (str): Unified diff of the file, e.g. the "patch" of a GitHub PR file
+
+        Returns:
+            bytes: The patched file content
+
+        Raises:
+            KeyError: If the file was never parsed
+            ValueError: If the patch does not apply to the parsed content
+        """
+        old = self.files[file_path]
+        lines = old.source.splitlines(keepends=True)
+        offsets = [0]
+        for line in lines:
+            offsets.append(offsets[-1] + len(line))
+
+        hunks = parse_hunks(patch)
+        for hunk in hunks:
+            end = hunk.old_start + len(hunk.old_lines)
+            if end > len(lines) or lines[hunk.old_start : end] != hunk.old_lines:
+                raise ValueError(f"patch does not apply to {file_path}")
+
+        content = old.source
+        tree = old.tree.copy()
+        for hunk in reversed(hunks):
+            start_byte = offsets[hunk.old_start]
+            old_end_byte = offsets[hunk.old_start + len(hunk.old_lines)]
+            new_text = b"".join(hunk.new_lines)
+            start = (hunk.old_start, 0)
+            tree.edit(
+                start_byte=start_byte,
+                old_end_byte=old_end_byte,
+                new_end_byte=start_byte + len(new_text),
+                start_point=start,
+                old_end_point=end_point(start, content[start_byte:old_end_byte]),
+                new_end_point=end_point(start, new_text),
+            )
+            content = content[:start_byte] + new_text + content[old_end_byte:]
+
+        sha = blob_sha(content)
+        new_tree = self._cached_tree(sha)
+        if new_tree is None:
+            new_tree = self.parser.parse(content, tree)
+            self._cache_tree(sha, new_tree)
+        self._select(ParsedFile(file_path, sha, content, new_tree))
+        return content
+
+    def _select(self, parsed: ParsedFile) -> None:
+        # Make the file the "current" one that get_relationships works on
+        self.files[parsed.path] = parsed
+        self.tree = parsed.tree
+        self.current_file_name = os.path.basename(parsed.path)
+
+    def _cached_tree(self, sha: str) -> Optional[Tree]:
+        tree = self._trees.get(sha)
+        if tree is not None:
+            self._trees.move_to_end(sha)
+        return tree
+
+    def _cache_tree(self, sha: str, tree: Tree) -> None:
+        self._trees[sha] = tree
+        self._trees.move_to_end(sha)
+        while len(self._trees) > self.max_cached_trees:
+            self._trees.popitem(last=False)
 
     def traverse_tree(self, node: Node) -> Generator[Node, None, None]:
         """
@@ -107,7 +374,11 @@ class AST_manager:
         """
         Extract all structural relationships from the parsed AST.
 
-        This is the main analysis method that queries the AST for:
+        Every relationship kind comes from one precompiled query. Its captures are walked
+        once in document (depth-first) order while the enclosing classes and standalone
+        functions are kept on a scope stack, so nested code is never visited twice.
+
+        This is the main analysis method that finds:
         - Import statements (import and from...import)
         - Class definitions
         - Standalone function definitions (excluding methods)
@@ -132,148 +403,202 @@ class AST_manager:
                 "type": str,    # Optional: type of relationship
                 "location": tuple  # (start_point, end_point)
             }
-        """
 
+            Class, function and method entries also carry "lines", the (first, last)
+            0 based lines of the whole definition, and "signature", its header
+            without the body (e.g. "def load(path, reader=open)").
+        """
         # dictionary to store all relationships
         relationships = defaultdict(list)
+        for kind, caller, callee, start, end, span in self._relationship_records():
+            entry = {"caller": caller, "callee": callee}
+            if kind in KIND_TYPES:
+                entry["type"] = KIND_TYPES[kind]
+            entry["location"] = (start, end)
+            if span is not None:
+                entry.update(span)
+            relationships[kind].append(entry)
 
-        # query for imports, functions, classes
-        query = Query(
-            self.language,
-            """
-            (import_statement) @import
-            (import_from_statement) @import_from
-
-            (function_definition
-            name: (identifier) @function.def
-            body: (block) @function.block)
-
-            (class_definition
-            name: (identifier) @class.def
-            body: (block) @class.block)
-            """,
-        )
+        return dict(relationships)
 
-        query_cursor = QueryCursor(query)
-        captures = query_cursor.captures(self.tree.root_node)
-
-        # extract regular imports (import os)
-        if "import" in captures:
-            for node in captures["import"]:
-                relationships["imports"].append(
-                    {
-                        "caller": self.current_file_name,
-                        "callee": node.text.decode("utf8"),
-                        "location": (node.start_point, node.end_point),
-                    }
-                )
+    def get_compact_relationships(
+        self,
+        into: Optional[CompactRelationships] = None,
+        file_path: Optional[str] = None,
+    ) -> CompactRelationships:
+        """
+        Extract the relationships of get_relationships straight into column arrays.
+
+        No dict is built per relationship, the nodes' names and positions are
+        appended to the columns of a CompactRelationships (see ast.compact).
 
-        # extract from imports (from x import y)
-        if "import_from" in captures:
-            for node in captures["import_from"]:
-                relationships["imports_from"].append(
-                    {
-                        "caller": self.current_file_name,
-                        "callee": node.text.decode("utf8"),
-                        "location": (node.start_point, node.end_point),
-                    }
+        Args:
+            into (Optional[CompactRelationships]): Records to add the file to (a new one
+                when not given), its previous records are replaced
+            file_path (Optional[str]): Path the records are stored under, the current
+                file's base name by default
+
+        Returns:
+            CompactRelationships: into, with the current file added
+        """
+        compact = into if into is not None else CompactRelationships()
+        file = compact.begin(file_path or self.current_file_name)
+        append = compact.append
+        for kind, caller, callee, start, end, span in self._relationship_records():
+            if span is None:
+                append(file, KIND_CODES[kind], caller, callee, start, end)
+            else:
+                append(
+                    file,
+                    KIND_CODES[kind],
+                    caller,
+                    callee,
+                    start,
+                    end,
+                    span["lines"],
+                    span["signature"],
                 )
 
-        # extract all class definitions
-        if "class.def" in captures:
-            for node in captures["class.def"]:
-                relationships["class_def"].append(
-                    {
-                        "caller": self.current_file_name,
-                        "callee": node.text.decode("utf8"),
-                        "location": (node.start_point, node.end_point),
-                    }
+        return compact
+
+    def _relationship_records(self) -> Generator[tuple, None, None]:
+        # (kind, caller, callee, start, end, definition_span or None) of every
+        # relationship of the current tree, each kind contiguous and in KINDS order
+        (
+            imports,
+            imports_from,
+            class_defs,
+            function_defs,
+            method_buckets,
+            call_buckets,
+        ) = self._collect_relationships()
+        file_name = self.current_file_name
+
+        for kind, nodes in (("imports", imports), ("imports_from", imports_from)):
+            for node in nodes:
+                yield (
+                    kind,
+                    file_name,
+                    node.text.decode("utf8"),
+                    node.start_point,
+                    node.end_point,
+                    None,
                 )
 
-        # extract all function definitions
-        if "function.def" in captures:
-            for node in captures["function.def"]:
-                if self.check_parent_is_class(node):
-                    continue
-                self.print_node_vals(node)
-                relationships["function_def"].append(
-                    {
-                        "caller": self.current_file_name,
-                        "callee": node.text.decode("utf8"),
-                        "location": (node.start_point, node.end_point),
-                    }
+        for kind, definitions in (
+            ("class_def", class_defs),
+            ("function_def", function_defs),
+        ):
+            for name_node, node in definitions:
+                yield (
+                    kind,
+                    file_name,
+                    name_node.text.decode("utf8"),
+                    name_node.start_point,
+                    name_node.end_point,
+                    definition_span(node),
                 )
 
-        # extract all methods within classes
-        if "class.def" in captures:
-            # every class found in a file
-            for i, class_name_node in enumerate(captures["class.def"]):
-                class_name = class_name_node.text.decode("utf8")
-                class_body = captures["class.block"][i]
-
-                # search through all the nodes within the class body
-                for node in self.traverse_tree(class_body):
-                    # (the method in the class)
-                    if node.type == "function_definition":
-                        # function name within class
-                        method_name_node = node.child_by_field_name("name")
-                        if method_name_node:
-                            callee_name = method_name_node.text.decode("utf8")
-
-                            if callee_name:
-                                relationships["method"].append(
-                                    {
-                                        "caller": class_name,
-                                        "callee": callee_name,
-                                        "type": "class_method",
-                                        "location": (node.start_point, node.end_point),
-                                    }
-                                )
-
-        # extract all other function calls within functions and class instantiations
-        if "function.def" in captures:
-            # enumerate will line function name with the body (0 with 0, 1 with 1, etc.)
-            for i, func_name_node in enumerate(captures["function.def"]):
-                if self.check_parent_is_class(func_name_node):
-                    continue
-                func_name = func_name_node.text.decode("utf8")
-                func_body = captures["function.block"][i]
-                # loop through the function body and search for function calls
-                for node in self.traverse_tree(func_body):
-                    # call nodes represent any function calls
-                    if node.type == "call":
-                        function_name_node = node.child_by_field_name("function")
-                        if function_name_node:
-                            callee_name = function_name_node.text.decode("utf8")
-
-                            # safety check for empty string
-                            if callee_name:
-                                # if class instantiation
-                                if callee_name[0].isupper():
-                                    relationships["instantiation"].append(
-                                        {
-                                            "caller": func_name,
-                                            "callee": callee_name,
-                                            "type": "class_instantiation",
-                                            "location": (
-                                                node.start_point,
-                                                node.end_point,
-                                            ),
-                                        }
-                                    )
-
-                                # regular function
-                                else:
-                                    relationships["call"].append(
-                                        {
-                                            "caller": func_name,
-                                            "callee": callee_name,
-                                            "type": "function_call",
-                                            "location": (
-                                                node.start_point,
-                                                node.end_point,
-                                            ),
-                                        }
-                                    )
+        for class_name, methods in method_buckets:
+            for callee_name, node in methods:
+                yield (
+                    "method",
+                    class_name,
+                    callee_name,
+                    node.start_point,
+                    node.end_point,
+                    definition_span(node),
+                )
 
-        return dict(relationships)
+        # calls and instantiations share the buckets, a capitalized callee is a class
+        for kind, instantiation in (("call", False), ("instantiation", True)):
+            for func_name, calls in call_buckets:
+                for callee_name, node in calls:
+                    if callee_name[0].isupper() == instantiation:
+                        yield (
+                            kind,
+                            func_name,
+                            callee_name,
+                            node.start_point,
+                            node.end_point,
+                            None,
+                        )
+
+    def _collect_relationships(self) -> tuple:
+        # The nodes of every relationship of the current tree, see get_relationships
+        captures = QueryCursor(RELATIONSHIP_QUERY).captures(self.tree.root_node)
+
+        imports = []
+        imports_from = []
+        class_defs = []
+        function_defs = []
+        # one bucket per class (its methods) and per standalone function (its calls),
+        # in definition order so the output is grouped the same way as before
+        method_buckets = []
+        call_buckets = []
+
+        # every captured node in document order, outer nodes before the inner ones that
+        # share their start (like f()()), done as two stable sorts to avoid key tuples
+        nodes = [node for group in captures.values() for node in group]
+        nodes.sort(key=attrgetter("end_byte"), reverse=True)
+        nodes.sort(key=attrgetter("start_byte"))
+
+        # enclosing scopes as [end_byte, is_class, body_start_byte, bucket]
+        scopes = []
+        in_class = 0
+
+        for node in nodes:
+            start_byte = node.start_byte
+
+            # leave every scope the current node is not inside of
+            while scopes and scopes[-1][0] <= start_byte:
+                if scopes.pop()[1]:
+                    in_class -= 1
+
+            kind = node.kind_id
+            if kind == CALL:
+                function_name_node = node.child_by_field_name("function")
+                if function_name_node:
+                    callee_name = function_name_node.text.decode("utf8")
+                    # safety check for empty string, calls only count inside a function body
+                    if callee_name:
+                        for scope in scopes:
+                            if not scope[1] and start_byte >= scope[2]:
+                                scope[3][1].append((callee_name, node))
+
+            elif kind == FUNCTION_DEFINITION:
+                name_node = node.child_by_field_name("name")
+                callee_name = name_node.text.decode("utf8")
+                # (the method in every enclosing class)
+                if in_class:
+                    for scope in scopes:
+                        if scope[1] and callee_name:
+                            scope[3][1].append((callee_name, node))
+                else:
+                    function_defs.append((name_node, node))
+                    bucket = (callee_name, [])
+                    call_buckets.append(bucket)
+                    body = node.child_by_field_name("body")
+                    scopes.append([node.end_byte, False, body.start_byte, bucket])
+
+            elif kind == CLASS_DEFINITION:
+                name_node = node.child_by_field_name("name")
+                class_defs.append((name_node, node))
+                bucket = (name_node.text.decode("utf8"), [])
+                method_buckets.append(bucket)
+                scopes.append([node.end_byte, True, 0, bucket])
+                in_class += 1
+
+            elif kind == IMPORT_STATEMENT:
+                imports.append(node)
+            else:
+                imports_from.append(node)
+
+        return (
+            imports,
+            imports_from,
+            class_defs,
+            function_defs,
+            method_buckets,
+            call_buckets,
+        )
@@ -0,0 +1,301 @@
+"""
+In-memory call graph of a repository
+
+Built from the output of AST_manager.get_relationships (or a RepositoryIndexer run),
+it answers "who calls X", "what does X reach" and "where is X defined" without
+scanning every file's relationships. Names are interned to integer ids, and the
+callers and callees of every id are kept in adjacency lists indexed by that id,
+so a query is a few dict lookups and a breadth-first walk over ints.
+
+Symbols are plain names: a call to "helper.run" or "self.run" is an edge to "run",
+since the receiver's type is unknown without type inference. Every file's edges
+and definitions are recorded, so a changed file is replaced (and a deleted one
+removed) without rebuilding the rest of the graph.
+"""
+
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+# The name a call resolves to: the last identifier of "mod.obj.name"
+CALL_NAME = re.compile(r"[A-Za-z_]\w*$")
+
+
+@dataclass(frozen=True)
+class Definition:
+    """Where a class, function or method is defined
+
+    Attributes:
+        file (str): Path of the file relative to the repository root
+        name (str): Qualified name, "Class.method" for methods
+        kind (str): "class", "function" or "method"
+        start_line (int): First line (0 based) of the definition
+        end_line (int): Last line (0 based) of the definition
+        signature (str): Its header, e.g. "def load(path, reader=open)"
+    """
+
+    file: str
+    name: str
+    kind: str
+    start_line: int
+    end_line: int
+    signature: str = ""
+
+
+def call_name(callee: str) -> Optional[str]:
+    """Symbol a call expression resolves to
+
+    Args:
+        callee (str): The called expression, e.g. "json.loads" or "reader(path).read"
+
+    Returns:
+        Optional[str]: Its last identifier ("loads", "read"), None for calls of calls like "f()()"
+    """
+    match = CALL_NAME.search(callee)
+    return match.group(0) if match else None
+
+
+class CodeGraph:
+    """Call graph of a repository with a name to definition index.
+
+    Attributes:
+        files (set[str]): Files currently in the graph
+    """
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+        self._names: list[str] = []
+        # edge multiplicity by neighbour id, one dict per symbol id
+        self._callees: list[dict[int, int]] = []
+        self._callers: list[dict[int, int]] = []
+        # definitions of every symbol id by file
+        self._definitions: dict[int, dict[str, list[Definition]]] = {}
+        # what every file added, so it can be taken out again
+        self._file_edges: dict[str, list[tuple[int, int]]] = {}
+        self._file_definitions: dict[str, list[Definition]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def files(self) -> set[str]:
+        with self._lock:
+            return set(self._file_edges)
+
+    def add_file(self, file_path: str, relationships: dict) -> None:
+        """Add the relationships of a file, replacing its previous version
+
+        Args:
+            file_path (str): Path of the file relative to the repository root
+            relationships (dict): Output of AST_manager.get_relationships for the file
+        """
+        with self._lock:
+            self._remove(file_path)
+
+            definitions = []
+            for relation, kind in (
+                ("class_def", "class"),
+                ("function_def", "function"),
+            ):
+                for entry in relationships.get(relation, []):
+                    definitions.append(
+                        self._definition(file_path, entry["callee"], kind, entry)
+                    )
+            for entry in relationships.get("method", []):
+                name = f"{entry['caller']}.{entry['callee']}"
+                definitions.append(self._definition(file_path, name, "method", entry))
+
+            edges = []
+            for relation in ("call", "instantiation"):
+                for entry in relationships.get(relation, []):
+                    callee = call_name(entry["callee"])
+                    if callee is None:
+                        continue
+                    edges.append((self._intern(entry["caller"]), self._intern(callee)))
+
+            for symbol, definition in definitions:
+                by_file = self._definitions.setdefault(symbol, {})
+                by_file.setdefault(file_path, []).append(definition)
+            for caller, callee in edges:
+                _add(self._callees[caller], callee)
+                _add(self._callers[callee], caller)
+            self._file_definitions[file_path] = [d for _, d in definitions]
+            self._file_edges[file_path] = edges
+
+    def remove_file(self, file_path: str) -> None:
+        """Take every edge and definition of a file out of the graph"""
+        with self._lock:
+            self._remove(file_path)
+
+    def update(
+        self, results: Iterable[tuple[str, dict]], removed: Iterable[str] = ()
+    ) -> int:
+        """Apply a stream of (path, relationships), like RepositoryIndexer.index()
+
+        Args:
+            results (Iterable[tuple[str, dict]]): Changed files and their relationships
+            removed (Iterable[str]): Files to remove, read after results is consumed
+                (a callable returning them is also accepted)
+
+        Returns:
+            int: Number of files added or replaced
+        """
+        count = 0
+        for file_path, relationships in results:
+            self.add_file(file_path, relationships)
+            count += 1
+        for file_path in removed() if callable(removed) else removed:
+            self.remove_file(file_path)
+        return count
+
+    def definitions(self, name: str) -> list[Definition]:
+        """Where a name is defined
+
+        Args:
+            name (str): A plain name ("run") or a qualified one ("Helper.run")
+
+        Returns:
+            list[Definition]: Every definition of the name, in the order files were added
+        """
+        simple = name.rsplit(".", 1)[-1]
+        with self._lock:
+            symbol = self._ids.get(simple)
+            by_file = self._definitions.get(symbol, {}) if symbol is not None else {}
+            found = [d for definitions in by_file.values() for d in definitions]
+        if simple != name:
+            found = [d for d in found if d.name == name or d.name.endswith("." + name)]
+        return found
+
+    def file_definitions(self, file_path: str) -> list[Definition]:
+        """Every class, function and method defined in a file"""
+        with self._lock:
+            return list(self._file_definitions.get(file_path, ()))
+
+    def callees(self, name: str) -> list[str]:
+        """Names called by the functions named name"""
+        return self._neighbours(name, self._callees)
+
+    def callers(self, name: str) -> list[str]:
+        """Names of the functions calling name"""
+        return self._neighbours(name, self._callers)
+
+    def reachable(self, name: str, max_depth: Optional[int] = None) -> dict[str, int]:
+        """Everything name calls, directly or through other calls
+
+        Args:
+            name (str): The starting function
+            max_depth (Optional[int]): Longest call chain followed, unlimited by default
+
+        Returns:
+            dict[str, int]: Call depth (1 for direct callees) by reached name
+        """
+        return self._walk(name, self._callees, max_depth)
+
+    def dependents(self, name: str, max_depth: Optional[int] = None) -> dict[str, int]:
+        """Every function that reaches name, the reverse of reachable
+
+        Args:
+            name (str): The function whose dependents are wanted
+            max_depth (Optional[int]): Longest call chain followed, unlimited by default
+
+        Returns:
+            dict[str, int]: Call depth (1 for direct callers) by dependent name
+        """
+        return self._walk(name, self._callers, max_depth)
+
+    def stats(self) -> dict:
+        """Size of the graph
+
+        Returns:
+            dict: "files", "symbols", "edges" (distinct caller to callee pairs)
+                and "definitions"
+        """
+        with self._lock:
+            return {
+                "files": len(self._file_edges),
+                "symbols": len(self._names),
+                "edges": sum(len(callees) for callees in self._callees),
+                "definitions": sum(
+                    len(definitions)
+                    for by_file in self._definitions.values()
+                    for definitions in by_file.values()
+                ),
+            }
+
+    def _intern(self, name: str) -> int:
+        # must hold the lock
+        symbol = self._ids.get(name)
+        if symbol is None:
+            symbol = len(self._names)
+            self._ids[name] = symbol
+            self._names.append(name)
+            self._callees.append({})
+            self._callers.append({})
+        return symbol
+
+    def _definition(
+        self, file_path: str, name: str, kind: str, entry: dict
+    ) -> tuple[int, Definition]:
+        # "lines" spans the whole definition, "location" only the name of classes
+        # and functions indexed before it was recorded
+        if "lines" in entry:
+            start_line, end_line = entry["lines"]
+        else:
+            start, end = entry["location"]
+            start_line, end_line = start[0], end[0]
+        definition = Definition(
+            file_path, name, kind, start_line, end_line, entry.get("signature", "")
+        )
+        return self._intern(name.rsplit(".", 1)[-1]), definition
+
+    def _remove(self, file_path: str) -> None:
+        # must hold the lock
+        for caller, callee in self._file_edges.pop(file_path, ()):
+            _discard(self._callees[caller], callee)
+            _discard(self._callers[callee], caller)
+        for definition in self._file_definitions.pop(file_path, ()):
+            symbol = self._ids[definition.name.rsplit(".", 1)[-1]]
+            by_file = self._definitions[symbol]
+            if by_file.pop(file_path, None) is not None and not by_file:
+                del self._definitions[symbol]
+
+    def _neighbours(self, name: str, adjacency: list[dict[int, int]]) -> list[str]:
+        with self._lock:
+            symbol = self._ids.get(name)
+            if symbol is None:
+                return []
+            return [self._names[other] for other in adjacency[symbol]]
+
+    def _walk(
+        self, name: str, adjacency: list[dict[int, int]], max_depth: Optional[int]
+    ) -> dict[str, int]:
+        with self._lock:
+            start = self._ids.get(name)
+            if start is None:
+                return {}
+            depths = {start: 0}
+            frontier = deque([start])
+            while frontier:
+                symbol = frontier.popleft()
+                depth = depths[symbol] + 1
+                if max_depth is not None and depth > max_depth:
+                    continue
+                for other in adjacency[symbol]:
+                    if other not in depths:
+                        depths[other] = depth
+                        frontier.append(other)
+            del depths[start]
+            return {self._names[symbol]: depth for symbol, depth in depths.items()}
+
+
+def _add(counts: dict[int, int], key: int) -> None:
+    counts[key] = counts.get(key, 0) + 1
+
+
+def _discard(counts: dict[int, int], key: int) -> None:
+    # edges shared by several files stay until the last one is gone
+    count = counts[key] - 1
+    if count:
+        counts[key] = count
+    else:
+        del counts[key]
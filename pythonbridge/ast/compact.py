@@ -0,0 +1,504 @@
+"""
+Compact, column oriented relationship records
+
+get_relationships returns one dict per relationship with its own caller and
+callee strings and a tuple of tuples for the location, millions of small objects
+for a large repository. CompactRelationships keeps the same records as a few
+typed arrays (one per field) and a table of interned strings, so a record costs
+a few dozen bytes and nothing for the garbage collector to track.
+
+The arrays are exported without copies: as numpy arrays or Arrow columns (both
+optional dependencies) or straight into an NPZ file. view() gives the dict shape
+of get_relationships back, building each entry only when it is read.
+"""
+
+import struct
+import sys
+import zipfile
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Iterator, Optional
+
+# Relationship kinds in the order get_relationships returns them, stored as their index
+KINDS = (
+    "imports",
+    "imports_from",
+    "class_def",
+    "function_def",
+    "method",
+    "call",
+    "instantiation",
+)
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+# "type" of the entries of a kind
+KIND_TYPES = {
+    "method": "class_method",
+    "call": "function_call",
+    "instantiation": "class_instantiation",
+}
+# Kinds carrying the "lines" and "signature" of a definition
+DEFINITION_KINDS = frozenset({"class_def", "function_def", "method"})
+
+# Array typecode of every column, -1 marks a missing value in the signed ones
+COLUMNS = {
+    "file": "I",
+    "kind": "B",
+    "caller": "I",
+    "callee": "I",
+    "start_row": "I",
+    "start_col": "I",
+    "end_row": "I",
+    "end_col": "I",
+    "first_line": "i",
+    "last_line": "i",
+    "signature": "i",
+}
+
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+class StringTable:
+    """Interned strings, each stored once and referred to by its index
+
+    Attributes:
+        strings (list[str]): The strings by id
+    """
+
+    def __init__(self, strings: Sequence[str] = ()) -> None:
+        self.strings = list(strings)
+        # id by string, only built once something is interned (loading needs no lookups)
+        self._ids: Optional[dict[str, int]] = None
+
+    def intern(self, string: str) -> int:
+        """Id of a string, adding it on first use"""
+        if self._ids is None:
+            self._ids = {string: i for i, string in enumerate(self.strings)}
+        id = self._ids.get(string)
+        if id is None:
+            id = self._ids[string] = len(self.strings)
+            self.strings.append(string)
+        return id
+
+    def __getitem__(self, id: int) -> str:
+        return self.strings[id]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+class CompactRelationships:
+    """Relationship records of any number of files, stored in column arrays.
+
+    The records of a file are contiguous and grouped by kind in KINDS order,
+    so a file is replaced or removed by cutting its slice out of every column.
+
+    Attributes:
+        strings (StringTable): Every file path, name and signature of the records
+        columns (dict[str, array]): One array per field, see COLUMNS
+    """
+
+    def __init__(
+        self,
+        strings: Optional[StringTable] = None,
+        columns: Optional[dict] = None,
+        ranges: Optional[dict[str, tuple[int, int]]] = None,
+    ) -> None:
+        """
+        Args:
+            strings (Optional[StringTable]): Strings the records refer to
+            columns (Optional[dict]): Existing columns (arrays or read-only memoryviews,
+                e.g. of a memory-mapped file), copied into arrays on the first change
+            ranges (Optional[dict[str, tuple[int, int]]]): (start, end) records of every
+                file of the columns, in column order
+        """
+        self.strings = strings if strings is not None else StringTable()
+        self.columns = columns or {name: array(code) for name, code in COLUMNS.items()}
+        # (start, end) record range of every file, the last added runs to the end (None)
+        self._files: dict[str, tuple[int, Optional[int]]] = dict(ranges or {})
+
+    def __len__(self) -> int:
+        return len(self.columns["kind"])
+
+    @property
+    def files(self) -> list[str]:
+        """Paths of the files with records, in the order they were added"""
+        return list(self._files)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays"""
+        return sum(column.itemsize * len(column) for column in self.columns.values())
+
+    @classmethod
+    def from_relationships(
+        cls, file_path: str, relationships: Mapping
+    ) -> "CompactRelationships":
+        """Compact records of one file's get_relationships output"""
+        compact = cls()
+        compact.add(file_path, relationships)
+        return compact
+
+    def begin(self, file_path: str) -> int:
+        """Start the records of a file, dropping its previous ones
+
+        Returns:
+            int: The file's string id to pass to append
+        """
+        self.remove(file_path)
+        self._writable()
+        if self._files:
+            last = next(reversed(self._files))
+            self._files[last] = self.span(last)
+        self._files[file_path] = (len(self), None)
+        return self.strings.intern(file_path)
+
+    def span(self, file_path: str) -> tuple[int, int]:
+        """(start, end) indexes of the records of a file"""
+        start, end = self._files[file_path]
+        return start, len(self) if end is None else end
+
+    def _writable(self) -> None:
+        # columns given as read-only buffers become arrays before their first change
+        for name, column in self.columns.items():
+            if not isinstance(column, array):
+                copy = array(COLUMNS[name])
+                copy.frombytes(memoryview(column).cast("B"))
+                self.columns[name] = copy
+
+    def append(
+        self,
+        file: int,
+        kind: int,
+        caller: str,
+        callee: str,
+        start: tuple[int, int],
+        end: tuple[int, int],
+        lines: Optional[tuple[int, int]] = None,
+        signature: Optional[str] = None,
+    ) -> None:
+        """Add one record of the file begin was last called for (records go in KINDS order)"""
+        columns = self.columns
+        intern = self.strings.intern
+        columns["file"].append(file)
+        columns["kind"].append(kind)
+        columns["caller"].append(intern(caller))
+        columns["callee"].append(intern(callee))
+        columns["start_row"].append(start[0])
+        columns["start_col"].append(start[1])
+        columns["end_row"].append(end[0])
+        columns["end_col"].append(end[1])
+        columns["first_line"].append(lines[0] if lines else -1)
+        columns["last_line"].append(lines[1] if lines else -1)
+        columns["signature"].append(-1 if signature is None else intern(signature))
+
+    def add(self, file_path: str, relationships: Mapping) -> None:
+        """Add (or replace) a file from the dict shape of get_relationships
+
+        Args:
+            file_path (str): Path of the file the records belong to
+            relationships (Mapping): get_relationships output, a view() works too
+        """
+        if isinstance(relationships, RelationshipsView):
+            if relationships.compact is not self:
+                return self.extend(relationships.compact, [relationships.file_path])
+            # begin drops the records the view reads
+            relationships = {
+                kind: list(entries) for kind, entries in relationships.items()
+            }
+
+        file = self.begin(file_path)
+        for kind in KINDS:
+            code = KIND_CODES[kind]
+            for entry in relationships.get(kind, ()):
+                start, end = entry["location"]
+                self.append(
+                    file,
+                    code,
+                    entry["caller"],
+                    entry["callee"],
+                    start,
+                    end,
+                    entry.get("lines"),
+                    entry.get("signature"),
+                )
+
+    def extend(
+        self, other: "CompactRelationships", files: Optional[list[str]] = None
+    ) -> None:
+        """Copy files of another CompactRelationships in, replacing the ones already here
+
+        Columns are copied whole, only the string ids are translated.
+
+        Args:
+            other (CompactRelationships): Where the records come from
+            files (Optional[list[str]]): Its files to copy, all of them by default
+        """
+        translate = array("i", [-1]) * len(other.strings)
+
+        def local(id: int) -> int:
+            if translate[id] < 0:
+                translate[id] = self.strings.intern(other.strings[id])
+            return translate[id]
+
+        for file_path in other.files if files is None else files:
+            start, end = other.span(file_path)
+            file = self.begin(file_path)
+            for name, column in self.columns.items():
+                values = other.columns[name][start:end]
+                if name == "file":
+                    values = array("I", [file]) * len(values)
+                elif name in ("caller", "callee"):
+                    values = array("I", [local(id) for id in values])
+                elif name == "signature":
+                    values = array("i", [local(id) if id >= 0 else -1 for id in values])
+                column.extend(values)
+
+    def remove(self, file_path: str) -> None:
+        """Drop the records of a file (its strings stay interned)"""
+        if file_path not in self._files:
+            return
+        start, end = self.span(file_path)
+        del self._files[file_path]
+        if start == end:
+            return
+        self._writable()
+        for column in self.columns.values():
+            del column[start:end]
+        removed = end - start
+        for path, (first, last) in self._files.items():
+            if first >= end:
+                self._files[path] = (
+                    first - removed,
+                    None if last is None else last - removed,
+                )
+
+    def record(self, index: int) -> dict:
+        """The record at index in the dict shape of get_relationships"""
+        columns = self.columns
+        strings = self.strings
+        kind = KINDS[columns["kind"][index]]
+        entry = {
+            "caller": strings[columns["caller"][index]],
+            "callee": strings[columns["callee"][index]],
+        }
+        if kind in KIND_TYPES:
+            entry["type"] = KIND_TYPES[kind]
+        entry["location"] = (
+            (columns["start_row"][index], columns["start_col"][index]),
+            (columns["end_row"][index], columns["end_col"][index]),
+        )
+        if kind in DEFINITION_KINDS and columns["first_line"][index] >= 0:
+            entry["lines"] = (columns["first_line"][index], columns["last_line"][index])
+            signature = columns["signature"][index]
+            if signature >= 0:
+                entry["signature"] = strings[signature]
+        return entry
+
+    def view(self, file_path: str) -> "RelationshipsView":
+        """The records of a file as a read-only get_relationships dict
+
+        Raises:
+            KeyError: If the file has no records here
+        """
+        start, end = self.span(file_path)
+        return RelationshipsView(self, file_path, start, end)
+
+    def to_numpy(self) -> dict:
+        """The columns as numpy arrays sharing the arrays' memory
+
+        The columns can not grow or shrink (BufferError) while the numpy arrays are alive.
+
+        Returns:
+            dict: numpy array by column name, plus "strings" (a list of str)
+        """
+        try:
+            import numpy
+        except ImportError as e:
+            raise ImportError(
+                "numpy export needs the numpy package (uv sync --extra numpy)"
+            ) from e
+        arrays = {
+            name: numpy.frombuffer(column, dtype=_dtype(COLUMNS[name]))
+            for name, column in self.columns.items()
+        }
+        arrays["strings"] = self.strings.strings
+        return arrays
+
+    def to_arrow(self):
+        """The records as an Arrow table whose numeric columns share the arrays' memory
+
+        Returns:
+            pyarrow.Table: One column per field, "file", "caller" and "callee"
+                dictionary encoded against the string table. Like to_numpy, the
+                columns can not change size while the table is alive
+        """
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError(
+                "Arrow export needs the pyarrow package (uv sync --extra arrow)"
+            ) from e
+        strings = pyarrow.array(self.strings.strings, type=pyarrow.string())
+        types = {
+            "I": pyarrow.uint32(),
+            "B": pyarrow.uint8(),
+            "i": pyarrow.int32(),
+        }
+        table = {}
+        for name, column in self.columns.items():
+            values = pyarrow.Array.from_buffers(
+                types[COLUMNS[name]], len(column), [None, pyarrow.py_buffer(column)]
+            )
+            if name in ("file", "caller", "callee"):
+                values = pyarrow.DictionaryArray.from_arrays(values, strings)
+            table[name] = values
+        return pyarrow.table(table)
+
+    def save_npz(self, path) -> None:
+        """Write the columns to an NPZ archive (numpy.load reads it), without numpy
+
+        The string table is stored as "strings", one UTF-8 byte string per id
+        joined by NUL bytes.
+
+        Args:
+            path: File path or binary file object
+        """
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as archive:
+            for name, column in self.columns.items():
+                with archive.open(f"{name}.npy", "w", force_zip64=True) as entry:
+                    entry.write(_npy_header(_dtype(COLUMNS[name]), len(column)))
+                    entry.write(memoryview(column).cast("B"))
+            joined = b"\0".join(s.encode("utf8") for s in self.strings.strings)
+            with archive.open("strings.npy", "w", force_zip64=True) as entry:
+                entry.write(_npy_header("|u1", len(joined)))
+                entry.write(joined)
+
+    @classmethod
+    def load_npz(cls, path) -> "CompactRelationships":
+        """Read an archive written by save_npz
+
+        Args:
+            path: File path or binary file object
+        """
+        compact = cls()
+        with zipfile.ZipFile(path) as archive:
+            joined = _npy_payload(archive.read("strings.npy"))
+            strings = joined.decode("utf8").split("\0") if joined else []
+            compact.strings = StringTable(strings)
+            for name, column in compact.columns.items():
+                column.frombytes(_npy_payload(archive.read(f"{name}.npy")))
+                if sys.byteorder != "little":
+                    column.byteswap()
+        # the records of a file are contiguous, each one runs to the next file's start
+        starts = []
+        previous = None
+        for index, file in enumerate(compact.columns["file"]):
+            if file != previous:
+                starts.append((compact.strings[file], index))
+                previous = file
+        ends = [start for _, start in starts[1:]] + [None]
+        for (file_path, start), end in zip(starts, ends):
+            compact._files[file_path] = (start, end)
+        return compact
+
+
+class RecordList(Sequence):
+    """Records of one kind of one file, each built as a dict when read"""
+
+    def __init__(self, compact: CompactRelationships, start: int, end: int) -> None:
+        self._compact = compact
+        self._start = start
+        self._end = end
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._compact.record(self._start + index)
+
+    def __iter__(self) -> Iterator[dict]:
+        record = self._compact.record
+        for index in range(self._start, self._end):
+            yield record(index)
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+
+class RelationshipsView(Mapping):
+    """get_relationships shaped, read-only view of one file of a CompactRelationships
+
+    Attributes:
+        compact (CompactRelationships): Where the records live
+        file_path (str): The file viewed
+    """
+
+    def __init__(
+        self, compact: CompactRelationships, file_path: str, start: int, end: int
+    ) -> None:
+        self.compact = compact
+        self.file_path = file_path
+        # kinds are contiguous within a file, find where each one starts and ends
+        self._kinds: dict[str, tuple[int, int]] = {}
+        kinds = compact.columns["kind"]
+        index = start
+        while index < end:
+            code = kinds[index]
+            first = index
+            while index < end and kinds[index] == code:
+                index += 1
+            self._kinds[KINDS[code]] = (first, index)
+
+    def __getitem__(self, kind: str) -> RecordList:
+        start, end = self._kinds[kind]
+        return RecordList(self.compact, start, end)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._kinds)
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    def __reduce__(self):
+        # pickles (to and from worker processes) as the compact records of the file
+        compact = self.compact
+        if compact.files != [self.file_path]:
+            compact = CompactRelationships()
+            compact.extend(self.compact, [self.file_path])
+        return (_unpickle_view, (compact, self.file_path))
+
+
+def _unpickle_view(compact: CompactRelationships, file_path: str) -> RelationshipsView:
+    return compact.view(file_path)
+
+
+def _dtype(typecode: str) -> str:
+    # numpy dtype string of an array typecode, in the machine's byte order
+    itemsize = array(typecode).itemsize
+    order = "<" if sys.byteorder == "little" else ">"
+    if itemsize == 1:
+        order = "|"
+    kind = "i" if typecode.islower() else "u"
+    return f"{order}{kind}{itemsize}"
+
+
+def _npy_header(dtype: str, length: int) -> bytes:
+    # .npy format 1.0: magic, header length, then a dict literal padded to 64 bytes
+    header = f"{{'descr': '{dtype}', 'fortran_order': False, 'shape': ({length},), }}"
+    padding = 64 - (len(NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = header + " " * padding + "\n"
+    return NPY_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def _npy_payload(data: bytes) -> bytes:
+    # the array bytes of a .npy file written by _npy_header
+    if not data.startswith(NPY_MAGIC):
+        raise ValueError("not an .npy file")
+    (header_length,) = struct.unpack_from("<H", data, len(NPY_MAGIC))
+    return data[len(NPY_MAGIC) + 2 + header_length :]
@@ -0,0 +1,203 @@
+"""
+Persistent index of a checkout's relationships
+
+A RepositoryIndexer run is lost when the bridge restarts, so the first review of
+every repository afterwards parses the whole checkout again. IndexStore keeps the
+relationship columns and string table of a CompactRelationships, together with
+the state (mtime, size, blob SHA) of every indexed file, in one file that is
+memory-mapped on startup: loading reads a small header and the columns are used
+in place, so only the files changed since the last save are parsed again.
+
+Layout (native byte order, recorded in the header):
+
+    MAGIC | version (u32) | header length (u32) | JSON header | padding
+    | column sections ... | string section
+
+Every section starts on an 8 byte boundary at the offset the JSON header gives.
+The string section holds the UTF-8 strings joined by NUL bytes. A file of another
+version, byte order or layout, or one that is truncated, is ignored and the
+index is rebuilt. Saving writes a new file next to the old one and swaps it in
+with os.replace, so a crash leaves either the old or the new index.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Iterable, Mapping, Optional
+
+from pythonbridge.ast.compact import COLUMNS, CompactRelationships, StringTable
+from pythonbridge.ast.indexer import FileState, Manifest
+
+MAGIC = b"SNPRIDX\n"
+INDEX_VERSION = 1
+PREFIX = struct.Struct("<II")
+ALIGNMENT = 8
+# Bytes per item of every column typecode, an index written with other sizes is ignored
+ITEMSIZES = {code: array(code).itemsize for code in sorted(set(COLUMNS.values()))}
+
+
+class IndexStore:
+    """Relationships and file states of a checkout, saved to a memory-mapped file.
+
+    Attributes:
+        path (Path): Where the index is stored
+        relationships (CompactRelationships): Records of every indexed file
+        manifest (Manifest): State of every indexed file, for RepositoryIndexer
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.relationships = CompactRelationships()
+        self.manifest = Manifest()
+        self.load()
+
+    def load(self) -> bool:
+        """Map the saved index, keeping an empty one when it is missing or unusable
+
+        Returns:
+            bool: Whether a saved index was loaded
+        """
+        try:
+            with open(self.path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # missing, or empty (which can not be mapped)
+            return False
+
+        view = None
+        columns = {}
+        try:
+            header = _read_header(mapped)
+            if header is not None:
+                view = memoryview(mapped)
+                for name, typecode in COLUMNS.items():
+                    offset, nbytes = header["sections"][name]
+                    columns[name] = view[offset : offset + nbytes].cast(typecode)
+                offset, nbytes = header["sections"]["strings"]
+                joined = bytes(view[offset : offset + nbytes]).decode("utf8")
+                strings = joined.split("\0") if header["strings"] else []
+                if len(strings) != header["strings"]:
+                    header = None
+        except (ValueError, KeyError, TypeError, struct.error):
+            header = None
+        finally:
+            # the column memoryviews keep the mapping open as long as they are used
+            if view is not None:
+                view.release()
+        if header is None:
+            # the mapping can only be closed once no column refers to it
+            for column in columns.values():
+                column.release()
+            mapped.close()
+            return False
+
+        self.relationships = CompactRelationships(
+            StringTable(strings),
+            columns,
+            {path: tuple(span) for path, span in header["ranges"].items()},
+        )
+        self.manifest.files = {
+            path: FileState(*state) for path, state in header["states"].items()
+        }
+        return True
+
+    def update(
+        self, results: Iterable[tuple[str, Mapping]], removed: Iterable[str] = ()
+    ) -> Iterable[tuple[str, Mapping]]:
+        """Record a stream of (path, relationships), passing every item on
+
+        Args:
+            results (Iterable[tuple[str, Mapping]]): Changed files, like RepositoryIndexer.index()
+            removed (Iterable[str]): Files to drop, read after results is consumed
+                (a callable returning them is also accepted)
+
+        Yields:
+            tuple[str, Mapping]: The items of results, once recorded
+        """
+        for file_path, relationships in results:
+            self.relationships.add(file_path, relationships)
+            yield file_path, relationships
+        for file_path in removed() if callable(removed) else removed:
+            self.relationships.remove(file_path)
+
+    def save(self) -> None:
+        """Write the index atomically, replacing the saved one"""
+        relationships = self.relationships
+        strings = b"\0".join(s.encode("utf8") for s in relationships.strings.strings)
+        sections = [
+            (name, memoryview(column).cast("B"))
+            for name, column in relationships.columns.items()
+        ]
+        sections.append(("strings", memoryview(strings)))
+
+        # the header holds the section offsets, which depend on the header's length:
+        # lay out the sections after a header of the right size, grown until it fits
+        header = {}
+        size = 0
+        while True:
+            offset = _align(len(MAGIC) + PREFIX.size + size)
+            header = {
+                "byteorder": sys.byteorder,
+                "itemsizes": ITEMSIZES,
+                "records": len(relationships),
+                "strings": len(relationships.strings),
+                "ranges": {
+                    path: relationships.span(path) for path in relationships.files
+                },
+                "states": {
+                    path: [state.mtime_ns, state.size, state.sha]
+                    for path, state in self.manifest.files.items()
+                },
+                "sections": {},
+            }
+            for name, data in sections:
+                header["sections"][name] = [offset, data.nbytes]
+                offset = _align(offset + data.nbytes)
+            encoded = json.dumps(header).encode("utf8")
+            if len(encoded) <= size:
+                break
+            size = len(encoded)
+        encoded = encoded.ljust(size)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as file:
+            file.write(MAGIC + PREFIX.pack(INDEX_VERSION, size) + encoded)
+            for name, data in sections:
+                file.write(b"\0" * (header["sections"][name][0] - file.tell()))
+                file.write(data)
+            file.flush()
+            # the index is only worth swapping in once it is on disk
+            os.fsync(file.fileno())
+        # a mapped previous index stays readable, it is only unlinked
+        os.replace(tmp_path, self.path)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _read_header(mapped: mmap.mmap) -> Optional[dict]:
+    # the JSON header of a mapped index, None when this build can not use it
+    if mapped[: len(MAGIC)] != MAGIC:
+        return None
+    version, size = PREFIX.unpack_from(mapped, len(MAGIC))
+    if version != INDEX_VERSION:
+        return None
+    start = len(MAGIC) + PREFIX.size
+    header = json.loads(mapped[start : start + size])
+    if header["byteorder"] != sys.byteorder or header["itemsizes"] != ITEMSIZES:
+        return None
+    for name in [*COLUMNS, "strings"]:
+        offset, nbytes = header["sections"][name]
+        if offset + nbytes > len(mapped):
+            # truncated
+            return None
+    for name, typecode in COLUMNS.items():
+        if header["sections"][name][1] != header["records"] * ITEMSIZES[typecode]:
+            return None
+    return header
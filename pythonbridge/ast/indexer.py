@@ -0,0 +1,265 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+from pythonbridge.ast.ast_manager import AST_manager, blob_sha
+from pythonbridge.ast.compact import RelationshipsView
+from pythonbridge.core import config
+
+# Directories that never contain source worth indexing
+SKIP_DIRS = frozenset(
+    {".git", ".hg", ".svn", "__pycache__", ".venv", "venv", "node_modules", ".tox"}
+)
+
+MANIFEST_VERSION = 1
+
+# Most files a worker gets per task, small batches keep results streaming while
+# saving one round trip to the pool per file
+MAX_BATCH_SIZE = 16
+
+
+@dataclass
+class FileState:
+    """What a file looked like when it was last indexed.
+
+    Attributes:
+        mtime_ns (int): Modification time in nanoseconds
+        size (int): Size in bytes
+        sha (str): Blob SHA of the content
+    """
+
+    mtime_ns: int
+    size: int
+    sha: str
+
+
+class Manifest:
+    """State of every indexed file of a previous run, stored as JSON.
+
+    Attributes:
+        path (Optional[Path]): Where the manifest is stored (None keeps it in memory)
+        files (dict[str, FileState]): State by path relative to the repository root
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = Path(path) if path else None
+        self.files: dict[str, FileState] = {}
+        if self.path is not None and self.path.exists():
+            try:
+                data = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                data = {}
+            if data.get("version") == MANIFEST_VERSION:
+                self.files = {
+                    name: FileState(**state) for name, state in data["files"].items()
+                }
+
+    def save(self) -> None:
+        """Write the manifest atomically, a crash never leaves a half-written file"""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {
+                    "version": MANIFEST_VERSION,
+                    "files": {
+                        name: asdict(state) for name, state in self.files.items()
+                    },
+                }
+            )
+        )
+        os.replace(tmp_path, self.path)
+
+
+def iter_python_files(root: Path) -> Iterator[Path]:
+    """Every .py file below root, skipping VCS, cache and virtualenv directories"""
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = sorted(d for d in dir_names if d not in SKIP_DIRS)
+        for file_name in sorted(file_names):
+            if file_name.endswith(".py"):
+                yield Path(dir_path) / file_name
+
+
+# One parser per worker process, created by the pool initializer
+_worker_manager: Optional[AST_manager] = None
+
+
+def _init_worker() -> None:
+    global _worker_manager
+    # the content-hash tree cache is useless here, every file is parsed once
+    _worker_manager = AST_manager(max_cached_trees=0)
+
+
+def index_file(
+    path: str, rel_path: str, previous_sha: Optional[str] = None
+) -> tuple[str, Optional[FileState], Optional[RelationshipsView]]:
+    """Parse one file and extract its relationships
+
+    The relationships are extracted as compact records (see ast.compact), which
+    travel back from a worker as a few arrays instead of a dict per relationship.
+
+    Args:
+        path (str): Path of the file to read
+        rel_path (str): Path relative to the repository root, used as the file name
+        previous_sha (Optional[str]): Blob SHA of the last indexed version
+
+    Returns:
+        tuple[str, Optional[FileState], Optional[RelationshipsView]]: The relative path, the
+            new state of the file (None when it can not be read) and its relationships as a
+            read-only get_relationships dict (None when the content did not change)
+    """
+    global _worker_manager
+    if _worker_manager is None:
+        _init_worker()
+
+    try:
+        stat = os.stat(path)
+        with open(path, "rb") as file:
+            content = file.read()
+    except OSError:
+        # deleted or unreadable since the directory walk
+        return rel_path, None, None
+    state = FileState(stat.st_mtime_ns, stat.st_size, blob_sha(content))
+    if state.sha == previous_sha:
+        return rel_path, state, None
+
+    _worker_manager.create_ast(rel_path, content)
+    relationships = _worker_manager.get_compact_relationships(file_path=rel_path)
+    # drop the file so the worker does not keep every source it has seen
+    _worker_manager.files.pop(rel_path, None)
+    return rel_path, state, relationships.view(rel_path)
+
+
+def index_files(
+    jobs: list[tuple[str, str, Optional[str]]],
+) -> list[tuple[str, Optional[FileState], Optional[RelationshipsView]]]:
+    """index_file for a batch of (path, rel_path, previous_sha) jobs"""
+    return [index_file(*job) for job in jobs]
+
+
+class RepositoryIndexer:
+    """Indexes the relationships of every Python file of a checkout in parallel.
+
+    Files are spread over a process pool with one tree-sitter parser per worker
+    and the results are streamed back as soon as each file is done. Files whose
+    mtime and size (or, failing that, content hash) match the previous run's
+    manifest are skipped.
+
+    Attributes:
+        root (Path): Root directory of the checkout
+        manifest (Manifest): File states of the previous run, updated while indexing
+        workers (int): Number of worker processes (1 indexes in this process)
+        removed (list[str]): Files of the previous run that no longer exist or can not be read
+    """
+
+    def __init__(
+        self,
+        root: str,
+        manifest_path: Optional[str] = None,
+        workers: Optional[int] = None,
+        manifest: Optional[Manifest] = None,
+    ) -> None:
+        """
+        Args:
+            root (str): Root directory of the checkout
+            manifest_path (Optional[str]): JSON manifest of the previous run (None to always index everything)
+            workers (Optional[int]): Number of worker processes, config.INDEX_WORKERS (or the CPU count) when not given
+            manifest (Optional[Manifest]): Manifest to use instead of loading manifest_path (e.g. an IndexStore's)
+        """
+        self.root = Path(root)
+        self.manifest = manifest if manifest is not None else Manifest(manifest_path)
+        self.workers = workers or config.INDEX_WORKERS or os.cpu_count() or 1
+        self.removed: list[str] = []
+
+    def index(self) -> Iterator[tuple[str, dict]]:
+        """Index the checkout, yielding results in completion order
+
+        The manifest is saved once the generator finishes or is closed, so files
+        that were already yielded are skipped next time even after an early stop.
+
+        Yields:
+            tuple[str, dict]: The path relative to root and the relationships of a changed file
+        """
+        previous = self.manifest.files
+        current: dict[str, FileState] = {}
+        jobs = []
+
+        for path in iter_python_files(self.root):
+            rel_path = path.relative_to(self.root).as_posix()
+            state = previous.get(rel_path)
+            if state is not None:
+                try:
+                    stat = path.stat()
+                except OSError:
+                    # deleted since the directory walk
+                    continue
+                if stat.st_mtime_ns == state.mtime_ns and stat.st_size == state.size:
+                    current[rel_path] = state
+                    continue
+            jobs.append((str(path), rel_path, state.sha if state else None))
+
+        self.removed = sorted(set(previous) - set(current) - {job[1] for job in jobs})
+        self.manifest.files = current
+        try:
+            for rel_path, state, relationships in self._run(jobs):
+                if state is None:
+                    if rel_path in previous:
+                        self.removed.append(rel_path)
+                    continue
+                current[rel_path] = state
+                if relationships is not None:
+                    yield rel_path, relationships
+        finally:
+            self.manifest.save()
+
+    def _run(
+        self, jobs: list[tuple[str, str, Optional[str]]]
+    ) -> Iterator[tuple[str, Optional[FileState], Optional[RelationshipsView]]]:
+        if self.workers == 1 or len(jobs) <= 1:
+            for job in jobs:
+                yield index_file(*job)
+            return
+
+        # forkserver (where available) keeps workers from inheriting the bridge's threads
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context(
+            "forkserver" if "forkserver" in methods else "spawn"
+        )
+        workers = min(self.workers, len(jobs))
+        # about four batches per worker so a few big files do not leave the others idle
+        size = max(1, min(MAX_BATCH_SIZE, len(jobs) // (workers * 4)))
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=_init_worker
+        ) as executor:
+            futures = [
+                executor.submit(index_files, jobs[i : i + size])
+                for i in range(0, len(jobs), size)
+            ]
+            try:
+                for future in as_completed(futures):
+                    yield from future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+
+def index_repository(
+    root: str, manifest_path: Optional[str] = None, workers: Optional[int] = None
+) -> Iterator[tuple[str, dict]]:
+    """Index every changed Python file below root
+
+    Args:
+        root (str): Root directory of the checkout
+        manifest_path (Optional[str]): JSON manifest of the previous run
+        workers (Optional[int]): Number of worker processes
+
+    Yields:
+        tuple[str, dict]: The path relative to root and the relationships of a changed file
+    """
+    yield from RepositoryIndexer(root, manifest_path, workers).index()
@@ -0,0 +1,170 @@
+"""
+AST relationship extraction benchmark
+
+Times AST_manager.get_relationships on synthetic Python files and compares it
+with the previous multi-pass implementation (a query plus one traverse_tree per
+class and function body), kept below as the reference.
+
+Usage:
+    PYTHONPATH=. python -m pythonbridge.benchmarks.bench_ast [lines | file.py ...]
+"""
+
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from tree_sitter import Query, QueryCursor
+
+from pythonbridge.ast.ast_manager import AST_manager
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def synthetic_source(lines: int) -> bytes:
+    """Build a Python file of roughly the given number of lines
+
+    The file mixes imports, standalone functions calling each other, classes with
+    methods and nested functions, the shapes get_relationships has to handle.
+    """
+    out = ["import os", "import sys", "from pathlib import Path", ""]
+    i = 0
+    while len(out) < lines:
+        out += [
+            f"def function_{i}(value, path=Path('.')):",
+            f"    result = helper_{i}(value)",
+            f"    item = Item{i}(result)",
+            "    def nested(x):",
+            "        return os.path.join(str(x), 'a')",
+            f"    return nested(item.process(function_{max(i - 1, 0)}(value)))",
+            "",
+            f"class Item{i}:",
+            "    def __init__(self, value):",
+            "        self.value = value",
+            "",
+            "    def process(self, other):",
+            "        return sorted([self.value, other])",
+            "",
+        ]
+        i += 1
+    return "\n".join(out[:lines]).encode("utf8")
+
+
+def legacy_relationships(manager: AST_manager) -> dict:
+    """The multi-pass get_relationships this benchmark compares against"""
+    relationships = defaultdict(list)
+    query = Query(
+        manager.language,
+        """
+        (import_statement) @import
+        (import_from_statement) @import_from
+
+        (function_definition
+        name: (identifier) @function.def
+        body: (block) @function.block)
+
+        (class_definition
+        name: (identifier) @class.def
+        body: (block) @class.block)
+        """,
+    )
+    captures = QueryCursor(query).captures(manager.tree.root_node)
+
+    for key, capture in (
+        ("imports", "import"),
+        ("imports_from", "import_from"),
+        ("class_def", "class.def"),
+    ):
+        for node in captures.get(capture, []):
+            relationships[key].append(
+                {
+                    "caller": manager.current_file_name,
+                    "callee": node.text.decode("utf8"),
+                    "location": (node.start_point, node.end_point),
+                }
+            )
+
+    for node in captures.get("function.def", []):
+        if manager.check_parent_is_class(node):
+            continue
+        relationships["function_def"].append(
+            {
+                "caller": manager.current_file_name,
+                "callee": node.text.decode("utf8"),
+                "location": (node.start_point, node.end_point),
+            }
+        )
+
+    for i, class_name_node in enumerate(captures.get("class.def", [])):
+        class_name = class_name_node.text.decode("utf8")
+        for node in manager.traverse_tree(captures["class.block"][i]):
+            if node.type == "function_definition":
+                method_name_node = node.child_by_field_name("name")
+                if method_name_node:
+                    relationships["method"].append(
+                        {
+                            "caller": class_name,
+                            "callee": method_name_node.text.decode("utf8"),
+                            "type": "class_method",
+                            "location": (node.start_point, node.end_point),
+                        }
+                    )
+
+    for i, func_name_node in enumerate(captures.get("function.def", [])):
+        if manager.check_parent_is_class(func_name_node):
+            continue
+        func_name = func_name_node.text.decode("utf8")
+        for node in manager.traverse_tree(captures["function.block"][i]):
+            if node.type == "call":
+                function_name_node = node.child_by_field_name("function")
+                if function_name_node:
+                    callee_name = function_name_node.text.decode("utf8")
+                    if callee_name:
+                        kind = "instantiation" if callee_name[0].isupper() else "call"
+                        relationships[kind].append(
+                            {
+                                "caller": func_name,
+                                "callee": callee_name,
+                                "type": "class_instantiation"
+                                if kind == "instantiation"
+                                else "function_call",
+                                "location": (node.start_point, node.end_point),
+                            }
+                        )
+
+    return dict(relationships)
+
+
+def best_of(fn, repeat: int) -> float:
+    """Fastest wall clock time of fn over repeat runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(inputs: list[str]) -> None:
+    manager = AST_manager()
+    print(f"{'lines':>8} {'parse':>10} {'legacy':>10} {'single':>10} {'speedup':>8}")
+    for arg in inputs:
+        # a number is the size of a synthetic file, anything else a real Python file
+        if arg.isdigit():
+            source = synthetic_source(int(arg))
+        else:
+            source = Path(arg).read_bytes()
+        lines = source.count(b"\n") + 1
+        repeat = 5 if lines <= 10_000 else 2
+        parse = best_of(lambda: manager.parser.parse(source), repeat)
+        manager.create_ast(f"bench_{lines}.py", source)
+        legacy = best_of(lambda: legacy_relationships(manager), repeat)
+        single = best_of(manager.get_relationships, repeat)
+        print(
+            f"{lines:>8} {parse * 1000:>8.1f}ms {legacy * 1000:>8.1f}ms "
+            f"{single * 1000:>8.1f}ms {legacy / single:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or [str(size) for size in DEFAULT_SIZES])
@@ -0,0 +1,138 @@
+"""
+Bridge wire format benchmark
+
+Times the Python side of a round of bridge messages: reading and decoding the
+requests from stdin, then encoding and writing the responses to stdout. The
+original protocol (text JSON lines parsed with json.loads, one print and flush
+per response) is compared with the "line" and "packet" framings of
+core.framing (binary buffered streams, orjson when installed, one flush per
+batch of queued responses).
+
+Requests are read from memory so parsing is measured, not the pipe; responses
+go to os.devnull so each flush still costs a write system call.
+
+Usage:
+    PYTHONPATH=. python -m pythonbridge.benchmarks.bench_bridge [messages]
+"""
+
+import io
+import json
+import os
+import sys
+
+from pythonbridge.benchmarks.bench_ast import best_of
+from pythonbridge.core import framing
+from pythonbridge.core.framing import get_framing
+
+DEFAULT_MESSAGES = 2_000
+
+
+def hello_message(i: int) -> tuple[dict, dict]:
+    """A tiny request and response, the floor of the protocol overhead"""
+    return (
+        {"type": "hello", "count": i, "_id": i},
+        {"status": "ok", "response": f"hello from python {i}", "error": None, "_id": i},
+    )
+
+
+def review_message(i: int, files: int = 20) -> tuple[dict, dict]:
+    """A PR webhook payload and the reviews of its files, roughly 30KB and 40KB"""
+    user = {"login": "octocat", "id": 1, "type": "User", "site_admin": False}
+    payload = {
+        "action": "opened",
+        "number": i,
+        "pull_request": {
+            "title": "Refactor the indexer",
+            "body": "Splits the manifest handling out of the worker. " * 40,
+            "user": user,
+            "head": {"ref": "feature", "sha": "a" * 40, "user": user},
+            "base": {"ref": "main", "sha": "b" * 40, "user": user},
+            "labels": [{"name": f"label-{n}", "color": "ededed"} for n in range(5)],
+        },
+        "repository": {
+            "full_name": "owner/repo",
+            "description": "A repository with a fairly long description. " * 10,
+            "owner": user,
+            "topics": ["python", "elixir", "review"],
+        },
+        "installation": {"id": 12345},
+        "sender": user,
+        "patch": "".join(
+            f"@@ -{n},3 +{n},4 @@\n-old line {n}\n+new line {n} ñ\n" for n in range(300)
+        ),
+    }
+    reviews = [
+        {
+            "filename": f"pythonbridge/module_{n}.py",
+            "review": "Consider handling the error case here.\n" * 50,
+        }
+        for n in range(files)
+    ]
+    return (
+        {"type": "main", "payload": payload, "_id": i},
+        {"status": "ok", "response": reviews, "error": None, "_id": i},
+    )
+
+
+def legacy_round(requests: bytes, responses: list[dict], out) -> None:
+    """The original protocol: text lines in, a print and flush per response"""
+    for line in io.TextIOWrapper(io.BytesIO(requests), encoding="utf8"):
+        if line.strip():
+            json.loads(line)
+    for response in responses:
+        print(json.dumps(response), file=out)
+        out.flush()
+
+
+def framed_round(name: str, requests: bytes, responses: list[dict], out) -> None:
+    """core.framing: binary frames in, responses written in batches"""
+    wire = get_framing(name)
+    for frame in wire.read(io.BytesIO(requests)):
+        framing.decode(frame)
+    # the writer thread flushes everything queued at once, batches of 8 are modest
+    for start in range(0, len(responses), 8):
+        out.write(
+            b"".join(
+                wire.frame(framing.encode(r)) for r in responses[start : start + 8]
+            )
+        )
+        out.flush()
+
+
+def main(count: int) -> None:
+    codec = "orjson" if framing.orjson is not None else "json"
+    print(f"codec: {codec}, {count} messages per round")
+    print(
+        f"{'payload':>8} {'size':>9} {'legacy':>10} {'line':>10} "
+        f"{'packet':>10} {'speedup':>8}"
+    )
+    with open(os.devnull, "w") as text_out, open(os.devnull, "wb") as binary_out:
+        for label, factory, n in (
+            ("hello", hello_message, count),
+            ("review", review_message, max(1, count // 20)),
+        ):
+            messages = [factory(i) for i in range(n)]
+            requests = [m[0] for m in messages]
+            responses = [m[1] for m in messages]
+            lines = "".join(json.dumps(r) + "\n" for r in requests).encode()
+            packets = b"".join(
+                get_framing("packet").frame(framing.encode(r)) for r in requests
+            )
+            size = (len(lines) + sum(len(json.dumps(r)) for r in responses)) // n
+
+            legacy = best_of(lambda: legacy_round(lines, responses, text_out), 3)
+            line = best_of(
+                lambda: framed_round("line", lines, responses, binary_out), 3
+            )
+            packet = best_of(
+                lambda: framed_round("packet", packets, responses, binary_out), 3
+            )
+            print(
+                f"{label:>8} {size:>7}B/msg {legacy * 1000:>8.1f}ms "
+                f"{line * 1000:>8.1f}ms {packet * 1000:>8.1f}ms "
+                f"{legacy / packet:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_MESSAGES)
@@ -0,0 +1,76 @@
+"""
+Code graph query benchmark
+
+Extracts the relationships of synthetic files (see bench_ast), loads them into a
+CodeGraph, then times "who calls X" and "what does X reach" against the linear
+scan over every file's relationships they replace, and the replacement of one
+file after it changed.
+
+Usage:
+    PYTHONPATH=. python -m pythonbridge.benchmarks.bench_code_graph [files] [lines]
+"""
+
+import sys
+import time
+
+from pythonbridge.ast.ast_manager import AST_manager
+from pythonbridge.ast.code_graph import CodeGraph, call_name
+from pythonbridge.benchmarks.bench_ast import best_of, synthetic_source
+
+DEFAULT_FILES = 200
+DEFAULT_LINES = 1_000
+
+
+def scan_callers(files: dict[str, dict], name: str) -> set[str]:
+    """The query without a graph: every call of every file is looked at"""
+    return {
+        entry["caller"]
+        for relationships in files.values()
+        for relation in ("call", "instantiation")
+        for entry in relationships.get(relation, [])
+        if call_name(entry["callee"]) == name
+    }
+
+
+def main(count: int, lines: int) -> None:
+    manager = AST_manager()
+    source = synthetic_source(lines)
+    files = {}
+    for i in range(count):
+        # the same shapes with different names in every file, chained across files
+        text = source.replace(b"function_", f"f{i}_".encode()).replace(
+            b"helper_", f"f{i + 1}_".encode()
+        )
+        manager.create_ast(f"pkg/module_{i}.py", text)
+        files[f"pkg/module_{i}.py"] = manager.get_relationships()
+
+    start = time.perf_counter()
+    graph = CodeGraph()
+    graph.update(files.items())
+    build = time.perf_counter() - start
+    stats = graph.stats()
+    print(
+        f"{stats['files']} files, {stats['symbols']} symbols, {stats['edges']} edges, "
+        f"built in {build * 1000:.1f}ms"
+    )
+
+    name = "f1_3"
+    scan = best_of(lambda: scan_callers(files, name), 3)
+    callers = best_of(lambda: graph.callers(name), 100)
+    reach = best_of(lambda: graph.reachable("f0_3", max_depth=3), 100)
+    dependents = best_of(lambda: graph.dependents(name, max_depth=3), 100)
+    replace = best_of(
+        lambda: graph.add_file("pkg/module_7.py", files["pkg/module_7.py"]), 10
+    )
+    print(f"{'callers (linear scan)':>24} {scan * 1000:10.3f}ms")
+    print(f"{'callers':>24} {callers * 1000:10.3f}ms {scan / callers:8.0f}x")
+    print(f"{'reachable depth 3':>24} {reach * 1000:10.3f}ms")
+    print(f"{'dependents depth 3':>24} {dependents * 1000:10.3f}ms")
+    print(f"{'replace one file':>24} {replace * 1000:10.3f}ms")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FILES,
+        int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LINES,
+    )
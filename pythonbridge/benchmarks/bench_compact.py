@@ -0,0 +1,83 @@
+"""
+Relationship record memory benchmark
+
+Extracts the relationships of synthetic files (see bench_ast) once as the dicts of
+get_relationships and once into a single CompactRelationships, and compares the
+memory each keeps alive (measured with tracemalloc) and the time extraction takes.
+
+Usage:
+    PYTHONPATH=. python -m pythonbridge.benchmarks.bench_compact [files] [lines]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from pythonbridge.ast.ast_manager import AST_manager
+from pythonbridge.ast.compact import CompactRelationships
+from pythonbridge.benchmarks.bench_ast import synthetic_source
+
+DEFAULT_FILES = 200
+DEFAULT_LINES = 1_000
+
+
+def measure(build) -> tuple[object, int, float]:
+    """Run build, returning its result, the bytes it keeps allocated and its time
+
+    The time comes from a second, untraced run (tracemalloc slows allocations down).
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    build()
+    return result, size, time.perf_counter() - start
+
+
+def main(count: int, lines: int) -> None:
+    manager = AST_manager()
+    source = synthetic_source(lines)
+    paths = [f"pkg/module_{i}.py" for i in range(count)]
+    for i, path in enumerate(paths):
+        # distinct names in every file, as in a real repository
+        manager.create_ast(path, source.replace(b"function_", f"f{i}_".encode()))
+
+    def dicts() -> dict:
+        files = {}
+        for path in paths:
+            manager._select(manager.files[path])
+            files[path] = manager.get_relationships()
+        return files
+
+    def compact() -> CompactRelationships:
+        records = CompactRelationships()
+        for path in paths:
+            manager._select(manager.files[path])
+            manager.get_compact_relationships(records, path)
+        return records
+
+    files, dict_bytes, dict_time = measure(dicts)
+    records, compact_bytes, compact_time = measure(compact)
+    assert len(records) == sum(len(v) for f in files.values() for v in f.values())
+
+    print(f"{count} files of {lines} lines, {len(records)} relationships")
+    print(f"{'':>10} {'memory':>10} {'per record':>11} {'extract':>10}")
+    for name, size, elapsed in (
+        ("dicts", dict_bytes, dict_time),
+        ("compact", compact_bytes, compact_time),
+    ):
+        print(
+            f"{name:>10} {size / 2**20:8.1f}MB {size / len(records):9.0f}B "
+            f"{elapsed * 1000:8.0f}ms"
+        )
+    print(f"compact uses {dict_bytes / compact_bytes:.1f}x less memory")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FILES,
+        int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LINES,
+    )
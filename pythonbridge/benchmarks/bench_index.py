@@ -0,0 +1,33 @@
+"""
+Repository indexing benchmark
+
+Indexes a directory once in this process and once with a process pool, without
+a manifest, so every file is parsed in both runs.
+
+Usage:
+    PYTHONPATH=. python -m pythonbridge.benchmarks.bench_index <directory> [workers]
+"""
+
+import os
+import sys
+import time
+
+from pythonbridge.ast.indexer import RepositoryIndexer
+
+
+def run(root: str, workers: int) -> tuple[int, float]:
+    start = time.perf_counter()
+    files = sum(1 for _ in RepositoryIndexer(root, workers=workers).index())
+    return files, time.perf_counter() - start
+
+
+def main(root: str, workers: int) -> None:
+    files, serial = run(root, 1)
+    _, parallel = run(root, workers)
+    print(f"{files} files")
+    print(f"{'1 worker':>12} {serial:8.2f}s")
+    print(f"{f'{workers} workers':>12} {parallel:8.2f}s {serial / parallel:6.2f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1)
@@ -0,0 +1,49 @@
+"""
+Restart benchmark of the persistent index
+
+Builds the call graph of a directory from scratch while saving its IndexStore,
+then times what a bridge restart costs: a new RepositoryGraph that maps the
+saved index, with nothing changed, and with one file changed.
+
+Usage:
+    PYTHONPATH=. python -m pythonbridge.benchmarks.bench_index_store <directory> [workers]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from pythonbridge.ast.indexer import iter_python_files
+from pythonbridge.core import config
+from pythonbridge.core.context import RepositoryGraph
+
+
+def refresh(root: str, store_path: str) -> float:
+    start = time.perf_counter()
+    RepositoryGraph(root, store_path).refresh()
+    return time.perf_counter() - start
+
+
+def main(root: str, workers: int) -> None:
+    config.INDEX_WORKERS = workers
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = str(Path(tmp) / "repo.idx")
+        cold = refresh(root, store_path)
+        warm = refresh(root, store_path)
+
+        # touch one file: a new mtime is enough for it to be parsed again
+        changed = next(iter_python_files(Path(root)))
+        os.utime(changed)
+        one = refresh(root, store_path)
+
+        size = os.path.getsize(store_path)
+    print(f"index of {root}: {size / 2**20:.1f}MB")
+    print(f"{'from scratch':>22} {cold:8.2f}s")
+    print(f"{'restart, no change':>22} {warm:8.2f}s {cold / warm:7.1f}x")
+    print(f"{'restart, one changed':>22} {one:8.2f}s {cold / one:7.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1)
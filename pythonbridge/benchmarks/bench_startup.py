@@ -0,0 +1,113 @@
+"""
+Bridge cold start benchmark
+
+Measures what a restarted bridge costs before it is useful:
+
+- the import time of pythonbridge.main, from `python -X importtime`, with the
+  slowest modules it pulls in
+- the time from spawning `python -m pythonbridge.main` to the answer of its
+  first "hello", the health check Elixir sends after a restart
+- the time a "warmup" message then takes to load the review modules
+
+With --max-ms the run fails when the first answer takes longer, so a heavy
+import creeping back into the startup path is caught.
+
+Usage:
+    PYTHONPATH=. python -m pythonbridge.benchmarks.bench_startup [--runs 5] [--max-ms 300]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def bridge_env() -> dict:
+    """Environment of a bridge started from the project root"""
+    return {**os.environ, "PYTHONPATH": str(PROJECT_ROOT), "BRIDGE_FRAMING": "line"}
+
+
+def import_times(module: str = "pythonbridge.main") -> list[tuple[int, str]]:
+    """Cumulative import time of module and everything it imports
+
+    Returns:
+        list[tuple[int, str]]: (microseconds, module) pairs, slowest first
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=bridge_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times.append((int(cumulative), name.strip()))
+    return sorted(times, reverse=True)
+
+
+def first_response_times() -> tuple[float, float]:
+    """Spawn a bridge, then time its first "hello" and a "warmup" after it
+
+    Returns:
+        tuple[float, float]: Seconds from spawn to the hello answer, and seconds
+            the warmup took once hello was answered
+    """
+    start = time.perf_counter()
+    bridge = subprocess.Popen(
+        [sys.executable, "-m", "pythonbridge.main"],
+        env=bridge_env(),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    try:
+        bridge.stdin.write(b'{"type": "hello", "_id": 1}\n')
+        bridge.stdin.flush()
+        json.loads(bridge.stdout.readline())
+        hello = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bridge.stdin.write(b'{"type": "warmup", "_id": 2}\n')
+        bridge.stdin.flush()
+        json.loads(bridge.stdout.readline())
+        warm = time.perf_counter() - start
+    finally:
+        bridge.stdin.close()
+        bridge.wait(timeout=30)
+    return hello, warm
+
+
+def main(runs: int, max_ms: float | None, top: int) -> int:
+    times = import_times()
+    print(f"import pythonbridge.main: {times[0][0] / 1000:.1f}ms, slowest imports:")
+    for micros, name in times[1 : top + 1]:
+        print(f"  {micros / 1000:>8.1f}ms  {name}")
+
+    hellos, warmups = zip(*(first_response_times() for _ in range(runs)))
+    hello = statistics.median(hellos) * 1000
+    print(f"spawn to first hello: {hello:.1f}ms (median of {runs})")
+    print(f"warmup of the review modules: {statistics.median(warmups) * 1000:.1f}ms")
+
+    if max_ms is not None and hello > max_ms:
+        print(f"FAIL: first hello took over {max_ms:.0f}ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="bridges to spawn")
+    parser.add_argument("--max-ms", type=float, help="fail above this first hello")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports shown")
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.max_ms, args.top))
@@ -0,0 +1,456 @@
+"""
+Benchmark suite of the bridge's hot paths
+
+Times the operations every review goes through and writes the results as JSON,
+so a run can be compared with a saved baseline and regressions show up before
+they are merged:
+
+- AST_manager.create_ast, get_relationships and get_compact_relationships on
+  synthetic files (see bench_ast) of 1k to 100k lines
+- handle_msg dispatch (main.respond) and the framing's JSON encoding and
+  decoding of large review payloads (see bench_bridge)
+- review_pr end to end, with GitHub and Groq replaced by fakes that answer
+  after a configurable latency, so the pipeline's own overhead and its
+  concurrency are measured without the network
+
+Every benchmark runs once to warm up, then the given number of timed rounds.
+Times are per operation, in seconds. A benchmark is a regression when its
+median exceeds the baseline's by more than the threshold (the process exits
+with status 1 then).
+
+Usage:
+    PYTHONPATH=. python -m pythonbridge.benchmarks.suite [--quick] [-k name]
+        [--output results.json] [--baseline baseline.json] [--threshold 1.25]
+        [--github-latency seconds] [--llm-latency seconds] [--files count]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, ContextManager, Iterator, Optional
+from unittest.mock import patch
+
+from pythonbridge.benchmarks.bench_ast import synthetic_source
+from pythonbridge.benchmarks.bench_bridge import review_message
+
+RESULTS_VERSION = 1
+
+# A median this many times the baseline's is a regression (and 1 / this a speedup)
+DEFAULT_THRESHOLD = 1.25
+
+AST_SIZES = [1_000, 10_000, 100_000]
+
+# Messages handled per timed round of the dispatch benchmarks
+DISPATCH_MESSAGES = 1_000
+
+# Reviewed files in the response of the payload encoding benchmarks (about 1MB)
+PAYLOAD_FILES = 500
+
+# Latencies of the fakes in seconds (GitHub: per call and per page of files)
+DEFAULT_GITHUB_LATENCY = 0.05
+DEFAULT_LLM_LATENCY = 0.2
+DEFAULT_REVIEW_FILES = 40
+
+
+@dataclass
+class Benchmark:
+    """A timed operation of the suite
+
+    Attributes:
+        name (str): Unique name, with its parameters in brackets
+        setup (Callable[[argparse.Namespace], ContextManager[Callable]]): Prepares the
+            inputs from the command line options and yields the operation to time
+        rounds (int): Timed runs, after one warm-up run
+        operations (int): Operations one run performs, times are divided by it
+        quick (bool): Whether --quick runs it
+    """
+
+    name: str
+    setup: Callable[[argparse.Namespace], ContextManager[Callable]]
+    rounds: int = 5
+    operations: int = 1
+    quick: bool = True
+
+
+BENCHMARKS: list[Benchmark] = []
+
+
+def register(name: str, setup, **kwargs) -> None:
+    """Add a benchmark to the suite, see Benchmark for the arguments"""
+    BENCHMARKS.append(Benchmark(name, setup, **kwargs))
+
+
+@contextmanager
+def create_ast(lines: int, options: argparse.Namespace) -> Iterator[Callable]:
+    from pythonbridge.ast.ast_manager import AST_manager
+
+    source = synthetic_source(lines)
+    # without the tree cache every run parses the file again
+    manager = AST_manager(max_cached_trees=0)
+    yield lambda: manager.create_ast(f"bench_{lines}.py", source)
+
+
+@contextmanager
+def relationships(
+    lines: int, compact: bool, options: argparse.Namespace
+) -> Iterator[Callable]:
+    from pythonbridge.ast.ast_manager import AST_manager
+
+    manager = AST_manager()
+    manager.create_ast(f"bench_{lines}.py", synthetic_source(lines))
+    yield manager.get_compact_relationships if compact else manager.get_relationships
+
+
+@contextmanager
+def respond(options: argparse.Namespace) -> Iterator[Callable]:
+    from pythonbridge.main import respond
+
+    messages = [
+        {"type": "hello", "count": i, "_id": i} for i in range(DISPATCH_MESSAGES)
+    ]
+
+    def run():
+        for message in messages:
+            respond(message)
+
+    yield run
+
+
+@contextmanager
+def round_trip(options: argparse.Namespace) -> Iterator[Callable]:
+    from pythonbridge.core import framing
+    from pythonbridge.main import respond
+
+    # what the bridge loop does per message: decode the frame, dispatch, encode
+    frames = [
+        framing.encode({"type": "hello", "count": i, "_id": i})
+        for i in range(DISPATCH_MESSAGES)
+    ]
+
+    def run():
+        for frame in frames:
+            framing.encode(respond(framing.decode(frame)))
+
+    yield run
+
+
+@contextmanager
+def encode_payload(options: argparse.Namespace) -> Iterator[Callable]:
+    from pythonbridge.core import framing
+
+    _, response = review_message(0, files=PAYLOAD_FILES)
+    yield lambda: framing.encode(response)
+
+
+@contextmanager
+def decode_payload(options: argparse.Namespace) -> Iterator[Callable]:
+    from pythonbridge.core import framing
+
+    _, response = review_message(0, files=PAYLOAD_FILES)
+    data = framing.encode(response)
+    yield lambda: framing.decode(data)
+
+
+@dataclass
+class FakeFile:
+    """A file of a PR's diff, as PyGithub lists it"""
+
+    filename: str
+    status: str
+    patch: str
+
+
+def fake_patch(index: int, lines: int = 40) -> str:
+    """An added block of a few dozen lines"""
+    body = "".join(f"+    value_{n} = compute_{index}({n})\n" for n in range(lines))
+    return f"@@ -10,0 +11,{lines} @@ def function_{index}():\n{body}"
+
+
+class FakeGroq:
+    """Stands in for the Groq client, every completion arrives after latency seconds
+
+    Batched requests get a section per file, as the model is asked to answer them.
+    """
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        # client.chat.completions.with_raw_response.create
+        self.chat = self.completions = self.with_raw_response = self
+
+    def create(self, messages: list[dict], model: str, stream: bool = False):
+        from pythonbridge.llm.chunking import FILE_END, FILE_MARKER, FILE_START
+
+        time.sleep(self.latency)
+        message = messages[-1]["content"]
+        names = [m.group(2) for m in FILE_MARKER.finditer(message) if not m.group(1)]
+        text = "\n".join(
+            f"{FILE_START.format(name=name)}\nLooks good.\n{FILE_END.format(name=name)}"
+            for name in names
+        )
+        completion = SimpleNamespace(
+            usage=SimpleNamespace(
+                prompt_tokens=len(message) // 4, completion_tokens=len(text) // 4
+            ),
+            choices=[
+                SimpleNamespace(message=SimpleNamespace(content=text or "Looks good."))
+            ],
+        )
+        return SimpleNamespace(parse=lambda: completion, headers={})
+
+
+@contextmanager
+def review(options: argparse.Namespace) -> Iterator[Callable]:
+    from pythonbridge.core import config
+    from pythonbridge.core.review import review_pr
+    from pythonbridge.llm import GraphBuilder
+
+    github = options.github_latency
+    files = [
+        FakeFile(f"pkg/module_{i}.py", "modified", fake_patch(i))
+        for i in range(options.files)
+    ]
+
+    def github_call(*args, **kwargs):
+        time.sleep(github)
+
+    def pages(payload):
+        for start in range(0, len(files), config.GITHUB_PAGE_SIZE):
+            time.sleep(github)
+            yield files[start : start + config.GITHUB_PAGE_SIZE]
+
+    payload = {
+        "number": 1,
+        "repository": {"full_name": "owner/repo"},
+        "installation": {"id": "12345"},
+    }
+    with ExitStack() as stack:
+        for target, kwargs in (
+            ("pythonbridge.core.review.load_environment", {}),
+            ("pythonbridge.core.review.create_reaction", {"side_effect": github_call}),
+            ("pythonbridge.core.review.prefetch_diff", {"side_effect": pages}),
+            ("pythonbridge.core.review.post_review", {"side_effect": github_call}),
+            ("pythonbridge.core.review.get_review_store", {"return_value": None}),
+            (
+                "pythonbridge.llm.groq.groq.get_client",
+                {"return_value": FakeGroq(options.llm_latency)},
+            ),
+            # every round has to reach the (fake) LLM
+            ("pythonbridge.core.config.LLM_CACHE_ENABLED", {"new": False}),
+            ("pythonbridge.core.config.CODE_INDEX_DIR", {"new": None}),
+        ):
+            stack.enter_context(patch(target, **kwargs))
+        # the agents hold the client they were built with
+        GraphBuilder.clear()
+        stack.callback(GraphBuilder.clear)
+        yield lambda: review_pr(payload)
+
+
+for size in AST_SIZES:
+    register(
+        f"ast.create_ast[{size}]",
+        partial(create_ast, size),
+        rounds=5 if size <= 10_000 else 2,
+        quick=size <= 10_000,
+    )
+    register(
+        f"ast.get_relationships[{size}]",
+        partial(relationships, size, False),
+        rounds=5 if size <= 10_000 else 2,
+        quick=size <= 10_000,
+    )
+    register(
+        f"ast.get_compact_relationships[{size}]",
+        partial(relationships, size, True),
+        rounds=5 if size <= 10_000 else 2,
+        quick=size <= 10_000,
+    )
+register("bridge.respond[hello]", respond, operations=DISPATCH_MESSAGES)
+register("bridge.round_trip[hello]", round_trip, operations=DISPATCH_MESSAGES)
+register(f"bridge.encode[review {PAYLOAD_FILES} files]", encode_payload, rounds=10)
+register(f"bridge.decode[review {PAYLOAD_FILES} files]", decode_payload, rounds=10)
+register("review.review_pr", review, rounds=3)
+
+
+def run_benchmark(benchmark: Benchmark, options: argparse.Namespace) -> dict:
+    """Time a benchmark
+
+    Returns:
+        dict: "min", "median", "mean" and "stddev" seconds per operation, "rounds"
+            and "operations"
+    """
+    rounds = options.rounds or benchmark.rounds
+    times = []
+    with benchmark.setup(options) as operation:
+        operation()
+        for _ in range(rounds):
+            start = time.perf_counter()
+            operation()
+            times.append((time.perf_counter() - start) / benchmark.operations)
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "stddev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "rounds": rounds,
+        "operations": benchmark.operations,
+    }
+
+
+def environment() -> dict:
+    """What the results were measured on, a baseline only compares on the same"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "commit": commit or None,
+    }
+
+
+def compare(
+    results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD
+) -> list[dict]:
+    """Compare the medians of two runs
+
+    Args:
+        results (dict): "benchmarks" of this run
+        baseline (dict): "benchmarks" of the saved run
+        threshold (float): Ratio of the medians beyond which a change is reported
+
+    Returns:
+        list[dict]: "name", "baseline" and "current" medians, their "ratio" and the
+            "status": "regression", "faster", "same", "new" or "missing"
+    """
+    rows = []
+    for name in list(results) + [name for name in baseline if name not in results]:
+        current = results.get(name, {}).get("median")
+        previous = baseline.get(name, {}).get("median")
+        ratio = current / previous if current and previous else None
+        if previous is None:
+            status = "new"
+        elif current is None:
+            status = "missing"
+        elif ratio > threshold:
+            status = "regression"
+        elif ratio < 1 / threshold:
+            status = "faster"
+        else:
+            status = "same"
+        rows.append(
+            {
+                "name": name,
+                "baseline": previous,
+                "current": current,
+                "ratio": ratio,
+                "status": status,
+            }
+        )
+    return rows
+
+
+def _duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("-k", dest="filter", help="only run benchmarks containing this")
+    parser.add_argument("--quick", action="store_true", help="skip the slowest ones")
+    parser.add_argument("--rounds", type=int, help="timed rounds of every benchmark")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--github-latency", type=float, default=DEFAULT_GITHUB_LATENCY)
+    parser.add_argument("--llm-latency", type=float, default=DEFAULT_LLM_LATENCY)
+    parser.add_argument("--files", type=int, default=DEFAULT_REVIEW_FILES)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    options = parse_args(argv)
+    selected = [
+        benchmark
+        for benchmark in BENCHMARKS
+        if (not options.quick or benchmark.quick)
+        and (not options.filter or options.filter in benchmark.name)
+    ]
+
+    results = {}
+    for benchmark in selected:
+        results[benchmark.name] = run_benchmark(benchmark, options)
+        stats = results[benchmark.name]
+        print(
+            f"{benchmark.name:<44} {_duration(stats['median']):>10} "
+            f"± {_duration(stats['stddev']):>9}  ({stats['rounds']} rounds)"
+        )
+
+    run = {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "options": {
+            "github_latency": options.github_latency,
+            "llm_latency": options.llm_latency,
+            "files": options.files,
+        },
+        "benchmarks": results,
+    }
+    if options.output:
+        Path(options.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(options.output).write_text(json.dumps(run, indent=2) + "\n")
+
+    if not options.baseline:
+        return 0
+    if not Path(options.baseline).exists():
+        print(f"\nno baseline at {options.baseline}, nothing to compare")
+        return 0
+    baseline = json.loads(Path(options.baseline).read_text())
+    if baseline.get("environment", {}).get("machine") != run["environment"]["machine"]:
+        print("\nwarning: the baseline was measured on another kind of machine")
+    if baseline.get("options") != run["options"]:
+        print("warning: the baseline used other fake latencies or file counts")
+
+    rows = compare(results, baseline.get("benchmarks", {}), options.threshold)
+    print(f"\n{'benchmark':<44} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for row in rows:
+        ratio = f"{row['ratio']:.2f}x" if row["ratio"] else "-"
+        print(
+            f"{row['name']:<44} {_duration(row['baseline']):>10} "
+            f"{_duration(row['current']):>10} {ratio:>7}  {row['status']}"
+        )
+    regressions = [row["name"] for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {options.threshold}x")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,108 @@
 import os
 from pathlib import Path
-from dotenv import load_dotenv
 
-# Load .env from project root
+# Load .env from project root (python-dotenv is only imported when there is one,
+# Elixir passes the environment to the bridge it spawns)
 env_path = Path(__file__).resolve().parent.parent.parent / ".env"
-load_dotenv(env_path)
+if env_path.is_file():
+    from dotenv import load_dotenv
+
+    load_dotenv(env_path)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GITHUB_APP_ID = os.getenv("GITHUB_APP_ID")
 GITHUB_APP_PRIVATE_KEY = os.getenv("GITHUB_APP_PRIVATE_KEY")
 
+# Max concurrent bridge requests per message type (other types share the default)
+BRIDGE_CONCURRENCY = {
+    "hello": int(os.getenv("BRIDGE_CONCURRENCY_HELLO", "4")),
+    "comment": int(os.getenv("BRIDGE_CONCURRENCY_COMMENT", "4")),
+    "main": int(os.getenv("BRIDGE_CONCURRENCY_MAIN", "2")),
+}
+BRIDGE_CONCURRENCY_DEFAULT = int(os.getenv("BRIDGE_CONCURRENCY_DEFAULT", "2"))
+
+# Framing of the messages on stdin/stdout: "line" (JSON lines) or "packet" (4 byte
+# length prefix, set by Elixir when it opens the port with {:packet, 4})
+BRIDGE_FRAMING = os.getenv("BRIDGE_FRAMING", "line")
+
+# Worker processes running the requests (0 runs them on threads of the bridge process,
+# otherwise BRIDGE_CONCURRENCY applies to each worker)
+BRIDGE_WORKERS = int(os.getenv("BRIDGE_WORKERS", "0"))
+
+# File every timing and counter of core.metrics is appended to as a JSON line
+# (unset keeps them in memory only, see the "metrics" message)
+METRICS_PATH = os.getenv("METRICS_PATH") or None
+
+# Size of the keep-alive connection pool of each installation's GitHub client
+GITHUB_POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", "10"))
+
+# Items per page of GitHub listings (100 is the API's max) and pages of a PR's files
+# fetched ahead of the review
+GITHUB_PAGE_SIZE = int(os.getenv("GITHUB_PAGE_SIZE", "100"))
+GITHUB_PREFETCH_PAGES = int(os.getenv("GITHUB_PREFETCH_PAGES", "4"))
+
+# Max files of a single PR reviewed at the same time
+REVIEW_CONCURRENCY = int(os.getenv("REVIEW_CONCURRENCY", "4"))
+
+# Estimated patch tokens sent with one review request (the system prompt comes on top)
+# and the most files packed into one request
+REVIEW_TOKEN_BUDGET = int(os.getenv("REVIEW_TOKEN_BUDGET", "6000"))
+REVIEW_BATCH_MAX_FILES = int(os.getenv("REVIEW_BATCH_MAX_FILES", "8"))
+
+# Checkouts of the reviewed repositories, one per full name (CODE_INDEX_DIR/owner/repo),
+# indexed into a call graph whose signatures are sent with the patches (unset disables),
+# and the estimated tokens that context may take in one review request
+CODE_INDEX_DIR = os.getenv("CODE_INDEX_DIR") or None
+REVIEW_CONTEXT_TOKENS = int(os.getenv("REVIEW_CONTEXT_TOKENS", "1500"))
+# Where the index of every checkout is saved (CODE_INDEX_STORE_DIR/owner/repo.idx) and
+# memory-mapped after a restart, so only files changed since are parsed again (unset
+# re-indexes every checkout after a restart)
+CODE_INDEX_STORE_DIR = os.getenv("CODE_INDEX_STORE_DIR") or None
+# Seconds a checkout's call graph is used as is before its files are checked for
+# changes again (0 checks before every review)
+CODE_INDEX_REFRESH_SECONDS = float(os.getenv("CODE_INDEX_REFRESH_SECONDS", "30"))
+
+# Files never sent to the LLM: extra skip globs (comma separated, on top of the
+# defaults in core.filters), patches above this many estimated tokens and added lines
+# longer than this (minified or data files)
+REVIEW_SKIP_GLOBS = [
+    glob.strip()
+    for glob in os.getenv("REVIEW_SKIP_GLOBS", "").split(",")
+    if glob.strip()
+]
+REVIEW_MAX_PATCH_TOKENS = int(os.getenv("REVIEW_MAX_PATCH_TOKENS", "50000"))
+REVIEW_MAX_LINE_LENGTH = int(os.getenv("REVIEW_MAX_LINE_LENGTH", "1000"))
+
+# SQLite record of every PR's last review (unset disables incremental re-reviews):
+# files untouched by the commits pushed since then keep their review
+REVIEW_STORE_PATH = os.getenv("REVIEW_STORE_PATH") or None
+
+# Completion cache of GroqLLM (LLM_CACHE_PATH enables the on-disk SQLite tier)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 60 * 60)))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH") or None
+
+# Scheduler shared by every LLM request: max in flight, retries of 429/5xx/connection
+# errors and the jittered exponential backoff window in seconds
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60.0"))
+
+# Streamed completion text is sent to Elixir once this many characters are buffered
+# or this many seconds have passed
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "256"))
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.25"))
+
+# Worker processes of the repository indexer (0 uses one per CPU)
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", "0"))
+
+# Neo4j graph of the AST relationships (see compose.yml)
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_AUTH = os.getenv("NEO4J_AUTH", "neo4j/sniper_dev")
+# Rows written with one UNWIND query
+GRAPH_BATCH_SIZE = int(os.getenv("GRAPH_BATCH_SIZE", "1000"))
+
 
 def load_environment():
     if not GROQ_API_KEY:
@@ -0,0 +1,276 @@
+"""
+Impact context of the files of a PR
+
+The lines a patch changes are mapped onto the classes and functions enclosing
+them, using the definitions the repository's CodeGraph recorded, and the
+signatures of what those functions call and of what calls them are listed. The
+reviewer gets this ahead of the patch, packed under REVIEW_CONTEXT_TOKENS, so it
+sees the code a change affects without whole files being sent.
+
+The graph is built from a checkout of the repository under CODE_INDEX_DIR (the
+base branch), so changed lines are taken on the old side of the patch. It is
+indexed on the first review of the repository and refreshed incrementally before
+later ones, at most every CODE_INDEX_REFRESH_SECONDS: only files whose mtime or
+size changed are parsed again, and a review arriving while another one refreshes
+the graph uses it as it is instead of waiting. With
+CODE_INDEX_STORE_DIR set the index is saved after every change and loaded from
+there after a restart, instead of parsing the whole checkout again.
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from pythonbridge.ast.ast_manager import HUNK_HEADER
+from pythonbridge.ast.code_graph import CodeGraph, Definition
+from pythonbridge.ast.index_store import IndexStore
+from pythonbridge.ast.indexer import RepositoryIndexer
+from pythonbridge.core import config
+from pythonbridge.llm.chunking import estimate_tokens
+
+CONTEXT_HEADER = (
+    "Context: signatures of the code this change affects (not part of the diff, "
+    "do not review it)\n"
+)
+
+# Definitions listed for a called or calling name defined in several places
+MAX_DEFINITIONS_PER_NAME = 2
+
+
+def changed_lines(patch: str) -> list[tuple[int, int]]:
+    """Line ranges of the base file a patch touches
+
+    Removed lines count as themselves, added lines as the line they follow (the
+    block they most likely extend).
+
+    Args:
+        patch (str): Unified diff of a single file
+
+    Returns:
+        list[tuple[int, int]]: Merged (first, last) 0 based line ranges, in file order
+    """
+    lines = []
+    old_line = None
+    for line in patch.splitlines():
+        header = HUNK_HEADER.match(line)
+        if header:
+            # old_line is the next base line (0 based), "-20,0" inserts after line 20
+            old_line = int(header.group(1)) - (header.group(2) != "0")
+        elif old_line is None or line.startswith("\\"):
+            continue
+        elif line.startswith("-"):
+            lines.append(old_line)
+            old_line += 1
+        elif line.startswith("+"):
+            lines.append(max(old_line - 1, 0))
+        else:
+            old_line += 1
+
+    ranges: list[tuple[int, int]] = []
+    for line in sorted(set(lines)):
+        if ranges and line <= ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], line)
+        else:
+            ranges.append((line, line))
+    return ranges
+
+
+def enclosing(
+    definitions: list[Definition], ranges: list[tuple[int, int]]
+) -> list[Definition]:
+    """The definitions a set of line ranges falls into, innermost first"""
+    hit = [
+        definition
+        for definition in definitions
+        if any(
+            start <= definition.end_line and definition.start_line <= end
+            for start, end in ranges
+        )
+    ]
+    return sorted(hit, key=lambda d: (d.end_line - d.start_line, d.start_line))
+
+
+def _describe(definition: Definition) -> str:
+    signature = definition.signature or definition.name
+    return f"- {signature}  ({definition.file}:{definition.start_line + 1})"
+
+
+def file_context(graph: CodeGraph, filename: str, patch: str) -> list[str]:
+    """Context lines of one changed file, most important first
+
+    Args:
+        graph (CodeGraph): Call graph of the repository
+        filename (str): Path of the file in the repository
+        patch (str): The file's diff
+
+    Returns:
+        list[str]: A heading, the changed definitions, then the signatures of their
+            callees and callers. Empty when nothing of the file is known to the graph
+    """
+    changed = enclosing(graph.file_definitions(filename), changed_lines(patch))
+    if not changed:
+        return []
+
+    lines = [f"### {filename}", "Changed:"]
+    lines += [_describe(definition) for definition in changed]
+
+    names = list(dict.fromkeys(d.name.rsplit(".", 1)[-1] for d in changed))
+    seen = {(d.file, d.name) for d in changed}
+    for title, neighbours in (
+        ("Calls:", graph.callees),
+        ("Called by:", graph.callers),
+    ):
+        section = []
+        for name in names:
+            for other in neighbours(name):
+                found = graph.definitions(other)
+                # the definitions in the same file are the likely ones
+                found.sort(key=lambda d: d.file != filename)
+                for definition in found[:MAX_DEFINITIONS_PER_NAME]:
+                    if (definition.file, definition.name) not in seen:
+                        seen.add((definition.file, definition.name))
+                        section.append(_describe(definition))
+        if section:
+            lines += [title] + section
+    return lines
+
+
+def pack(lines: list[str], budget: int) -> str:
+    """Join the leading lines that fit in budget estimated tokens"""
+    packed = []
+    used = 0
+    for line in lines:
+        tokens = estimate_tokens(line + "\n")
+        if used + tokens > budget:
+            break
+        packed.append(line)
+        used += tokens
+    return "\n".join(packed)
+
+
+def batch_context(
+    contexts: dict[str, list[str]], filenames: list[str], budget: int
+) -> str:
+    """Context of the files reviewed in one request, under a token budget
+
+    The budget is shared evenly between the files, so the first one can not
+    crowd out the others.
+
+    Args:
+        contexts (dict[str, list[str]]): file_context lines by filename
+        filenames (list[str]): The files of the request
+        budget (int): Max estimated tokens of the whole context
+
+    Returns:
+        str: The context to send ahead of the patches, "" when there is none
+    """
+    files = [name for name in dict.fromkeys(filenames) if contexts.get(name)]
+    if not files:
+        return ""
+    share = (budget - estimate_tokens(CONTEXT_HEADER)) // len(files)
+    sections = [pack(contexts[name], share) for name in files]
+    sections = [section for section in sections if section]
+    if not sections:
+        return ""
+    return CONTEXT_HEADER + "\n\n".join(sections)
+
+
+class RepositoryGraph:
+    """Call graph of a checkout, kept current by re-indexing what changed on disk"""
+
+    def __init__(self, root: str, store_path: Optional[str] = None) -> None:
+        """
+        Args:
+            root (str): Root directory of the checkout
+            store_path (Optional[str]): IndexStore file the index is loaded from and
+                saved to (None keeps it in memory)
+        """
+        self.graph = CodeGraph()
+        self.root = root
+        self.store_path = store_path
+        self.store: Optional[IndexStore] = None
+        self.indexer: Optional[RepositoryIndexer] = None
+        # time.monotonic() at the start of the last refresh, None until the first one
+        self.refreshed: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        # must hold the lock, done by the first refresh (not in the registry lock)
+        if self.store_path:
+            self.store = IndexStore(self.store_path)
+            # the saved index stands in for every file unchanged since it was written
+            relationships = self.store.relationships
+            self.graph.update(
+                (path, relationships.view(path)) for path in relationships.files
+            )
+        self.indexer = RepositoryIndexer(
+            self.root, manifest=self.store.manifest if self.store else None
+        )
+
+    def refresh(self) -> CodeGraph:
+        """Apply the files changed, added or deleted since the last refresh
+
+        Only the first refresh is waited for. After that the checkout is walked at
+        most every CODE_INDEX_REFRESH_SECONDS, and while one refresh runs the others
+        return the graph as it is (CodeGraph is thread-safe).
+        """
+        if self.refreshed is None:
+            self._lock.acquire()
+            if self.refreshed is not None:
+                # built by another review meanwhile
+                self._lock.release()
+                return self.graph
+        elif time.monotonic() - self.refreshed < config.CODE_INDEX_REFRESH_SECONDS:
+            return self.graph
+        elif not self._lock.acquire(blocking=False):
+            return self.graph
+        try:
+            start = time.monotonic()
+            if self.indexer is None:
+                self._load()
+            results = self.indexer.index()
+
+            def removed():
+                return self.indexer.removed
+
+            if self.store is not None:
+                results = self.store.update(results, removed)
+            changed = self.graph.update(results, removed=removed)
+            if self.store is not None and (changed or self.indexer.removed):
+                self.store.save()
+            self.refreshed = start
+            return self.graph
+        finally:
+            self._lock.release()
+
+
+_graphs: dict[str, RepositoryGraph] = {}
+_graphs_lock = threading.Lock()
+
+
+def get_code_graph(payload: dict) -> Optional[CodeGraph]:
+    """The call graph of a PR's repository, refreshed from its checkout
+
+    Args:
+        payload (dict): GitHub webhook payload, the checkout of its
+            "repository.full_name" is CODE_INDEX_DIR/<full_name>
+
+    Returns:
+        Optional[CodeGraph]: None when CODE_INDEX_DIR is unset or has no checkout of the repository
+    """
+    if not config.CODE_INDEX_DIR:
+        return None
+    repo = payload["repository"]["full_name"]
+    root = Path(config.CODE_INDEX_DIR) / repo
+    if not root.is_dir():
+        return None
+    with _graphs_lock:
+        repository = _graphs.get(repo)
+        if repository is None:
+            store_path = None
+            if config.CODE_INDEX_STORE_DIR:
+                store_path = str(Path(config.CODE_INDEX_STORE_DIR) / f"{repo}.idx")
+            repository = _graphs[repo] = RepositoryGraph(str(root), store_path)
+    # indexing runs outside the registry lock, reviews of other repositories go on
+    return repository.refresh()
@@ -0,0 +1,254 @@
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, BinaryIO, Callable, Iterator, Optional
+
+from pythonbridge.core import metrics
+from pythonbridge.core.framing import (
+    LineFraming,
+    PacketFraming,
+    decode,
+    encode,
+    get_framing,
+)
+
+DEFAULT_POOL = "default"
+
+# Sends a {"status": "partial"} frame for the request being handled
+_emitter: ContextVar[Optional[Callable[[Any], None]]] = ContextVar(
+    "bridge_emitter", default=None
+)
+
+
+def current_emitter() -> Optional[Callable[[Any], None]]:
+    """Partial frame sender of the request being handled in this thread
+
+    Only messages sent with "stream": true get one. Every call writes a
+    {"status": "partial", "response": ..., "_id": ...} line ahead of the final
+    response, which Elixir uses to show progress and keep the request alive.
+
+    Returns:
+        Optional[Callable[[Any], None]]: Takes the partial response, None when not streaming
+    """
+    return _emitter.get()
+
+
+class ResponseWriter:
+    """Single writer thread that owns the output stream.
+
+    Every response goes through one queue so frames written by concurrent
+    requests never interleave on stdout. Responses queued while a write is in
+    progress are sent together with one write and one flush.
+    """
+
+    def __init__(
+        self, stream: BinaryIO, framing: LineFraming | PacketFraming = LineFraming()
+    ) -> None:
+        """
+        Args:
+            stream (BinaryIO): Binary stream the frames are written to
+            framing (LineFraming | PacketFraming): How responses are delimited
+        """
+        self.stream = stream
+        self.framing = framing
+        self.closed = False
+        self._queue: queue.Queue[Optional[dict]] = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="bridge-writer", daemon=True
+        )
+        self._thread.start()
+
+    def put(self, response: dict) -> None:
+        """Queue a response to be written as one frame
+
+        Args:
+            response (dict): JSON serializable response (already tagged with "_id")
+        """
+        self._queue.put(response)
+
+    def close(self) -> None:
+        """Flush every queued response and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        done = False
+        while not done:
+            batch = [self._queue.get()]
+            # drain what piled up meanwhile, it all goes out with a single flush
+            while batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                done = True
+            if self.closed or not batch:
+                continue
+            try:
+                self.stream.write(b"".join(self._frame(r) for r in batch))
+                self.stream.flush()
+            except BrokenPipeError:
+                # Elixir closed the connection, drop the rest
+                self.closed = True
+
+    def _frame(self, response: dict) -> bytes:
+        try:
+            payload = encode(response)
+        except TypeError as e:
+            # an unserializable result must not kill the writer, report it instead
+            payload = encode(
+                {
+                    "status": "error",
+                    "response": None,
+                    "error": f"Unserializable response: {e}",
+                    "_id": response.get("_id"),
+                }
+            )
+        return self.framing.frame(payload)
+
+
+class Dispatcher:
+    """Runs bridge messages concurrently with a bounded pool per message type.
+
+    Lines keep being read while earlier requests are still running, and each
+    response is written as soon as its request finishes (Elixir matches
+    replies by "_id", so ordering does not matter).
+    """
+
+    def __init__(
+        self,
+        respond: Callable[[dict], dict],
+        writer: ResponseWriter,
+        limits: dict[str, int],
+        default_limit: int = 1,
+    ) -> None:
+        """
+        Args:
+            respond (Callable[[dict], dict]): Turns a message into its response dict
+            writer (ResponseWriter): The single writer responses are sent to
+            limits (dict[str, int]): Max concurrent requests per message type
+            default_limit (int): Max concurrent requests for types not in limits
+        """
+        self.respond = respond
+        self.writer = writer
+        self.pools = {
+            type: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=type)
+            for type, limit in limits.items()
+        }
+        self.pools[DEFAULT_POOL] = ThreadPoolExecutor(
+            max_workers=default_limit, thread_name_prefix=DEFAULT_POOL
+        )
+
+    def submit(self, msg: dict) -> None:
+        """Queue a message on its type's pool without waiting for it to finish
+
+        Args:
+            msg (dict): Message received from Elixir
+        """
+        pool = self.pools.get(msg.get("type"), self.pools[DEFAULT_POOL])
+        pool.submit(self._run, msg)
+
+    def shutdown(self) -> None:
+        """Wait for every running request, then flush the writer"""
+        for pool in self.pools.values():
+            pool.shutdown(wait=True)
+        self.writer.close()
+
+    def _run(self, msg: dict) -> None:
+        token = None
+        if msg.get("stream"):
+            token = _emitter.set(lambda partial: self._partial(msg, partial))
+        start = time.perf_counter()
+        try:
+            response = self.respond(msg)
+        except Exception as e:
+            response = {
+                "status": "error",
+                "response": None,
+                "error": str(e),
+                "_id": msg.get("_id"),
+            }
+        finally:
+            if token is not None:
+                _emitter.reset(token)
+        elapsed = time.perf_counter() - start
+        # answered first, a failing METRICS_PATH must not lose the response
+        self.writer.put(response)
+        # latency of the bridge messages by type, from the start of the handler
+        type = msg.get("type") or "unknown"
+        metrics.observe(f"bridge.message.{type}", elapsed)
+        if response.get("status") == "error":
+            metrics.increment(f"bridge.errors.{type}")
+
+    def _partial(self, msg: dict, partial: Any) -> None:
+        self.writer.put(
+            {
+                "status": "partial",
+                "response": partial,
+                "error": None,
+                "_id": msg.get("_id"),
+            }
+        )
+
+
+def read_messages(
+    stdin: BinaryIO, wire: LineFraming | PacketFraming, writer: ResponseWriter
+) -> Iterator[dict]:
+    """Decode the framed messages of stdin until EOF
+
+    Frames that are not valid JSON are answered with an error right away.
+
+    Args:
+        stdin (BinaryIO): Stream the messages are read from
+        wire (LineFraming | PacketFraming): How the messages are delimited
+        writer (ResponseWriter): Where the errors of invalid frames are sent
+
+    Yields:
+        dict: Every valid message
+    """
+    for frame in wire.read(stdin):
+        try:
+            yield decode(frame)
+        except json.JSONDecodeError as e:
+            writer.put(
+                {
+                    "status": "error",
+                    "response": None,
+                    "error": f"Invalid JSON: {e}",
+                    "_id": None,
+                }
+            )
+
+
+def serve(
+    respond: Callable[[dict], dict],
+    limits: dict[str, int],
+    default_limit: int = 1,
+    stdin: Optional[BinaryIO] = None,
+    stdout: Optional[BinaryIO] = None,
+    framing: str = "line",
+) -> None:
+    """Read framed JSON messages from stdin and dispatch them until EOF
+
+    Args:
+        respond (Callable[[dict], dict]): Turns a message into its response dict
+        limits (dict[str, int]): Max concurrent requests per message type
+        default_limit (int): Max concurrent requests for types not in limits
+        stdin (Optional[BinaryIO]): Stream the messages are read from (default sys.stdin.buffer)
+        stdout (Optional[BinaryIO]): Stream the responses are written to (default sys.stdout.buffer)
+        framing (str): "line" for JSON lines, "packet" for 4 byte length prefixed frames
+    """
+    wire = get_framing(framing)
+    writer = ResponseWriter(stdout or sys.stdout.buffer, wire)
+    dispatcher = Dispatcher(respond, writer, limits, default_limit)
+    try:
+        for msg in read_messages(stdin or sys.stdin.buffer, wire, writer):
+            dispatcher.submit(msg)
+    finally:
+        dispatcher.shutdown()
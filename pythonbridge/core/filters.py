@@ -0,0 +1,172 @@
+"""
+Pre-filter of the files of a PR
+
+Decides which changed files are not worth an LLM review (lockfiles, vendored or
+generated code, minified assets, pure renames, huge patches) before any token is
+spent on them. Skipped files stay in the review output with the reason.
+"""
+
+import re
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import Optional
+
+from pythonbridge.core import config
+from pythonbridge.llm.chunking import estimate_tokens
+
+# Paths never worth reviewing. A pattern with a "/" matches the path at any depth,
+# one without matches the file name
+DEFAULT_SKIP_GLOBS = (
+    # lockfiles
+    "*.lock",
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "pnpm-lock.yaml",
+    "go.sum",
+    # vendored dependencies
+    "vendor/*",
+    "node_modules/*",
+    "third_party/*",
+    # minified assets and source maps
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    # generated code
+    "*_pb2.py",
+    "*_pb2_grpc.py",
+    "*.pb.go",
+    "*.generated.*",
+)
+
+# Markers generators put at the top of the files they write
+GENERATED_MARKER = re.compile(
+    r"@generated|do not edit|code generated by|auto-?generated", re.IGNORECASE
+)
+# Lines of the new file inspected for a generated marker
+GENERATED_HEADER_LINES = 10
+
+
+@dataclass
+class FilterRules:
+    """What makes a file unreviewable
+
+    Attributes:
+        skip_globs (tuple[str, ...]): Path patterns of files never reviewed
+        max_patch_tokens (int): Estimated tokens above which a patch is skipped
+        max_line_length (int): Added line length that marks a minified or data file
+    """
+
+    skip_globs: tuple[str, ...] = DEFAULT_SKIP_GLOBS
+    max_patch_tokens: int = 50_000
+    max_line_length: int = 1000
+
+    @classmethod
+    def from_config(cls) -> "FilterRules":
+        """The default rules extended and tuned by the environment"""
+        return cls(
+            skip_globs=DEFAULT_SKIP_GLOBS + tuple(config.REVIEW_SKIP_GLOBS),
+            max_patch_tokens=config.REVIEW_MAX_PATCH_TOKENS,
+            max_line_length=config.REVIEW_MAX_LINE_LENGTH,
+        )
+
+
+@dataclass
+class FilterReport:
+    """Files kept for review and files skipped, with what skipping them saved
+
+    Attributes:
+        kept (list): Files to review
+        skipped (dict[str, str]): Skip reason by filename
+        saved_tokens (int): Estimated patch tokens of the skipped files
+    """
+
+    kept: list = field(default_factory=list)
+    skipped: dict[str, str] = field(default_factory=dict)
+    saved_tokens: int = 0
+
+
+def matches(path: str, pattern: str) -> bool:
+    """Whether path matches a skip glob
+
+    Args:
+        path (str): Path of the file in the repository
+        pattern (str): "dir/*" style patterns match at any depth, plain
+            patterns match the file name
+
+    Returns:
+        bool: True if the file matches
+    """
+    if "/" in pattern:
+        return fnmatchcase(path, pattern) or fnmatchcase(path, "*/" + pattern)
+    return fnmatchcase(path.rsplit("/", 1)[-1], pattern)
+
+
+def is_generated(patch: str) -> bool:
+    """Whether the patch adds a file that says it is generated
+
+    Only the patch of a new file counts: a modified file may still carry the
+    marker as context even though it is now edited by hand.
+    """
+    if not patch.startswith("@@ -0,0 +1"):
+        return False
+    header = patch.splitlines()[1 : GENERATED_HEADER_LINES + 1]
+    return any(GENERATED_MARKER.search(line) for line in header if line[:1] == "+")
+
+
+def skip_reason(
+    filename: str, status: str, patch: Optional[str], rules: FilterRules
+) -> Optional[str]:
+    """Why a changed file should not be reviewed
+
+    Args:
+        filename (str): Path of the file in the repository
+        status (str): GitHub file status ("added", "modified", "renamed", "removed", ...)
+        patch (Optional[str]): The file's diff, None for binary, deleted or renamed files
+        rules (FilterRules): What makes a file unreviewable
+
+    Returns:
+        Optional[str]: The reason, None if the file is worth a review
+    """
+    if not patch:
+        if status == "removed":
+            return "deleted"
+        if status == "renamed":
+            return "renamed without changes"
+        return "no textual diff"
+    for pattern in rules.skip_globs:
+        if matches(filename, pattern):
+            return f"matches {pattern}"
+    if is_generated(patch):
+        return "generated file"
+    longest = max(
+        (len(line) for line in patch.splitlines() if line.startswith("+")), default=0
+    )
+    if longest > rules.max_line_length:
+        return f"minified or data file (line of {longest} characters)"
+    tokens = estimate_tokens(patch)
+    if tokens > rules.max_patch_tokens:
+        return f"patch too large (~{tokens} tokens)"
+    return None
+
+
+def filter_files(files: list, rules: Optional[FilterRules] = None) -> FilterReport:
+    """Split the changed files of a PR into those to review and those to skip
+
+    Args:
+        files (list[File]): The changed files from the PR diff
+        rules (Optional[FilterRules]): Defaults to FilterRules.from_config()
+
+    Returns:
+        FilterReport: The kept files in diff order and the reasons of the skipped ones
+    """
+    rules = rules or FilterRules.from_config()
+    report = FilterReport()
+    for file in files:
+        reason = skip_reason(file.filename, file.status, file.patch, rules)
+        if reason is None:
+            report.kept.append(file)
+        else:
+            report.skipped[file.filename] = reason
+            if file.patch:
+                report.saved_tokens += estimate_tokens(file.patch)
+    return report
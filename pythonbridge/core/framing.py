@@ -0,0 +1,131 @@
+"""
+Wire formats of the Elixir bridge
+
+Messages are JSON documents in both directions, the framing decides how they are
+delimited on stdin/stdout:
+
+- "line": one JSON document per line (the original protocol, handy for typing
+  messages by hand with `make run-python`)
+- "packet": every document is preceded by its size as a 4 byte big-endian
+  integer, what Erlang ports opened with {:packet, 4} read and write natively,
+  so neither side scans for newlines
+
+Elixir picks the framing when it spawns the bridge (BRIDGE_FRAMING).
+"""
+
+import json
+import struct
+from typing import Any, BinaryIO, Iterator, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson ships with langsmith, fall back to the stdlib without it
+    orjson = None
+
+# Frames above this size are refused instead of being allocated
+MAX_FRAME_SIZE = 1 << 30
+
+
+def encode(obj: Any) -> bytes:
+    """Serialize a message to compact UTF-8 JSON
+
+    Args:
+        obj (Any): JSON serializable message
+
+    Returns:
+        bytes: The JSON document (never contains a raw newline)
+
+    Raises:
+        TypeError: If obj is not JSON serializable
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":")).encode("utf8")
+
+
+def decode(data: bytes) -> Any:
+    """Parse a JSON document
+
+    Raises:
+        json.JSONDecodeError: If data is not valid JSON (orjson's error subclasses it)
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class LineFraming:
+    """Newline delimited JSON"""
+
+    name = "line"
+
+    def read(self, stream: BinaryIO) -> Iterator[bytes]:
+        """Yield every non-empty line of stream until EOF"""
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield line
+
+    def frame(self, payload: bytes) -> bytes:
+        """The bytes written for one encoded message"""
+        return payload + b"\n"
+
+
+class PacketFraming:
+    """4 byte big-endian length prefixed frames, Erlang's {:packet, 4}"""
+
+    name = "packet"
+    header = struct.Struct(">I")
+
+    def read(self, stream: BinaryIO) -> Iterator[bytes]:
+        """Yield the payload of every frame of stream until EOF
+
+        Raises:
+            EOFError: If the stream ends in the middle of a frame
+            ValueError: If a frame is larger than MAX_FRAME_SIZE
+        """
+        while True:
+            header = _read_exact(stream, self.header.size)
+            if header is None:
+                return
+            (size,) = self.header.unpack(header)
+            if size > MAX_FRAME_SIZE:
+                raise ValueError(f"Frame of {size} bytes exceeds {MAX_FRAME_SIZE}")
+            payload = _read_exact(stream, size) if size else b""
+            if payload is None:
+                raise EOFError(f"Stream ended inside a frame of {size} bytes")
+            yield payload
+
+    def frame(self, payload: bytes) -> bytes:
+        """The bytes written for one encoded message"""
+        return self.header.pack(len(payload)) + payload
+
+
+FRAMINGS = {"line": LineFraming(), "packet": PacketFraming()}
+
+
+def get_framing(name: str) -> LineFraming | PacketFraming:
+    """The framing registered under name
+
+    Raises:
+        ValueError: If name is not a known framing
+    """
+    try:
+        return FRAMINGS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown bridge framing {name!r}, expected one of {sorted(FRAMINGS)}"
+        ) from None
+
+
+def _read_exact(stream: BinaryIO, size: int) -> Optional[bytes]:
+    # size bytes of stream, None on EOF before the first byte
+    data = stream.read(size)
+    if not data:
+        return None
+    while len(data) < size:
+        more = stream.read(size - len(data))
+        if not more:
+            raise EOFError(f"Stream ended after {len(data)} of {size} bytes")
+        data += more
+    return data
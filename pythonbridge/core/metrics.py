@@ -0,0 +1,265 @@
+"""
+Timings and counters of the bridge
+
+Every stage of a review (installation token, diff pages, graph build, agent nodes,
+LLM requests, posting) and every bridge message records how long it took in a
+histogram, and what it consumed (LLM tokens, retries, skipped files) in counters.
+A "metrics" message returns a snapshot of both. With METRICS_PATH set, every
+observation is also appended to that file as a JSON line.
+
+Metric names are dotted, e.g. "review.graph_build" or "bridge.message.main".
+Each process keeps its own registry, with BRIDGE_WORKERS the front process adds up
+its own snapshot and every worker's (they all append to the same METRICS_PATH).
+"""
+
+import functools
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+from pythonbridge.core import config
+from pythonbridge.core.framing import encode
+
+F = TypeVar("F", bound=Callable)
+
+# Upper bounds in seconds of the histogram buckets, from a health check to a slow LLM request
+BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)  # fmt: skip
+
+
+class Histogram:
+    """Distribution of the durations of one stage
+
+    Attributes:
+        buckets (tuple[float, ...]): Upper bounds of the buckets, a last one catches the rest
+        counts (list[int]): Observations per bucket
+        count (int): Number of observations
+        sum (float): Sum of the observations
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, snapshot: dict) -> None:
+        """Add the observations of a snapshot of a histogram with the same buckets"""
+        if not snapshot["count"]:
+            return
+        for i, count in enumerate(snapshot["buckets"].values()):
+            self.counts[i] += count
+        self.count += snapshot["count"]
+        self.sum += snapshot["sum"]
+        self.min = min(self.min, snapshot["min"])
+        self.max = max(self.max, snapshot["max"])
+
+    def quantile(self, q: float) -> float:
+        """Estimate of the q-quantile: upper bound of the bucket holding it, capped at max"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        """Summary of the histogram
+
+        Returns:
+            dict: "count", "sum", "min", "max", "mean", "p50", "p95", "p99" and
+                "buckets" (observations by upper bound, "+Inf" for the last one)
+        """
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip(bounds, self.counts)),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe counters and duration histograms, optionally logged as JSON lines
+
+    Attributes:
+        path (Optional[str]): File every observation is appended to
+        counters (dict[str, float]): Totals by name
+        histograms (dict[str, Histogram]): Durations in seconds by name
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self.counters: dict[str, float] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        self._sink = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._sink = open(path, "ab")
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Add value to a counter"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            self._log("counter", name, value)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one duration of a stage"""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+            self._log("timer", name, seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Time the block into the name histogram, "<name>.errors" counts the ones that raise"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.increment(f"{name}.errors")
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """Current counters and histogram summaries
+
+        Args:
+            reset (bool): Start over from zero after taking the snapshot
+
+        Returns:
+            dict: "counters" by name and "histograms" by name (see Histogram.snapshot)
+        """
+        with self._lock:
+            snapshot = {
+                "counters": dict(self.counters),
+                "histograms": {
+                    name: histogram.snapshot()
+                    for name, histogram in self.histograms.items()
+                },
+            }
+            if reset:
+                self.counters.clear()
+                self.histograms.clear()
+        return snapshot
+
+    def close(self) -> None:
+        """Close the JSON lines file"""
+        with self._lock:
+            if self._sink is not None:
+                self._sink.close()
+                self._sink = None
+
+    def _log(self, kind: str, name: str, value: float) -> None:
+        # must hold the lock, one write per line so workers appending together do not interleave
+        if self._sink is None:
+            return
+        line = {
+            "time": time.time(),
+            "pid": os.getpid(),
+            "kind": kind,
+            "name": name,
+            "value": value,
+        }
+        self._sink.write(encode(line) + b"\n")
+        self._sink.flush()
+
+
+def merge_snapshots(snapshots: Iterable[dict]) -> dict:
+    """One snapshot adding up the snapshots of several registries
+
+    Args:
+        snapshots (Iterable[dict]): MetricsRegistry.snapshot results, e.g. of every bridge process
+
+    Returns:
+        dict: The counters summed and the histograms merged, like MetricsRegistry.snapshot
+    """
+    counters: dict[str, float] = {}
+    histograms: dict[str, Histogram] = {}
+    for snapshot in snapshots:
+        for name, value in snapshot["counters"].items():
+            counters[name] = counters.get(name, 0) + value
+        for name, summary in snapshot["histograms"].items():
+            histograms.setdefault(name, Histogram()).merge(summary)
+    return {
+        "counters": counters,
+        "histograms": {
+            name: histogram.snapshot() for name, histogram in histograms.items()
+        },
+    }
+
+
+_default_registry: Optional[MetricsRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """The process-wide registry configured from the environment
+
+    Returns:
+        MetricsRegistry: The shared registry, logging to METRICS_PATH when it is set
+    """
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = MetricsRegistry(config.METRICS_PATH)
+        return _default_registry
+
+
+def increment(name: str, value: float = 1) -> None:
+    """Add value to a counter of the process-wide registry"""
+    get_metrics().increment(name, value)
+
+
+def observe(name: str, seconds: float) -> None:
+    """Record a duration in the process-wide registry"""
+    get_metrics().observe(name, seconds)
+
+
+def timer(name: str):
+    """Time a block into the process-wide registry (see MetricsRegistry.timer)"""
+    return get_metrics().timer(name)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator timing every call of a function into the process-wide registry
+
+    The wrapper keeps the function's signature, so it can wrap LangGraph nodes.
+    """
+
+    def decorator(function: F) -> F:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
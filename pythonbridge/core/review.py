@@ -1,31 +1,317 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from langgraph.graph.state import CompiledStateGraph
+
+from pythonbridge.core import config, metrics
 from pythonbridge.core.config import load_environment
-from pythonbridge.gh.client import get_diff, post_review, create_reaction
+from pythonbridge.core.filters import filter_files
+from pythonbridge.core.store import ReviewStore, get_review_store, patch_hash
+from pythonbridge.gh.client import (
+    get_changed_since,
+    get_head_sha,
+    post_review,
+    prefetch_diff,
+    create_reaction,
+    request_context,
+)
 from pythonbridge.llm import GraphBuilder
+from pythonbridge.llm.chunking import Batch, Chunk, plan_batches
+from pythonbridge.llm.streaming import CoalescingSink, stream_to
 
 
-# TODO: Add context input to this function and refactor if needed
-def review_pr(payload: dict) -> list[dict]:
-    load_environment()
+def invoke_graph(
+    agent_graph: CompiledStateGraph,
+    batch: Batch,
+    emit: Optional[Callable[[Any], None]] = None,
+    contexts: Optional[dict[str, list[str]]] = None,
+) -> Optional[str]:
+    """Run the review graph on a batch, streaming the review text when emit is given
+
+    Args:
+        agent_graph (CompiledStateGraph): The compiled review graph
+        batch (Batch): The chunks to review together
+        emit (Optional[Callable[[Any], None]]): Sends partial bridge frames
+        contexts (Optional[dict[str, list[str]]]): Impact context lines by filename
+
+    Returns:
+        Optional[str]: The complete review
+    """
+    state = {"pr_input": batch.message()}
+    if contexts:
+        # only filled when checkouts are indexed, see review_pr
+        from pythonbridge.core.context import batch_context
+
+        filenames = [chunk.filename for chunk in batch.chunks]
+        context = batch_context(contexts, filenames, config.REVIEW_CONTEXT_TOKENS)
+        if context:
+            state["pr_context"] = context
+    if emit is None:
+        result = agent_graph.invoke(state)
+    else:
+        files = [chunk.name for chunk in batch.chunks]
+        sink = CoalescingSink(lambda event: emit({"files": files, **event}))
+        with stream_to(sink):
+            result = agent_graph.invoke(state)
+        sink.flush()
+    return result.get("pr_review") if result else None
+
+
+def review_batch(
+    agent_graph: CompiledStateGraph,
+    batch: Batch,
+    emit: Optional[Callable[[Any], None]] = None,
+    contexts: Optional[dict[str, list[str]]] = None,
+) -> list[tuple]:
+    """Review one batch of patch chunks with a single request.
+
+    Chunks the answer has no section for, and every chunk of a multi-chunk batch
+    whose request failed, are retried one request each so a failure only ever
+    affects the file it belongs to.
+
+    Args:
+        agent_graph (CompiledStateGraph): The compiled review graph
+        batch (Batch): The chunks to review together
+        emit (Optional[Callable[[Any], None]]): Sends partial bridge frames
+        contexts (Optional[dict[str, list[str]]]): Impact context lines by filename
+
+    Returns:
+        list[tuple]: (chunk, review, error) for every chunk of the batch
+    """
+    try:
+        response = invoke_graph(agent_graph, batch, emit, contexts)
+    except Exception as e:
+        if len(batch.chunks) == 1:
+            return [(batch.chunks[0], None, str(e))]
+        response = None
 
-    create_reaction(payload)
+    if len(batch.chunks) == 1:
+        return [(batch.chunks[0], response, None)]
 
-    files = get_diff(payload)
-    graph_builder = GraphBuilder()
-    agent_graph = graph_builder.build_graph()
+    sections = batch.split_response(response) if response else {}
+    results = []
+    for chunk in batch.chunks:
+        review = sections.get(chunk.name)
+        if review is None:
+            results += review_batch(agent_graph, Batch([chunk]), emit, contexts)
+        else:
+            results.append((chunk, review, None))
+    return results
+
+
+def merge_reviews(
+    files: list, results: list[tuple], skipped: Optional[dict[str, str]] = None
+) -> list[dict]:
+    """Join the chunk reviews of every file back together, in diff order
+
+    Args:
+        files (list[File]): The changed files from the PR diff
+        results (list[tuple]): (chunk, review, error) of every reviewed chunk
+        skipped (Optional[dict[str, str]]): Skip reason of the files not reviewed
+
+    Returns:
+        list[dict]: One entry per file with "filename", "status", "review", "error"
+            and "skipped" (the reason the file was not reviewed, or None)
+    """
+    skipped = skipped or {}
+    by_file: dict[str, list[tuple]] = {}
+    for chunk, review, error in results:
+        by_file.setdefault(chunk.filename, []).append((chunk.part, review, error))
 
     reviews = []
     for file in files:
-        result = agent_graph.invoke({"pr_input": file.patch}) if file.patch else None
-        review = result.get("pr_review") if result else None
+        parts = sorted(by_file.get(file.filename, []), key=lambda part: part[0])
+        texts = [review for _, review, _ in parts if review]
+        errors = [error for _, _, error in parts if error]
         reviews.append(
             {
                 "filename": file.filename,
                 "status": file.status,
-                "review": review,
+                "review": "\n\n".join(texts) if texts else None,
+                "error": errors[0] if errors else None,
+                "skipped": skipped.get(file.filename),
             }
         )
+    return reviews
+
+
+def previous_reviews(
+    payload: dict, head_sha: str, store: ReviewStore
+) -> dict[str, tuple[str, str]]:
+    """Reviews of the last run of this PR for files the new commits did not touch
+
+    A stored review is only reused if the file's patch is unchanged as well (a
+    moved base branch can change it too), see reuse_review.
+
+    Args:
+        payload (dict): GitHub webhook payload of the PR
+        head_sha (str): The current head commit of the PR
+        store (ReviewStore): Where the last review was recorded
+
+    Returns:
+        dict[str, tuple[str, str]]: (patch hash, review) by filename
+    """
+    previous = store.get(payload["repository"]["full_name"], payload["number"])
+    if previous is None:
+        return {}
+    if previous.head_sha == head_sha:
+        return previous.files
+    changed = get_changed_since(payload, previous.head_sha, head_sha)
+    if changed is None:
+        return {}
+    return {
+        filename: stored
+        for filename, stored in previous.files.items()
+        if filename not in changed
+    }
+
 
-    post_review(payload, reviews)
+def reuse_review(previous: dict[str, tuple[str, str]], file) -> Optional[str]:
+    """The stored review of a file if its patch did not change since"""
+    stored = previous.get(file.filename)
+    if stored is None:
+        return None
+    stored_hash, review = stored
+    return review if stored_hash == patch_hash(file.patch) else None
+
+
+# TODO: Add context input to this function and refactor if needed
+@metrics.timed("review.total")
+def review_pr(
+    payload: dict, emit: Optional[Callable[[Any], None]] = None
+) -> list[dict]:
+    """Review every changed file of a PR and post the result
+
+    The changed files are fetched page by page in the background and the batches
+    of a page go to the LLM as soon as it arrives, so downloading a large PR's
+    file list overlaps with reviewing it.
+
+    Args:
+        payload (dict): GitHub webhook payload of the PR
+        emit (Optional[Callable[[Any], None]]): Sends partial bridge frames, the review
+            text is streamed through it as {"files": [...], "delta": ...} while it is
+            generated ({"files": [...], "reset": true} drops the text of a retried batch)
+
+    Returns:
+        list[dict]: One entry per file with "filename", "status", "review", "error"
+            and "skipped" (the reason the file was not reviewed, or None)
+    """
+    load_environment()
+
+    # One GitHub context per review: repo/PR handles are fetched once and reused
+    with request_context() as gh_ctx:
+        with metrics.timer("review.reaction"):
+            create_reaction(payload)
+
+        with metrics.timer("review.graph_build"):
+            graph_builder = GraphBuilder()
+            agent_graph = graph_builder.get_graph()
+
+        # Call graph of the repository's checkout, for the impact context of each file
+        code_graph = None
+        if config.CODE_INDEX_DIR:
+            # imported here, so tree-sitter is only loaded when checkouts are indexed
+            from pythonbridge.core.context import file_context, get_code_graph
+
+            with metrics.timer("review.code_index"):
+                code_graph = get_code_graph(payload)
+        contexts: dict[str, list[str]] = {}
+
+        # Files the commits since the last review did not touch keep their review
+        store = get_review_store()
+        previous = {}
+        if store is not None:
+            with metrics.timer("review.previous"):
+                head_sha = get_head_sha(payload)
+                previous = previous_reviews(payload, head_sha, store)
+
+        files = []
+        skipped: dict[str, str] = {}
+        saved_tokens = 0
+        reused: dict[str, str] = {}
+        futures = []
+        # Batches are reviewed concurrently, starting with the first page of files
+        with ThreadPoolExecutor(max_workers=config.REVIEW_CONCURRENCY) as executor:
+            for page in prefetch_diff(payload):
+                files += page
+
+                # Lockfiles, generated and vendored code, renames and deleted files
+                # never reach the LLM
+                report = filter_files(page)
+                skipped.update(report.skipped)
+                saved_tokens += report.saved_tokens
+
+                pending = []
+                for file in report.kept:
+                    review = reuse_review(previous, file)
+                    if review is None:
+                        pending.append((file.filename, file.patch))
+                    else:
+                        reused[file.filename] = review
+
+                if code_graph is not None:
+                    # the changed definitions, their callees and callers, packed
+                    # into each request under REVIEW_CONTEXT_TOKENS
+                    with metrics.timer("review.context"):
+                        for filename, patch in pending:
+                            contexts[filename] = file_context(
+                                code_graph, filename, patch
+                            )
+
+                # Oversized patches are split and small ones packed together
+                batches = plan_batches(
+                    pending, config.REVIEW_TOKEN_BUDGET, config.REVIEW_BATCH_MAX_FILES
+                )
+                futures += [
+                    executor.submit(review_batch, agent_graph, batch, emit, contexts)
+                    for batch in batches
+                ]
+
+            # time spent waiting on the LLM once every batch is submitted
+            with metrics.timer("review.wait_batches"):
+                results = [result for future in futures for result in future.result()]
+
+        results += [
+            (Chunk(filename, ""), review, None) for filename, review in reused.items()
+        ]
+        reviews = merge_reviews(files, results, skipped)
+
+        if store is not None:
+            # failed files are not recorded, so the next run reviews them again
+            store.save(
+                payload["repository"]["full_name"],
+                payload["number"],
+                head_sha,
+                {
+                    file.filename: (patch_hash(file.patch), review["review"])
+                    for file, review in zip(files, reviews)
+                    if review["review"] and not review["error"]
+                },
+            )
+
+        with metrics.timer("review.post"):
+            post_review(payload, reviews)
+
+    metrics.increment("review.files", len(files))
+    metrics.increment("review.batches", len(futures))
+    metrics.increment("review.skipped_files", len(skipped))
+    metrics.increment("review.saved_tokens", saved_tokens)
+    metrics.increment("review.reused_files", len(reused))
+    # stdout is the bridge protocol, diagnostics go to stderr
+    print(
+        f"GitHub HTTP requests for this review: {gh_ctx.http_requests}", file=sys.stderr
+    )
+    print(
+        f"Skipped {len(skipped)} of {len(files)} files, "
+        f"~{saved_tokens} patch tokens saved",
+        file=sys.stderr,
+    )
+    if store is not None:
+        print(
+            f"Reused {len(reused)} reviews of files unchanged since the last review",
+            file=sys.stderr,
+        )
 
     return reviews
 
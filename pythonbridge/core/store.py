@@ -0,0 +1,126 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from pythonbridge.core import config
+
+
+def patch_hash(patch: Optional[str]) -> str:
+    """Content address of a file's patch"""
+    return hashlib.sha256((patch or "").encode("utf8")).hexdigest()
+
+
+@dataclass
+class StoredReview:
+    """The last review of a PR
+
+    Attributes:
+        head_sha (str): Head commit of the PR when it was reviewed
+        files (dict[str, tuple[str, Optional[str]]]): (patch hash, review) by filename
+    """
+
+    head_sha: str
+    files: dict[str, tuple[str, Optional[str]]]
+
+
+class ReviewStore:
+    """SQLite record of the last review of every PR, used to re-review only what changed"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reviews ("
+            "repo TEXT NOT NULL, number INTEGER NOT NULL, head_sha TEXT NOT NULL, "
+            "reviewed REAL NOT NULL, PRIMARY KEY (repo, number))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_reviews ("
+            "repo TEXT NOT NULL, number INTEGER NOT NULL, filename TEXT NOT NULL, "
+            "patch_hash TEXT NOT NULL, review TEXT, "
+            "PRIMARY KEY (repo, number, filename))"
+        )
+        self._conn.commit()
+
+    def get(self, repo: str, number: int) -> Optional[StoredReview]:
+        """The last review of a PR
+
+        Args:
+            repo (str): Full name of the repository
+            number (int): Number of the PR
+
+        Returns:
+            Optional[StoredReview]: None if the PR was never reviewed
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT head_sha FROM reviews WHERE repo = ? AND number = ?",
+                (repo, number),
+            ).fetchone()
+            if row is None:
+                return None
+            files = self._conn.execute(
+                "SELECT filename, patch_hash, review FROM file_reviews "
+                "WHERE repo = ? AND number = ?",
+                (repo, number),
+            ).fetchall()
+        return StoredReview(row[0], {name: (h, review) for name, h, review in files})
+
+    def save(
+        self,
+        repo: str,
+        number: int,
+        head_sha: str,
+        files: dict[str, tuple[str, Optional[str]]],
+    ) -> None:
+        """Replace the stored review of a PR
+
+        Args:
+            repo (str): Full name of the repository
+            number (int): Number of the PR
+            head_sha (str): Head commit the review was made for
+            files (dict[str, tuple[str, Optional[str]]]): (patch hash, review) by filename
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reviews (repo, number, head_sha, reviewed) "
+                "VALUES (?, ?, ?, ?)",
+                (repo, number, head_sha, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM file_reviews WHERE repo = ? AND number = ?", (repo, number)
+            )
+            self._conn.executemany(
+                "INSERT INTO file_reviews (repo, number, filename, patch_hash, review) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (repo, number, name, h, review)
+                    for name, (h, review) in files.items()
+                ],
+            )
+
+
+_default_store: Optional[ReviewStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_review_store() -> Optional[ReviewStore]:
+    """The process-wide review store configured from the environment
+
+    Returns:
+        Optional[ReviewStore]: The shared store or None when REVIEW_STORE_PATH is unset
+    """
+    global _default_store
+    if not config.REVIEW_STORE_PATH:
+        return None
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ReviewStore(config.REVIEW_STORE_PATH)
+        return _default_store
@@ -0,0 +1,437 @@
+"""
+Multi-process mode of the bridge
+
+The process Elixir spawns keeps reading stdin and writing stdout, but instead of
+running the messages on its own threads it hands them to worker processes, so
+CPU-bound work (parsing, JSON, prompt assembly) is not serialized by one GIL.
+The protocol seen by Elixir does not change.
+
+Workers are forked by a forkserver that imports the heavy modules once, so they
+start warm and share those pages. Each worker runs the usual Dispatcher, a message
+goes to the worker with the fewest requests in flight, and its partial frames and
+response come back through the worker's pipe. A worker that dies is replaced and
+the requests it was running are answered with an error. A "metrics" message is
+answered by the front process with its own metrics added to every worker's.
+"""
+
+import importlib
+import itertools
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from multiprocessing.connection import Connection
+from typing import BinaryIO, Callable, Iterable, Optional
+
+from pythonbridge.core.dispatcher import (
+    Dispatcher,
+    ResponseWriter,
+    read_messages,
+)
+from pythonbridge.core.framing import get_framing
+from pythonbridge.core.metrics import merge_snapshots
+
+# Types answered by the front process itself: health checks must not wait for a
+# busy (or restarting) worker, "workers" reports on the pool and "metrics" adds
+# up the metrics of the front and of every worker
+LOCAL_TYPES = {"hello", "workers", "metrics"}
+
+# Max seconds between two restarts of a worker that keeps crashing
+MAX_RESTART_DELAY = 5.0
+
+# Max seconds the front waits for the workers to answer a broadcast message
+BROADCAST_TIMEOUT = 5.0
+
+
+def resolve(handler: str) -> Callable[[dict], dict]:
+    """The function a "module:function" path points to"""
+    module, _, name = handler.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+class PipeWriter:
+    """ResponseWriter of a worker, responses go back to the front process"""
+
+    def __init__(self, conn: Connection) -> None:
+        self.conn = conn
+        self._lock = threading.Lock()
+
+    def put(self, response: dict) -> None:
+        with self._lock:
+            self.conn.send(response)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _worker_main(
+    conn: Connection, handler: str, limits: dict[str, int], default_limit: int
+) -> None:
+    # stdout belongs to the front process (the bridge protocol), anything a
+    # worker prints goes to stderr instead
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    dispatcher = Dispatcher(resolve(handler), PipeWriter(conn), limits, default_limit)
+    try:
+        while True:
+            try:
+                msg = conn.recv()
+            except EOFError:
+                break
+            if msg is None:
+                break
+            dispatcher.submit(msg)
+    finally:
+        dispatcher.shutdown()
+
+
+class Worker:
+    """One worker process and the requests it is running
+
+    Attributes:
+        index (int): Slot of the worker in the pool
+        process (Optional[multiprocessing.Process]): The current process of the slot
+        conn (Optional[Connection]): The front process's end of its pipe
+        in_flight (Counter): Requests sent and not answered yet, by "_id"
+        restarts (int): Times the slot's process was replaced
+        handled (int): Responses received from the slot
+    """
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.conn: Optional[Connection] = None
+        self.in_flight: Counter = Counter()
+        self.restarts = 0
+        self.handled = 0
+        self.alive = False
+        self.lock = threading.Lock()
+
+    @property
+    def depth(self) -> int:
+        """Requests queued on or running in the worker"""
+        return sum(self.in_flight.values())
+
+
+class Broadcast:
+    """A message sent to every live worker and the responses received so far
+
+    Attributes:
+        waiting (set[int]): Slots of the workers that did not answer yet
+        responses (list[dict]): Responses of the workers that did
+        done (threading.Event): Set once no worker is left to wait for
+    """
+
+    def __init__(self, waiting: set[int]) -> None:
+        self.waiting = waiting
+        self.responses: list[dict] = []
+        self.done = threading.Event()
+        if not waiting:
+            self.done.set()
+
+    def answered(self, index: int, response: Optional[dict]) -> None:
+        """Record the response of a worker (None when it crashed), must hold the pool lock"""
+        if index not in self.waiting:
+            return
+        self.waiting.discard(index)
+        if response is not None:
+            self.responses.append(response)
+        if not self.waiting:
+            self.done.set()
+
+
+class WorkerPool:
+    """Supervises the worker processes and routes messages to them.
+
+    Attributes:
+        workers (list[Worker]): The worker slots
+    """
+
+    def __init__(
+        self,
+        handler: str,
+        size: int,
+        writer: ResponseWriter,
+        limits: dict[str, int],
+        default_limit: int = 1,
+        preload: Iterable[str] = (),
+    ) -> None:
+        """
+        Args:
+            handler (str): "module:function" turning a message into its response dict
+            size (int): Number of worker processes
+            writer (ResponseWriter): The single writer responses are sent to
+            limits (dict[str, int]): Max concurrent requests per type in each worker
+            default_limit (int): Max concurrent requests per worker for other types
+            preload (Iterable[str]): Modules the forkserver imports before forking
+        """
+        self.handler = handler
+        self.writer = writer
+        self.limits = limits
+        self.default_limit = default_limit
+        self.workers = [Worker(i) for i in range(size)]
+        self.closing = False
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        # messages received while no worker was up yet
+        self._backlog: list[dict] = []
+        # broadcasts waiting for responses, by the "_id" their messages were sent with
+        self._broadcasts: dict[tuple, Broadcast] = {}
+        self._broadcast_ids = itertools.count()
+
+        methods = multiprocessing.get_all_start_methods()
+        if "forkserver" in methods:
+            # workers fork from a server that already imported the heavy modules
+            self.context = multiprocessing.get_context("forkserver")
+            self.context.set_forkserver_preload(list(preload))
+        else:
+            self.context = multiprocessing.get_context("spawn")
+
+    def start(self) -> None:
+        """Start the workers in the background, each slot with its own supervising thread
+
+        Messages submitted before any worker is up are held and sent to the first
+        one that is.
+        """
+        for worker in self.workers:
+            thread = threading.Thread(
+                target=self._supervise,
+                args=(worker,),
+                name=f"bridge-worker-{worker.index}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, msg: dict) -> None:
+        """Send a message to the live worker with the fewest requests in flight
+
+        Args:
+            msg (dict): Message received from Elixir
+        """
+        with self._lock:
+            alive = [worker for worker in self.workers if worker.alive]
+            if not alive:
+                self._backlog.append(msg)
+                return
+            worker = min(alive, key=lambda w: w.depth)
+            worker.in_flight[msg.get("_id")] += 1
+        try:
+            with worker.lock:
+                worker.conn.send(msg)
+        except (OSError, ValueError):
+            # the worker died meanwhile, its supervisor answers what it had in flight
+            pass
+
+    def broadcast(self, msg: dict, timeout: Optional[float] = None) -> list[dict]:
+        """Send a message to every live worker and wait for their responses
+
+        The responses are returned instead of being written to Elixir. Workers that
+        crash meanwhile are not waited for.
+
+        Args:
+            msg (dict): Message every worker handles
+            timeout (Optional[float]): Max seconds to wait, None to wait for every worker
+
+        Returns:
+            list[dict]: The responses of the workers that answered in time
+        """
+        # a tuple can not come from a JSON message, so it never clashes with Elixir's ids
+        id = ("broadcast", next(self._broadcast_ids))
+        with self._lock:
+            workers = [worker for worker in self.workers if worker.alive]
+            pending = self._broadcasts[id] = Broadcast({w.index for w in workers})
+        try:
+            for worker in workers:
+                try:
+                    with worker.lock:
+                        worker.conn.send({**msg, "_id": id})
+                except (OSError, ValueError):
+                    with self._lock:
+                        pending.answered(worker.index, None)
+            pending.done.wait(timeout)
+        finally:
+            with self._lock:
+                del self._broadcasts[id]
+        return pending.responses
+
+    def stats(self) -> list[dict]:
+        """Per-worker queue depth and health
+
+        Returns:
+            list[dict]: "worker", "pid", "alive", "depth", "handled" and "restarts"
+                of every slot
+        """
+        with self._lock:
+            return [
+                {
+                    "worker": worker.index,
+                    "pid": worker.process.pid if worker.process else None,
+                    "alive": worker.alive,
+                    "depth": worker.depth,
+                    "handled": worker.handled,
+                    "restarts": worker.restarts,
+                }
+                for worker in self.workers
+            ]
+
+    def shutdown(self) -> None:
+        """Let the workers finish their requests, then stop them"""
+        self.closing = True
+        for worker in self.workers:
+            with worker.lock:
+                if worker.alive:
+                    self._stop(worker)
+        for thread in self._threads:
+            thread.join()
+
+    def _supervise(self, worker: Worker) -> None:
+        crashes = 0
+        while True:
+            self._spawn(worker)
+            if self._read(worker):
+                crashes = 0
+            worker.process.join()
+            if self.closing:
+                return
+            crashes += 1
+            self._crashed(worker)
+            time.sleep(min(MAX_RESTART_DELAY, 0.1 * 2 ** (crashes - 1)))
+
+    def _spawn(self, worker: Worker) -> None:
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(
+            target=_worker_main,
+            args=(child_conn, self.handler, self.limits, self.default_limit),
+            name=f"bridge-worker-{worker.index}",
+        )
+        process.start()
+        # only the worker holds its end now, so its exit shows up as EOF here
+        child_conn.close()
+        with worker.lock:
+            worker.process = process
+            worker.conn = parent_conn
+            with self._lock:
+                worker.alive = True
+                backlog, self._backlog = self._backlog, []
+                for msg in backlog:
+                    worker.in_flight[msg.get("_id")] += 1
+            for msg in backlog:
+                worker.conn.send(msg)
+            if self.closing:
+                self._stop(worker)
+
+    def _stop(self, worker: Worker) -> None:
+        # the worker finishes what it has and exits, must hold worker.lock
+        try:
+            worker.conn.send(None)
+        except (OSError, ValueError):
+            pass
+
+    def _read(self, worker: Worker) -> bool:
+        # forwards the worker's frames until it exits, True if it answered anything
+        answered = False
+        while True:
+            try:
+                response = worker.conn.recv()
+            except (EOFError, OSError):
+                return answered
+            if response.get("status") != "partial":
+                answered = True
+                with self._lock:
+                    id = response.get("_id")
+                    if isinstance(id, tuple):
+                        # for broadcast(), dropped if it gave up waiting already
+                        pending = self._broadcasts.get(id)
+                        if pending is not None:
+                            pending.answered(worker.index, response)
+                        continue
+                    worker.handled += 1
+                    worker.in_flight[id] -= 1
+                    if worker.in_flight[id] <= 0:
+                        del worker.in_flight[id]
+            self.writer.put(response)
+
+    def _crashed(self, worker: Worker) -> None:
+        with self._lock:
+            worker.alive = False
+            worker.restarts += 1
+            lost = list(worker.in_flight.elements())
+            worker.in_flight.clear()
+            for pending in self._broadcasts.values():
+                pending.answered(worker.index, None)
+        print(
+            f"Bridge worker {worker.index} exited with {worker.process.exitcode}, "
+            f"restarting ({len(lost)} requests lost)",
+            file=sys.stderr,
+        )
+        for id in lost:
+            self._fail(id, f"Bridge worker {worker.index} crashed")
+
+    def _fail(self, id, error: str) -> None:
+        self.writer.put(
+            {"status": "error", "response": None, "error": error, "_id": id}
+        )
+
+
+def supervise(
+    handler: str,
+    size: int,
+    limits: dict[str, int],
+    default_limit: int = 1,
+    stdin: Optional[BinaryIO] = None,
+    stdout: Optional[BinaryIO] = None,
+    framing: str = "line",
+    preload: Iterable[str] = (),
+) -> None:
+    """Like dispatcher.serve, with the messages handled by worker processes
+
+    Args:
+        handler (str): "module:function" turning a message into its response dict
+        size (int): Number of worker processes
+        limits (dict[str, int]): Max concurrent requests per type in each worker
+        default_limit (int): Max concurrent requests per worker for other types
+        stdin (Optional[BinaryIO]): Stream the messages are read from (default sys.stdin.buffer)
+        stdout (Optional[BinaryIO]): Stream the responses are written to (default sys.stdout.buffer)
+        framing (str): "line" for JSON lines, "packet" for 4 byte length prefixed frames
+        preload (Iterable[str]): Modules imported once before the workers are forked
+    """
+    wire = get_framing(framing)
+    writer = ResponseWriter(stdout or sys.stdout.buffer, wire)
+    pool = WorkerPool(handler, size, writer, limits, default_limit, preload)
+    respond = resolve(handler)
+
+    def local(msg: dict) -> dict:
+        if msg.get("type") == "workers":
+            return {
+                "status": "ok",
+                "response": pool.stats(),
+                "error": None,
+                "_id": msg.get("_id"),
+            }
+        if msg.get("type") == "metrics":
+            workers = pool.broadcast(msg, BROADCAST_TIMEOUT)
+            response = respond(msg)
+            if response.get("status") == "ok":
+                snapshots = [response["response"]] + [
+                    r["response"] for r in workers if r.get("status") == "ok"
+                ]
+                response["response"] = merge_snapshots(snapshots)
+            return response
+        return respond(msg)
+
+    # answered on the front's own threads, never queued behind worker requests
+    front = Dispatcher(local, writer, {}, default_limit=len(LOCAL_TYPES))
+    pool.start()
+    try:
+        for msg in read_messages(stdin or sys.stdin.buffer, wire, writer):
+            if msg.get("type") in LOCAL_TYPES:
+                front.submit(msg)
+            else:
+                pool.submit(msg)
+    finally:
+        pool.shutdown()
+        front.shutdown()
@@ -1,18 +1,138 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
 from github import GithubIntegration
-from pythonbridge.core import config
+from github.InstallationAuthorization import InstallationAuthorization
+from pythonbridge.core import config, metrics
+
+# Installation tokens live for one hour, refresh them a little before GitHub expires them
+REFRESH_MARGIN = timedelta(minutes=5)
+
+
+class TokenCache:
+    """Process-wide cache of installation tokens keyed by installation id.
+
+    Tokens are reused until they get within the refresh margin of their
+    expires_at. Concurrent refreshes of the same installation are collapsed
+    into a single request, the other callers wait and reuse its token.
+
+    Attributes:
+        refresh_margin (timedelta): How long before expiry a token is refreshed
+        hits (int): Lookups answered from the cache
+        misses (int): Lookups that had to mint a new token
+    """
+
+    def __init__(self, refresh_margin: timedelta = REFRESH_MARGIN) -> None:
+        self.refresh_margin = refresh_margin
+        self.hits = 0
+        self.misses = 0
+        self._tokens: dict[str, tuple[str, datetime]] = {}
+        self._refresh_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        installation_id: str,
+        mint: Callable[[str], InstallationAuthorization],
+    ) -> str:
+        """Return a cached token for the installation, minting one if needed
+
+        Args:
+            installation_id (str): The Github App Installation ID
+            mint (Callable[[str], InstallationAuthorization]): Requests a new token from GitHub
+
+        Returns:
+            str: A token that is valid for at least the refresh margin
+        """
+        key = str(installation_id)
+        token = self._fresh(key)
+        if token is None:
+            # Only one thread per installation mints, the others wait here and then hit
+            with self._refresh_lock(key):
+                token = self._fresh(key)
+                if token is None:
+                    authorization = mint(installation_id)
+                    token = authorization.token
+                    with self._lock:
+                        self.misses += 1
+                        self._tokens[key] = (token, _as_utc(authorization.expires_at))
+                    return token
+
+        with self._lock:
+            self.hits += 1
+        return token
+
+    def stats(self) -> dict:
+        """Counters for monitoring how well the cache works
+
+        Returns:
+            dict: "hits", "misses" and "size" (number of cached installations)
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._tokens)}
+
+    def clear(self) -> None:
+        """Drop every cached token and reset the counters"""
+        with self._lock:
+            self._tokens.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _fresh(self, key: str) -> Optional[str]:
+        with self._lock:
+            cached = self._tokens.get(key)
+        if cached is None:
+            return None
+        token, expires_at = cached
+        if datetime.now(timezone.utc) + self.refresh_margin >= expires_at:
+            return None
+        return token
+
+    def _refresh_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._refresh_locks.setdefault(key, threading.Lock())
+
+
+def _as_utc(value: Optional[datetime]) -> datetime:
+    # Tokens without an expiry are treated as already expired so they are never reused
+    if value is None:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+_token_cache = TokenCache()
+
+
+@metrics.timed("github.token_fetch")
+def _mint_token(installation_id: str) -> InstallationAuthorization:
+    integration = GithubIntegration(
+        integration_id=config.GITHUB_APP_ID, private_key=config.GITHUB_APP_PRIVATE_KEY
+    )
+
+    return integration.get_access_token(installation_id)
 
 
 def get_installation_token(installation_id: str) -> str:
     """Retrieves the installation token for a Github App Installation
 
+    Tokens are cached per installation and only refreshed shortly before they expire.
+
     Args:
         installation_id (str): The string representing the specific Github App Installation ID (found in webhook request payload)
 
     Returns:
         str: The installation token for the Github App Installation
     """
-    integration = GithubIntegration(
-        integration_id=config.GITHUB_APP_ID, private_key=config.GITHUB_APP_PRIVATE_KEY
-    )
+    return _token_cache.get(installation_id, _mint_token)
 
-    return integration.get_access_token(installation_id).token
+
+def token_cache_stats() -> dict:
+    """Hit/miss counters of the process-wide installation token cache
+
+    Returns:
+        dict: "hits", "misses" and "size" (number of cached installations)
+    """
+    return _token_cache.stats()
@@ -1,8 +1,191 @@
 from __future__ import annotations  # issues with type hints
 
-from github import Github, PaginatedList, File
+import contextvars
+import queue
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from github import Auth, Github, GithubException, PaginatedList, File
+from github.PullRequest import PullRequest
+from github.Repository import Repository
+from pythonbridge.core import config, metrics
 from pythonbridge.gh.auth import get_installation_token
 
+# The compare API lists at most this many files
+COMPARE_MAX_FILES = 300
+
+# The files API lists at most this many files of a PR, the raw diff has all of them
+LIST_FILES_MAX = 3000
+
+DIFF_HEADER = re.compile(r"^diff --git a/(.*) b/(.*)$", re.MULTILINE)
+
+
+@dataclass
+class RequestContext:
+    """Repository and PullRequest handles shared by every GitHub call of one request.
+
+    Attributes:
+        repos (dict): Repository objects by full name
+        pulls (dict): PullRequest objects by (full name, PR number)
+        http_requests (int): Number of HTTP requests sent to GitHub inside this context
+    """
+
+    repos: dict[str, Repository] = field(default_factory=dict)
+    pulls: dict[tuple[str, int], PullRequest] = field(default_factory=dict)
+    http_requests: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.http_requests += 1
+
+
+_request_context: ContextVar[Optional[RequestContext]] = ContextVar(
+    "gh_request_context", default=None
+)
+
+
+@contextmanager
+def request_context() -> Iterator[RequestContext]:
+    """Cache repo/PR handles and count GitHub HTTP requests until the block exits.
+
+    Example:
+        with request_context() as ctx:
+            files = get_diff(payload)
+            post_review(payload, reviews)
+        print(ctx.http_requests)
+    """
+    ctx = RequestContext()
+    token = _request_context.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _request_context.reset(token)
+
+
+class InstallationAuth(Auth.Auth):
+    """Authenticates each request with the (cached) installation token.
+
+    The token is looked up per request, so a long lived client keeps working
+    after the token is refreshed. Every request is also counted against the
+    active request context.
+    """
+
+    def __init__(self, installation_id: str) -> None:
+        self.installation_id = installation_id
+
+    @property
+    def token_type(self) -> str:
+        return "token"
+
+    @property
+    def token(self) -> str:
+        return get_installation_token(self.installation_id)
+
+    def authentication(self, headers: dict) -> None:
+        ctx = _request_context.get()
+        if ctx is not None:
+            ctx.count_request()
+        super().authentication(headers)
+
+    @property
+    def _masked_token(self) -> str:
+        return "token (installation token removed)"
+
+
+class ClientManager:
+    """Keeps one Github client (and its pooled keep-alive HTTP session) per installation."""
+
+    def __init__(
+        self,
+        pool_size: int = config.GITHUB_POOL_SIZE,
+        per_page: int = config.GITHUB_PAGE_SIZE,
+    ) -> None:
+        self.pool_size = pool_size
+        self.per_page = per_page
+        self._clients: dict[str, Github] = {}
+        self._lock = threading.Lock()
+
+    def get(self, installation_id: str) -> Github:
+        """Return the client for an installation, creating it on first use
+
+        Args:
+            installation_id (str): The Github App Installation ID
+
+        Returns:
+            Github: A client that is reused across requests
+        """
+        key = str(installation_id)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = Github(
+                    auth=InstallationAuth(installation_id),
+                    pool_size=self.pool_size,
+                    per_page=self.per_page,
+                )
+                self._clients[key] = client
+            return client
+
+    def clear(self) -> None:
+        """Close and drop every client"""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+
+_clients = ClientManager()
+
+
+def get_repo(payload: dict) -> Repository:
+    """Get the repository of the payload, reusing the handle within a request context.
+
+    Args:
+        payload: GitHub webhook payload.
+            Expected keys: "repository.full_name", "installation.id"
+
+    Returns:
+        Repository: The PyGithub repository object
+    """
+    repo_full_name = payload.get("repository").get("full_name")
+    installation_id = payload.get("installation").get("id")
+    ctx = _request_context.get()
+
+    if ctx is not None and repo_full_name in ctx.repos:
+        return ctx.repos[repo_full_name]
+
+    repo = _clients.get(installation_id).get_repo(repo_full_name)
+    if ctx is not None:
+        ctx.repos[repo_full_name] = repo
+    return repo
+
+
+def get_pull(payload: dict) -> PullRequest:
+    """Get the pull request of the payload, reusing the handle within a request context.
+
+    Args:
+        payload: GitHub webhook payload.
+            Expected keys: "number", "repository.full_name", "installation.id"
+
+    Returns:
+        PullRequest: The PyGithub pull request object
+    """
+    key = (payload.get("repository").get("full_name"), payload.get("number"))
+    ctx = _request_context.get()
+
+    if ctx is not None and key in ctx.pulls:
+        return ctx.pulls[key]
+
+    pr = get_repo(payload).get_pull(payload.get("number"))
+    if ctx is not None:
+        ctx.pulls[key] = pr
+    return pr
+
 
 def create_reaction(payload: dict, reaction_type: str = "eyes") -> None:
     """Add a reaction to the triggering comment.
@@ -12,14 +195,10 @@ def create_reaction(payload: dict, reaction_type: str = "eyes") -> None:
             Expected keys: "comment_id", "repository.full_name", "installation.id"
         reaction_type: The reaction to add (default "eyes").
     """
-    repo_full_name = payload.get("repository").get("full_name")
-    installation_id = payload.get("installation").get("id")
     comment_id = payload.get("comment_id")
-    installation_token = get_installation_token(installation_id)
-
     pr_number = payload.get("number")
-    github_client = Github(installation_token)
-    repo = github_client.get_repo(repo_full_name)
+
+    repo = get_repo(payload)
     comment = repo.get_issue(pr_number).get_comment(comment_id)
     comment.create_reaction(reaction_type)
 
@@ -34,21 +213,249 @@ def get_diff(payload: dict) -> PaginatedList[File]:
     Returns:
         PaginatedList of File objects representing changed files in the PR.
     """
-    # Get installation token
-    pr_number = payload.get("number")
-    repo_full_name = payload.get("repository").get("full_name")
-    installation_id = payload.get("installation").get("id")
-    installation_token = get_installation_token(installation_id)
-
-    # Create Github client and get changed files from PR
-    github_client = Github(installation_token)
-    repo = github_client.get_repo(repo_full_name)
-    pr = repo.get_pull(pr_number)
+    pr = get_pull(payload)
     files = pr.get_files()
 
     return files
 
 
+@dataclass
+class DiffFile:
+    """A changed file recovered from the raw diff, read like a PyGithub File.
+
+    Attributes:
+        filename (str): Path of the file in the head commit
+        status (str): "added", "removed", "renamed" or "modified"
+        patch (Optional[str]): The hunks of the file, None for binary files
+        changes (int): Added plus removed lines
+    """
+
+    filename: str
+    status: str
+    patch: Optional[str]
+    changes: int = 0
+
+
+def parse_diff(diff: str) -> dict[str, DiffFile]:
+    """Split a raw unified diff into its files.
+
+    Args:
+        diff: The output of `git diff` for the whole PR.
+
+    Returns:
+        dict[str, DiffFile]: The files by path, with patches shaped like the files
+            API's (hunks only, without the diff --git and ---/+++ headers)
+    """
+    files = {}
+    headers = list(DIFF_HEADER.finditer(diff))
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(diff)
+        section = diff[header.end() + 1 : end]
+        old_name, filename = header.group(1), header.group(2)
+        hunks = section.find("@@")
+        meta = section if hunks < 0 else section[:hunks]
+
+        if "new file mode" in meta:
+            status = "added"
+        elif "deleted file mode" in meta:
+            status = "removed"
+        elif old_name != filename:
+            status = "renamed"
+        else:
+            status = "modified"
+        patch = section[hunks:].rstrip("\n") if hunks >= 0 else None
+        changes = 0
+        if patch:
+            changes = sum(
+                1
+                for line in patch.splitlines()
+                if line[:1] in ("+", "-") and not line.startswith(("+++", "---"))
+            )
+        files[filename] = DiffFile(filename, status, patch, changes)
+    return files
+
+
+def get_raw_diff(payload: dict) -> Optional[str]:
+    """Get the whole diff of a pull request in one response.
+
+    Args:
+        payload: GitHub webhook payload containing PR details.
+            Expected keys: "number", "repository.full_name", "installation.id"
+
+    Returns:
+        Optional[str]: The unified diff, None when GitHub refuses it (too large)
+    """
+    pr = get_pull(payload)
+    try:
+        with metrics.timer("github.raw_diff"):
+            _, data = pr.requester.requestJsonAndCheck(
+                "GET", pr.url, headers={"Accept": "application/vnd.github.v3.diff"}
+            )
+    except GithubException:
+        return None
+    return data.get("data") if isinstance(data, dict) else None
+
+
+def _truncated(file) -> bool:
+    # The files API leaves the patch out of files with too large a diff
+    return not file.patch and (file.changes or 0) > 0
+
+
+def iter_diff_pages(payload: dict) -> Iterator[list]:
+    """Fetch the changed files of a pull request page by page.
+
+    Files whose patch GitHub left out, and files past the files API's limit of
+    3000, are recovered from the raw diff and sent as one last page.
+
+    Args:
+        payload: GitHub webhook payload containing PR details.
+            Expected keys: "number", "repository.full_name", "installation.id"
+
+    Yields:
+        list: File objects (DiffFile for the recovered ones) of one page, in diff order
+    """
+    pr = get_pull(payload)
+    paginated = pr.get_files()
+    held_back = []
+    listed = set()
+    page_number = 0
+    while True:
+        with metrics.timer("github.diff_page"):
+            page = paginated.get_page(page_number)
+        if not page:
+            break
+        listed.update(file.filename for file in page)
+        held_back += [file for file in page if _truncated(file)]
+        complete = [file for file in page if not _truncated(file)]
+        if complete:
+            yield complete
+        page_number += 1
+
+    missing = len(listed) >= LIST_FILES_MAX and pr.changed_files > len(listed)
+    if not held_back and not missing:
+        return
+
+    diff = get_raw_diff(payload)
+    recovered = parse_diff(diff) if diff else {}
+    # truncated files keep their File when the raw diff is refused too
+    last_page = [recovered.pop(file.filename, file) for file in held_back]
+    if missing:
+        # what the files API did not list at all comes after the listed files
+        last_page += [file for name, file in recovered.items() if name not in listed]
+    if last_page:
+        yield last_page
+
+
+def prefetch_diff(
+    payload: dict, depth: int = config.GITHUB_PREFETCH_PAGES
+) -> Iterator[list]:
+    """iter_diff_pages running ahead in a background thread.
+
+    Pages are downloaded while the caller works on the ones already received, up
+    to depth pages ahead. The thread shares the caller's request context.
+
+    Args:
+        payload: GitHub webhook payload containing PR details.
+            Expected keys: "number", "repository.full_name", "installation.id"
+        depth: Max pages fetched and not consumed yet.
+
+    Yields:
+        list: File objects of one page, in diff order
+
+    Raises:
+        Exception: Whatever fetching a page raised, once the pages before it are consumed
+    """
+    pages: queue.Queue = queue.Queue(maxsize=max(1, depth))
+    done = object()
+    stop = threading.Event()
+
+    def offer(item) -> bool:
+        # blocks while the queue is full, gives up once the consumer is gone
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for page in iter_diff_pages(payload):
+                if not offer(page):
+                    return
+        except Exception as e:
+            offer(e)
+            return
+        offer(done)
+
+    context = contextvars.copy_context()
+    thread = threading.Thread(
+        target=context.run, args=(produce,), name="diff-prefetch", daemon=True
+    )
+    thread.start()
+    try:
+        while True:
+            page = pages.get()
+            if page is done:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        # the consumer stopped early, let the producer exit instead of blocking
+        stop.set()
+
+
+def get_head_sha(payload: dict) -> str:
+    """Get the head commit of a pull request.
+
+    Args:
+        payload: GitHub webhook payload containing PR details.
+            Expected keys: "number", "repository.full_name", "installation.id"
+
+    Returns:
+        str: SHA of the PR's head commit
+    """
+    return get_pull(payload).head.sha
+
+
+def get_changed_since(
+    payload: dict, base_sha: str, head_sha: str
+) -> Optional[set[str]]:
+    """Get the files changed between two commits of a pull request.
+
+    Uses the compare API, so only the new commits are looked at.
+
+    Args:
+        payload: GitHub webhook payload containing PR details.
+            Expected keys: "repository.full_name", "installation.id"
+        base_sha: The commit reviewed last time.
+        head_sha: The current head commit.
+
+    Returns:
+        Optional[set[str]]: Paths changed (old and new names of renamed files), None
+            when the commits cannot be compared incrementally (force push, base commit
+            gone, more files than the compare API lists)
+    """
+    try:
+        comparison = get_repo(payload).compare(base_sha, head_sha)
+    except GithubException:
+        return None
+    # "diverged" or "behind": history was rewritten since the last review
+    if comparison.status not in ("ahead", "identical"):
+        return None
+    files = list(comparison.files)
+    if len(files) >= COMPARE_MAX_FILES:
+        return None
+    changed = set()
+    for file in files:
+        changed.add(file.filename)
+        if file.previous_filename:
+            changed.add(file.previous_filename)
+    return changed
+
+
 def post_review(payload: dict, reviews: list[dict]) -> None:
     """Post code review comments to a pull request.
 
@@ -60,22 +467,14 @@ def post_review(payload: dict, reviews: list[dict]) -> None:
             Expected keys: "number", "repository.full_name", "installation.id"
         reviews: List of review dicts with keys "filename" and "review".
     """
-    pr_number = payload.get("number")
-    repo_full_name = payload.get("repository").get("full_name")
-    installation_id = payload.get("installation").get("id")
-    installation_token = get_installation_token(installation_id)
-
-    github_client = Github(installation_token)
-    repo = github_client.get_repo(repo_full_name)
-    pr = repo.get_pull(pr_number)
-
     body = ""
     for r in reviews:
         if r["review"]:
             body += f"**{r['filename']}**\n{r['review']}\n\n"
 
     if body:
-        pr.create_issue_comment(body)
+        with metrics.timer("github.post_review"):
+            get_pull(payload).create_issue_comment(body)
 
 
 def post_comment(payload: dict, body: str) -> None:
@@ -86,12 +485,5 @@ def post_comment(payload: dict, body: str) -> None:
             Expected keys: "number", "repository.full_name", "installation.id"
         body: The comment body to post.
     """
-    pr_number = payload.get("number")
-    repo_full_name = payload.get("repository").get("full_name")
-    installation_id = payload.get("installation").get("id")
-    installation_token = get_installation_token(installation_id)
-
-    github_client = Github(installation_token)
-    repo = github_client.get_repo(repo_full_name)
-    pr = repo.get_pull(pr_number)
+    pr = get_pull(payload)
     pr.create_issue_comment(body)
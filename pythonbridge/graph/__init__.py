@@ -0,0 +1,4 @@
+from pythonbridge.graph.backends import MemoryBackend, Neo4jBackend
+from pythonbridge.graph.ingest import GraphIngestor
+
+__all__ = ["GraphIngestor", "MemoryBackend", "Neo4jBackend"]
@@ -0,0 +1,248 @@
+from __future__ import annotations  # issues with type hints
+
+import threading
+from collections import defaultdict
+from typing import Optional, Protocol
+
+from pythonbridge.core import config
+
+# Unique key property of every node label
+NODE_KEYS = {
+    "File": "path",
+    "Class": "id",
+    "Function": "id",
+    "Module": "name",
+    "Name": "name",
+}
+
+# Every (relationship type, source label, target label) the ingestor writes
+EDGE_KINDS = [
+    ("DEFINES", "File", "Class"),
+    ("DEFINES", "File", "Function"),
+    ("HAS_METHOD", "Class", "Function"),
+    ("CALLS", "Function", "Name"),
+    ("INSTANTIATES", "Function", "Name"),
+    ("IMPORTS", "File", "Module"),
+]
+EDGE_TYPES = sorted({edge_type for edge_type, _, _ in EDGE_KINDS})
+
+# Labels whose nodes belong to a single file and are deleted with it
+OWNED_LABELS = ["Class", "Function"]
+
+
+class GraphBackend(Protocol):
+    """Storage the ingestor writes to, every method takes a whole batch of rows"""
+
+    def ensure_schema(self) -> None:
+        """Create the uniqueness constraints and indexes the writes rely on"""
+
+    def delete_files(self, files: list[str], remove: bool = False) -> None:
+        """Delete every edge and owned node of the files (and the File nodes if remove)"""
+
+    def merge_nodes(self, label: str, rows: list[dict]) -> None:
+        """Create or update nodes from rows of {"key": ..., "props": {...}}"""
+
+    def merge_edges(
+        self, edge_type: str, source: str, target: str, rows: list[dict]
+    ) -> None:
+        """Create edges from rows of {"source": key, "target": key, "props": {...}}"""
+
+
+def _check_label(label: str) -> str:
+    # labels and types are formatted into Cypher, only the known ones are allowed
+    if label not in NODE_KEYS and label not in EDGE_TYPES:
+        raise ValueError(f"Unknown graph label: {label}")
+    return label
+
+
+class Neo4jBackend:
+    """Writes batches with one parameterised UNWIND query each over a single session.
+
+    Attributes:
+        batch_size (int): Max rows sent with one query
+        queries (int): Number of write queries sent
+    """
+
+    def __init__(
+        self,
+        driver=None,
+        database: Optional[str] = None,
+        batch_size: int = config.GRAPH_BATCH_SIZE,
+    ) -> None:
+        """
+        Args:
+            driver (Optional[neo4j.Driver]): The driver to use, the shared pooled one when not given
+            database (Optional[str]): Database name (None for the server default)
+            batch_size (int): Max rows sent with one query
+        """
+        self._driver = driver or get_driver()
+        self._session = self._driver.session(database=database)
+        self.batch_size = batch_size
+        self.queries = 0
+
+    def ensure_schema(self) -> None:
+        for label, key in NODE_KEYS.items():
+            self._session.run(
+                f"CREATE CONSTRAINT {label.lower()}_{key} IF NOT EXISTS "
+                f"FOR (n:{label}) REQUIRE n.{key} IS UNIQUE"
+            ).consume()
+        for label in OWNED_LABELS:
+            self._session.run(
+                f"CREATE INDEX {label.lower()}_file IF NOT EXISTS "
+                f"FOR (n:{label}) ON (n.file)"
+            ).consume()
+        for edge_type in EDGE_TYPES:
+            self._session.run(
+                f"CREATE INDEX {edge_type.lower()}_file IF NOT EXISTS "
+                f"FOR ()-[r:{edge_type}]-() ON (r.file)"
+            ).consume()
+
+    def delete_files(self, files: list[str], remove: bool = False) -> None:
+        for edge_type in EDGE_TYPES:
+            self._write(
+                f"UNWIND $rows AS file MATCH ()-[r:{edge_type} {{file: file}}]->() "
+                "DELETE r",
+                files,
+            )
+        for label in OWNED_LABELS:
+            self._write(
+                f"UNWIND $rows AS file MATCH (n:{label} {{file: file}}) "
+                "DETACH DELETE n",
+                files,
+            )
+        if remove:
+            self._write(
+                "UNWIND $rows AS file MATCH (n:File {path: file}) DETACH DELETE n",
+                files,
+            )
+
+    def merge_nodes(self, label: str, rows: list[dict]) -> None:
+        key = NODE_KEYS[_check_label(label)]
+        self._write(
+            f"UNWIND $rows AS row MERGE (n:{label} {{{key}: row.key}}) "
+            "SET n += row.props",
+            rows,
+        )
+
+    def merge_edges(
+        self, edge_type: str, source: str, target: str, rows: list[dict]
+    ) -> None:
+        _check_label(edge_type)
+        source_key = NODE_KEYS[_check_label(source)]
+        target_key = NODE_KEYS[_check_label(target)]
+        # old edges of the file were deleted first, so CREATE does not duplicate them
+        self._write(
+            f"UNWIND $rows AS row "
+            f"MATCH (a:{source} {{{source_key}: row.source}}) "
+            f"MATCH (b:{target} {{{target_key}: row.target}}) "
+            f"CREATE (a)-[r:{edge_type}]->(b) SET r = row.props",
+            rows,
+        )
+
+    def close(self) -> None:
+        self._session.close()
+
+    def _write(self, query: str, rows: list) -> None:
+        for i in range(0, len(rows), self.batch_size):
+            batch = rows[i : i + self.batch_size]
+            self._session.execute_write(lambda tx: tx.run(query, rows=batch).consume())
+            self.queries += 1
+
+
+class MemoryBackend:
+    """In-memory stand-in for Neo4jBackend with the same batch interface.
+
+    Attributes:
+        nodes (dict): Node properties by label and key
+        edges (list[tuple]): (type, source label, source key, target label, target key, props)
+        queries (int): Number of batches written, one per query Neo4jBackend would send
+        schema (bool): Whether ensure_schema was called
+    """
+
+    def __init__(self) -> None:
+        self.nodes: dict[str, dict[str, dict]] = defaultdict(dict)
+        self.edges: list[tuple] = []
+        self.queries = 0
+        self.schema = False
+        self._lock = threading.Lock()
+
+    def ensure_schema(self) -> None:
+        self.schema = True
+
+    def delete_files(self, files: list[str], remove: bool = False) -> None:
+        files = set(files)
+        with self._lock:
+            owned = {
+                (label, key)
+                for label in OWNED_LABELS
+                for key, props in self.nodes[label].items()
+                if props.get("file") in files
+            }
+            if remove:
+                owned |= {("File", path) for path in files}
+            for label, key in owned:
+                self.nodes[label].pop(key, None)
+            self.edges = [
+                edge
+                for edge in self.edges
+                if edge[5].get("file") not in files
+                and (edge[1], edge[2]) not in owned
+                and (edge[3], edge[4]) not in owned
+            ]
+            self.queries += len(EDGE_TYPES) + len(OWNED_LABELS) + int(remove)
+
+    def merge_nodes(self, label: str, rows: list[dict]) -> None:
+        with self._lock:
+            nodes = self.nodes[_check_label(label)]
+            for row in rows:
+                nodes.setdefault(row["key"], {}).update(row["props"])
+            self.queries += 1
+
+    def merge_edges(
+        self, edge_type: str, source: str, target: str, rows: list[dict]
+    ) -> None:
+        with self._lock:
+            for row in rows:
+                # MATCH semantics, edges to missing nodes are not created
+                if (
+                    row["source"] in self.nodes[source]
+                    and row["target"] in self.nodes[target]
+                ):
+                    self.edges.append(
+                        (
+                            _check_label(edge_type),
+                            source,
+                            row["source"],
+                            target,
+                            row["target"],
+                            dict(row["props"]),
+                        )
+                    )
+            self.queries += 1
+
+    def close(self) -> None:
+        pass
+
+
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def get_driver():
+    """The process-wide Neo4j driver (and its connection pool) from the environment
+
+    Returns:
+        neo4j.Driver: The shared driver
+    """
+    global _driver
+    with _driver_lock:
+        if _driver is None:
+            try:
+                from neo4j import GraphDatabase
+            except ImportError as e:
+                raise ImportError(
+                    "Neo4j ingestion needs the neo4j package (uv sync --extra graph)"
+                ) from e
+            user, _, password = config.NEO4J_AUTH.partition("/")
+            _driver = GraphDatabase.driver(config.NEO4J_URI, auth=(user, password))
+        return _driver
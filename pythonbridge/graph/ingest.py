@@ -0,0 +1,200 @@
+import re
+from collections import defaultdict
+from typing import Iterable
+
+from pythonbridge.core import config
+from pythonbridge.graph.backends import GraphBackend
+
+
+def imported_modules(statement: str) -> list[str]:
+    """Module names of an import statement
+
+    Args:
+        statement (str): Source of an import or from...import statement
+
+    Returns:
+        list[str]: "import a.b as c, d" gives ["a.b", "d"], "from .x import y" gives [".x"]
+    """
+    text = re.sub(r"[()\\]", " ", statement)
+    text = " ".join(text.split())
+    if text.startswith("from "):
+        return [text[len("from ") :].split(" import ", 1)[0].strip()]
+    names = text[len("import ") :].split(",")
+    return [name.split(" as ", 1)[0].strip() for name in names if name.strip()]
+
+
+def _location_props(file_path: str, entry: dict) -> dict:
+    # Neo4j properties can not hold nested lists, keep 1-based line numbers
+    start, end = entry["location"]
+    return {"file": file_path, "line": start[0] + 1, "end_line": end[0] + 1}
+
+
+def file_rows(file_path: str, relationships: dict) -> tuple[dict, dict]:
+    """Convert the relationships of one file into node and edge rows
+
+    Classes and functions are keyed "<path>::<name>" (methods "<path>::<Class>.<name>"),
+    call targets and imported modules by name so they are shared across files.
+
+    Args:
+        file_path (str): Path of the file relative to the repository root
+        relationships (dict): Output of AST_manager.get_relationships for the file
+
+    Returns:
+        tuple[dict, dict]: Node rows by label and edge rows by (type, source, target)
+    """
+    nodes = defaultdict(dict)
+    edges = defaultdict(list)
+
+    def node(label: str, key: str, **props) -> str:
+        nodes[label].setdefault(key, {}).update(props)
+        return key
+
+    def edge(kind: tuple[str, str, str], source: str, target: str, entry: dict) -> None:
+        edges[kind].append(
+            {
+                "source": source,
+                "target": target,
+                "props": _location_props(file_path, entry),
+            }
+        )
+
+    node("File", file_path, path=file_path)
+
+    for entry in relationships.get("class_def", []):
+        name = entry["callee"]
+        key = node("Class", f"{file_path}::{name}", name=name, file=file_path)
+        edge(("DEFINES", "File", "Class"), file_path, key, entry)
+
+    for entry in relationships.get("function_def", []):
+        name = entry["callee"]
+        key = node("Function", f"{file_path}::{name}", name=name, file=file_path)
+        edge(("DEFINES", "File", "Function"), file_path, key, entry)
+
+    for entry in relationships.get("method", []):
+        class_name, name = entry["caller"], entry["callee"]
+        class_key = node(
+            "Class", f"{file_path}::{class_name}", name=class_name, file=file_path
+        )
+        key = node(
+            "Function",
+            f"{file_path}::{class_name}.{name}",
+            name=name,
+            file=file_path,
+            method=True,
+        )
+        edge(("HAS_METHOD", "Class", "Function"), class_key, key, entry)
+
+    for relation, edge_type in (("call", "CALLS"), ("instantiation", "INSTANTIATES")):
+        for entry in relationships.get(relation, []):
+            name = entry["caller"]
+            caller = node("Function", f"{file_path}::{name}", name=name, file=file_path)
+            target = node("Name", entry["callee"], name=entry["callee"])
+            edge((edge_type, "Function", "Name"), caller, target, entry)
+
+    for relation in ("imports", "imports_from"):
+        for entry in relationships.get(relation, []):
+            for module in imported_modules(entry["callee"]):
+                target = node("Module", module, name=module)
+                edge(("IMPORTS", "File", "Module"), file_path, target, entry)
+
+    return nodes, edges
+
+
+class GraphIngestor:
+    """Writes AST relationships into a graph backend in large batches.
+
+    Files are buffered until about batch_size rows are pending. A flush then
+    deletes the old edges and owned nodes of just the buffered files and writes
+    every label and edge kind with one batched call each, instead of one write
+    per edge.
+
+    Example:
+        ingestor = GraphIngestor(Neo4jBackend())
+        ingestor.ensure_schema()
+        indexer = RepositoryIndexer(root, manifest_path)
+        ingestor.ingest(indexer.index(), removed=lambda: indexer.removed)
+
+    Attributes:
+        backend (GraphBackend): Where the graph is written
+        batch_size (int): Pending rows that trigger a flush
+        files_written (int): Files ingested so far
+        edges_written (int): Edges written so far
+    """
+
+    def __init__(
+        self, backend: GraphBackend, batch_size: int = config.GRAPH_BATCH_SIZE
+    ) -> None:
+        self.backend = backend
+        self.batch_size = batch_size
+        self.files_written = 0
+        self.edges_written = 0
+        self._files: list[str] = []
+        self._nodes: dict[str, dict[str, dict]] = defaultdict(dict)
+        self._edges: dict[tuple[str, str, str], list[dict]] = defaultdict(list)
+        self._pending = 0
+
+    def ensure_schema(self) -> None:
+        """Create the constraints and indexes (idempotent)"""
+        self.backend.ensure_schema()
+
+    def add(self, file_path: str, relationships: dict) -> None:
+        """Queue the relationships of a new or changed file, flushing when the buffer is full"""
+        nodes, edges = file_rows(file_path, relationships)
+        self._files.append(file_path)
+        for label, rows in nodes.items():
+            for key, props in rows.items():
+                self._nodes[label].setdefault(key, {}).update(props)
+            self._pending += len(rows)
+        for kind, rows in edges.items():
+            self._edges[kind].extend(rows)
+            self._pending += len(rows)
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Replace the graph of every buffered file"""
+        if not self._files:
+            return
+        self.backend.delete_files(self._files)
+        for label, rows in self._nodes.items():
+            self.backend.merge_nodes(
+                label, [{"key": key, "props": props} for key, props in rows.items()]
+            )
+        for (edge_type, source, target), rows in self._edges.items():
+            self.backend.merge_edges(edge_type, source, target, rows)
+            self.edges_written += len(rows)
+
+        self.files_written += len(self._files)
+        self._files = []
+        self._nodes = defaultdict(dict)
+        self._edges = defaultdict(list)
+        self._pending = 0
+
+    def remove(self, files: Iterable[str]) -> None:
+        """Delete deleted files and everything they own from the graph"""
+        files = list(files)
+        if files:
+            self.backend.delete_files(files, remove=True)
+
+    def ingest(
+        self, results: Iterable[tuple[str, dict]], removed: Iterable[str] = ()
+    ) -> dict:
+        """Ingest a stream of (path, relationships), like RepositoryIndexer.index()
+
+        Args:
+            results (Iterable[tuple[str, dict]]): Changed files and their relationships
+            removed (Iterable[str]): Files to delete, read after results is consumed
+                (a callable returning them is also accepted)
+
+        Returns:
+            dict: "files" and "edges" written by this call
+        """
+        files, edges = self.files_written, self.edges_written
+        for file_path, relationships in results:
+            self.add(file_path, relationships)
+        self.flush()
+        self.remove(removed() if callable(removed) else removed)
+        return {
+            "files": self.files_written - files,
+            "edges": self.edges_written - edges,
+        }
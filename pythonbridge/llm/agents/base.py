@@ -1,5 +1,45 @@
+import threading
+from pathlib import Path
 from typing import TypedDict
 
+PROMPT_DIR = Path(__file__).parent / "prompts"
+
+# Prompt text by file name, along with the mtime it was read at
+_prompts: dict[str, tuple[int, str]] = {}
+_prompts_lock = threading.Lock()
+
+
+def prompt_version(name: str) -> int:
+    """Version of a prompt file, changes whenever the file is modified
+
+    Args:
+        name (str): File name inside the prompts directory
+
+    Returns:
+        int: The file's modification time in nanoseconds
+    """
+    return (PROMPT_DIR / name).stat().st_mtime_ns
+
+
+def load_prompt(name: str) -> str:
+    """Read a prompt file once and reuse it until the file changes on disk
+
+    Args:
+        name (str): File name inside the prompts directory
+
+    Returns:
+        str: The prompt text
+    """
+    version = prompt_version(name)
+    with _prompts_lock:
+        cached = _prompts.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        text = (PROMPT_DIR / name).read_text()
+        _prompts[name] = (version, text)
+        return text
+
 
 # TODO: See if need to append any state using Annotated[list, operator.add]
 class State(TypedDict):
@@ -10,6 +50,8 @@ class State(TypedDict):
     """
 
     pr_input: str
+    # Signatures of the code the patch affects, sent ahead of it (see core.context)
+    pr_context: str
     pr_review: str
     pr_review_validation: str
     review_context: str
@@ -1,9 +1,7 @@
-from pathlib import Path
-
 from pythonbridge.llm.groq import GroqLLM
-from pythonbridge.llm.agents.base import State
+from pythonbridge.llm.agents.base import State, load_prompt
 
-PROMPT_DIR = Path(__file__).parent / "prompts"
+PROMPT_FILE = "reviewer.md"
 
 
 class ReviewAgent:
@@ -11,7 +9,7 @@ class ReviewAgent:
 
     # TODO: Update context here and in State to be joinable with the general system prompt
     def __init__(self, context: str) -> None:
-        self.general_system_prompt = (PROMPT_DIR / "reviewer.md").read_text()
+        self.general_system_prompt = load_prompt(PROMPT_FILE)
         self.context = context
         self.llm = GroqLLM(system_prompt=self.general_system_prompt + self.context)
 
@@ -24,8 +22,14 @@ class ReviewAgent:
         Returns:
             dict: The new state that LangGraph will automatically store
         """
+        # The impact context of this request goes with the patch, not in the system
+        # prompt, so one compiled graph serves every request
+        message = state["pr_input"]
+        if state.get("pr_context"):
+            message = f"{state['pr_context']}\n\n{message}"
+
         # Generate response from LLM and add response + review context to State
-        response = self.llm.invoke(state["pr_input"])
+        response = self.llm.invoke(message)
 
         if response is None:
             raise RuntimeError("ReviewAgent's llm did not respond")
@@ -0,0 +1,226 @@
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Rough characters per token of code diffs, kept low so estimates err on the large side
+CHARS_PER_TOKEN = 3
+
+HUNK_START = re.compile(r"^@@ ", re.MULTILINE)
+
+FILE_START = "=== FILE: {name} ==="
+FILE_END = "=== END FILE: {name} ==="
+FILE_MARKER = re.compile(r"^=== (END )?FILE: (.+?) ===[ \t]*$", re.MULTILINE)
+
+BATCH_INSTRUCTIONS = (
+    "This message contains the diffs of several files, each between a "
+    '"=== FILE: <name> ===" and an "=== END FILE: <name> ===" line. '
+    "Review every file separately and wrap each file's review in the same two "
+    "lines with the exact file name, in the order the files appear.\n\n"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token count of a text without loading a tokenizer
+
+    Args:
+        text (str): The text to measure
+
+    Returns:
+        int: Estimated number of tokens
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@dataclass
+class Chunk:
+    """A piece of one file's patch that fits the token budget.
+
+    Attributes:
+        filename (str): The file the patch belongs to
+        text (str): One or more whole hunks (or part of a single oversized hunk)
+        part (int): 1-based index of the chunk within the file
+        parts (int): Number of chunks the file's patch was split into
+    """
+
+    filename: str
+    text: str
+    part: int = 1
+    parts: int = 1
+
+    @property
+    def name(self) -> str:
+        """The name of the chunk used in the batch delimiters"""
+        if self.parts == 1:
+            return self.filename
+        return f"{self.filename} (part {self.part}/{self.parts})"
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+@dataclass
+class Batch:
+    """Chunks sent to the model in one request
+
+    Attributes:
+        chunks (list[Chunk]): The chunks in the order they are sent
+    """
+
+    chunks: list[Chunk] = field(default_factory=list)
+
+    @property
+    def tokens(self) -> int:
+        return sum(chunk.tokens for chunk in self.chunks)
+
+    def message(self) -> str:
+        """The user message of the request
+
+        A batch of one chunk is sent as the raw patch, larger ones are wrapped in
+        per-file delimiters the model is asked to repeat in its answer.
+        """
+        if len(self.chunks) == 1:
+            return self.chunks[0].text
+        body = "\n\n".join(
+            f"{FILE_START.format(name=chunk.name)}\n"
+            f"{chunk.text.rstrip()}\n"
+            f"{FILE_END.format(name=chunk.name)}"
+            for chunk in self.chunks
+        )
+        return BATCH_INSTRUCTIONS + body
+
+    def split_response(self, response: str) -> dict[str, Optional[str]]:
+        """Split the model's answer back out per chunk
+
+        Args:
+            response (str): The answer to message()
+
+        Returns:
+            dict[str, Optional[str]]: Review by chunk name, None for chunks the answer
+                has no section for
+        """
+        if len(self.chunks) == 1:
+            return {self.chunks[0].name: response}
+
+        names = {chunk.name for chunk in self.chunks}
+        reviews: dict[str, Optional[str]] = dict.fromkeys(
+            (chunk.name for chunk in self.chunks), None
+        )
+        current = None
+        start = 0
+        for match in FILE_MARKER.finditer(response):
+            is_end, name = match.group(1), match.group(2).strip()
+            if current is not None:
+                # a new start marker also closes a section the model forgot to end
+                reviews[current] = response[start : match.start()].strip()
+                current = None
+            if not is_end and name in names:
+                current = name
+                start = match.end()
+        if current is not None:
+            reviews[current] = response[start:].strip()
+        return reviews
+
+
+def _split_lines(text: str, budget: int) -> list[str]:
+    # Last resort for a single hunk over the budget, split between lines
+    pieces = []
+    current = ""
+    for line in text.splitlines(keepends=True):
+        if current and estimate_tokens(current + line) > budget:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_patch(patch: str, budget: int) -> list[str]:
+    """Split a patch on hunk boundaries into pieces of at most budget tokens
+
+    Consecutive hunks are packed together while they fit. A single hunk over the
+    budget is split between lines, with its header repeated on every piece.
+
+    Args:
+        patch (str): A unified diff of one file
+        budget (int): Max estimated tokens of a piece
+
+    Returns:
+        list[str]: The pieces in patch order
+    """
+    if estimate_tokens(patch) <= budget:
+        return [patch]
+
+    starts = [match.start() for match in HUNK_START.finditer(patch)]
+    if not starts or starts[0] != 0:
+        # anything before the first hunk (like a diff header) travels with it
+        starts = [0] + starts[1:] if starts else [0]
+    hunks = [patch[a:b] for a, b in zip(starts, starts[1:] + [len(patch)])]
+
+    pieces = []
+    current = ""
+    for hunk in hunks:
+        if estimate_tokens(hunk) > budget:
+            if current:
+                pieces.append(current)
+                current = ""
+            header, _, body = hunk.partition("\n")
+            header += "\n"
+            for part in _split_lines(body, budget - estimate_tokens(header)):
+                pieces.append(header + part)
+            continue
+        if current and estimate_tokens(current + hunk) > budget:
+            pieces.append(current)
+            current = ""
+        current += hunk
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def plan_batches(
+    patches: list[tuple[str, str]], budget: int, max_files: int
+) -> list[Batch]:
+    """Split oversized patches and pack small ones into as few requests as possible
+
+    Args:
+        patches (list[tuple[str, str]]): (filename, patch) of every file to review
+        budget (int): Max estimated tokens of the patches in one request
+        max_files (int): Max chunks packed into one request
+
+    Returns:
+        list[Batch]: The requests to send, each within the budget
+    """
+    chunks = []
+    for filename, patch in patches:
+        pieces = split_patch(patch, budget)
+        chunks += [
+            Chunk(filename, piece, part, len(pieces))
+            for part, piece in enumerate(pieces, start=1)
+        ]
+
+    # Delimiters and instructions take some of the budget once chunks are packed
+    overhead = estimate_tokens(BATCH_INSTRUCTIONS)
+
+    # First fit decreasing: big chunks first, each into the first batch it fits in
+    batches: list[Batch] = []
+    sizes: list[int] = []
+    for chunk in sorted(chunks, key=lambda chunk: chunk.tokens, reverse=True):
+        size = chunk.tokens + estimate_tokens(FILE_START + FILE_END + chunk.name * 2)
+        for i, batch in enumerate(batches):
+            if len(batch.chunks) < max_files and sizes[i] + size <= budget:
+                batch.chunks.append(chunk)
+                sizes[i] += size
+                break
+        else:
+            batches.append(Batch([chunk]))
+            sizes.append(overhead + size)
+
+    # Keep diff order inside every batch so answers read in file order
+    order = {id(chunk): i for i, chunk in enumerate(chunks)}
+    for batch in batches:
+        batch.chunks.sort(key=lambda chunk: order[id(chunk)])
+    batches.sort(key=lambda batch: order[id(batch.chunks[0])])
+    return batches
@@ -1,15 +1,51 @@
+import threading
+
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.graph import StateGraph, START, END
+from pythonbridge.core.metrics import timed
 from pythonbridge.llm.agents import State, ReviewAgent, ValidateAgent
+from pythonbridge.llm.agents.base import prompt_version
+from pythonbridge.llm.agents.reviewer import PROMPT_FILE
 
 
 class GraphBuilder:
     """A class that creates and compiles a LangGraph state graph"""
 
+    # Compiled graphs shared by the whole process, keyed by contexts and prompt version
+    _graphs: dict[tuple[str, str, int], CompiledStateGraph] = {}
+    _graphs_lock = threading.Lock()
+
     def __init__(self) -> None:
         # TODO: Implement memory checkpointing in https://docs.langchain.com/oss/python/langgraph/add-memory
         pass
 
+    def get_graph(
+        self, review_context: str = "", validate_context: str = ""
+    ) -> CompiledStateGraph:
+        """Returns the compiled graph for the contexts, building it only once per process
+
+        The graph is rebuilt when the reviewer prompt file changes on disk.
+
+        Returns:
+            CompiledStateGraph: Compiled LangGraph state graph
+        """
+        key = (review_context, validate_context, prompt_version(PROMPT_FILE))
+        with self._graphs_lock:
+            graph = self._graphs.get(key)
+            if graph is None:
+                # Drop graphs built from an older version of the prompt
+                for stale in [k for k in self._graphs if k[:2] == key[:2]]:
+                    del self._graphs[stale]
+                graph = self.build_graph(review_context, validate_context)
+                self._graphs[key] = graph
+            return graph
+
+    @classmethod
+    def clear(cls) -> None:
+        """Drop every memoized graph"""
+        with cls._graphs_lock:
+            cls._graphs.clear()
+
     def build_graph(
         self, review_context: str = "", validate_context: str = ""
     ) -> CompiledStateGraph:
@@ -27,8 +63,13 @@ class GraphBuilder:
         validate_agent = ValidateAgent(validate_context)
 
         # Add nodes (agents + tools)
-        workflow.add_node("review_agent", review_agent.review)
-        workflow.add_node("validate_agent", validate_agent.validate)
+        # every node run is timed as "agent.<node>"
+        workflow.add_node(
+            "review_agent", timed("agent.review_agent")(review_agent.review)
+        )
+        workflow.add_node(
+            "validate_agent", timed("agent.validate_agent")(validate_agent.validate)
+        )
 
         # TODO: Add conditional edge from validate to review/END after implementing validate logic
         # Add edges
@@ -1,3 +1,4 @@
 from pythonbridge.llm.groq.groq import GroqLLM
+from pythonbridge.llm.groq.cache import CompletionCache
 
-__all__ = ["GroqLLM"]
+__all__ = ["GroqLLM", "CompletionCache"]
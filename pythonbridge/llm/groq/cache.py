@@ -0,0 +1,222 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from pythonbridge.core import config
+
+
+def cache_key(model: str, system_prompt: str, message: str) -> str:
+    """Content address of a completion request
+
+    Args:
+        model (str): The model the request is sent to
+        system_prompt (str): The system prompt of the request
+        message (str): The user message of the request
+
+    Returns:
+        str: Hex digest of (model, system prompt hash, user message hash)
+    """
+    system_hash = hashlib.sha256(system_prompt.encode("utf8")).hexdigest()
+    message_hash = hashlib.sha256(message.encode("utf8")).hexdigest()
+    return hashlib.sha256(
+        f"{model}\0{system_hash}\0{message_hash}".encode("utf8")
+    ).hexdigest()
+
+
+class MemoryTier:
+    """In-memory LRU of completions with size and TTL eviction"""
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, value = entry
+            if time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, created: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (created or time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteTier:
+    """On-disk completion store that survives restarts, with size and TTL eviction"""
+
+    def __init__(self, path: str, max_entries: int, ttl: float) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[tuple[float, str]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created, value FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[0] > self.ttl:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE completions SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return row
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, created, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM completions WHERE created < ?", (now - self.ttl,)
+            )
+            # Least recently used rows go first once the table is over its size
+            self._conn.execute(
+                "DELETE FROM completions WHERE key NOT IN ("
+                "SELECT key FROM completions ORDER BY accessed DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+
+class CompletionCache:
+    """Content-addressed cache of LLM completions.
+
+    Lookups check the in-memory LRU first and then the optional SQLite tier,
+    promoting disk hits into memory.
+
+    Attributes:
+        memory (MemoryTier): The in-memory LRU tier
+        disk (Optional[SQLiteTier]): The on-disk tier (None when disabled)
+        hits (int): Lookups answered from either tier
+        misses (int): Lookups that have to go to the network
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 24 * 60 * 60,
+        path: Optional[str] = None,
+        disk_max_entries: int = 100_000,
+    ) -> None:
+        """
+        Args:
+            max_entries (int): Max completions kept in memory
+            ttl (float): Seconds a completion stays valid in both tiers
+            path (Optional[str]): SQLite file of the on-disk tier (None for memory only)
+            disk_max_entries (int): Max completions kept on disk
+        """
+        self.memory = MemoryTier(max_entries, ttl)
+        self.disk = SQLiteTier(path, disk_max_entries, ttl) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, model: str, system_prompt: str, message: str) -> Optional[str]:
+        """Look up a completion
+
+        Returns:
+            Optional[str]: The cached completion or None on a miss
+        """
+        key = cache_key(model, system_prompt, message)
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            row = self.disk.get(key)
+            if row is not None:
+                created, value = row
+                self.memory.set(key, value, created)
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, model: str, system_prompt: str, message: str, value: str) -> None:
+        """Store a completion in every tier"""
+        key = cache_key(model, system_prompt, message)
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def stats(self) -> dict:
+        """Counters for monitoring how well the cache works
+
+        Returns:
+            dict: "hits", "misses", "memory_size" and "disk_size"
+        """
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "memory_size": len(self.memory),
+            "disk_size": len(self.disk) if self.disk is not None else 0,
+        }
+
+
+_default_cache: Optional[CompletionCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[CompletionCache]:
+    """The process-wide completion cache configured from the environment
+
+    Returns:
+        Optional[CompletionCache]: The shared cache or None when LLM_CACHE_ENABLED is off
+    """
+    global _default_cache
+    if not config.LLM_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = CompletionCache(
+                max_entries=config.LLM_CACHE_MAX_ENTRIES,
+                ttl=config.LLM_CACHE_TTL,
+                path=config.LLM_CACHE_PATH,
+            )
+        return _default_cache
@@ -1,52 +1,165 @@
+import sys
+import threading
 from typing import Optional
 import groq
 from groq import Groq
-from pythonbridge.core import config
+from pythonbridge.core import config, metrics
+from pythonbridge.llm.chunking import estimate_tokens
+from pythonbridge.llm.groq.cache import CompletionCache, get_default_cache
+from pythonbridge.llm.groq.scheduler import RateLimitScheduler, get_scheduler
+from pythonbridge.llm.streaming import Sink, stream_sink
 
 
 DEFAULT_MODEL = "llama-3.3-70b-versatile"
 
+# One Groq client (and HTTP connection pool) per API key, shared by every GroqLLM
+_clients: dict[str, Groq] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: Optional[str]) -> Groq:
+    """Return the shared Groq client for an API key, creating it on first use
+
+    Args:
+        api_key (Optional[str]): The Groq API key
+
+    Returns:
+        Groq: A client whose keep-alive connections are reused across agents and graphs
+    """
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            # Retries are left to the shared scheduler, which sees every request
+            client = Groq(api_key=api_key, max_retries=0)
+            _clients[api_key] = client
+        return client
+
+
+def record_usage(usage) -> None:
+    """Add the token usage Groq reports for a completion to the LLM counters"""
+    for field in ("prompt_tokens", "completion_tokens"):
+        count = getattr(usage, field, None)
+        if isinstance(count, int):
+            metrics.increment(f"llm.{field}", count)
+
 
 # NOTE: No need to use AsyncGroq since a new, independent python process will be started by Elixir
 # GroqLLM ai initializes api key and takes any query in the review code function
 # Currently using the free plan for Groq
 class GroqLLM:
     def __init__(
-        self, curr_model: str = DEFAULT_MODEL, system_prompt: str = ""
+        self,
+        curr_model: str = DEFAULT_MODEL,
+        system_prompt: str = "",
+        cache: Optional[CompletionCache] = None,
+        scheduler: Optional[RateLimitScheduler] = None,
     ) -> None:
-        self.client = Groq(api_key=config.GROQ_API_KEY)
+        self.client = get_client(config.GROQ_API_KEY)
         self.curr_model = curr_model
         self.system_prompt = system_prompt
+        # Identical (model, prompt, message) requests are answered from the cache
+        self.cache = cache if cache is not None else get_default_cache()
+        # Every request of the process is queued and retried under Groq's rate limits
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
+
+    @metrics.timed("llm.request")
+    def _create(self, message: str):
+        # The raw response carries the x-ratelimit-* headers the scheduler tracks
+        response = self.client.chat.completions.with_raw_response.create(
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": message},
+            ],
+            model=self.curr_model,
+        )
+        completion = response.parse()
+        record_usage(completion.usage)
+        return completion.choices[0].message.content, response.headers
+
+    @metrics.timed("llm.request")
+    def _stream(self, message: str, sink: Sink):
+        # Same request with stream=True, every delta goes to the sink as it arrives
+        response = self.client.chat.completions.with_raw_response.create(
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": message},
+            ],
+            model=self.curr_model,
+            stream=True,
+        )
+        parts = []
+        for chunk in response.parse():
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                sink(delta)
+            # the last chunk carries the usage of the whole completion
+            x_groq = getattr(chunk, "x_groq", None)
+            record_usage(getattr(x_groq, "usage", None))
+        return "".join(parts), response.headers
+
+    def _request(self, message: str):
+        # Returns the callable the scheduler sends (and re-sends) the request with
+        sink = stream_sink()
+        if sink is None:
+            return lambda: self._create(message)
+
+        started = False
+
+        def stream():
+            nonlocal started
+            # a retried stream starts over, drop the text already streamed
+            if started:
+                sink(None)
+            started = True
+            return self._stream(message, sink)
+
+        return stream
 
     def invoke(self, message: str) -> Optional[str]:
         """Sends a message to Groq endpoint and returns the received message
 
+        Rate limited and failing requests are queued and retried by the scheduler,
+        None is only returned once its retries are used up. Inside a stream_to block
+        the streaming API is used and the text is also sent to the sink as it arrives.
+
         Args:
             message (str): The message to be sent to Groq
 
         Returns:
             Optional[str]: Returns the Groq response or None if an error is encountered
         """
+        if self.cache is not None:
+            cached = self.cache.get(self.curr_model, self.system_prompt, message)
+            if cached is not None:
+                metrics.increment("llm.cache_hits")
+                sink = stream_sink()
+                if sink is not None:
+                    sink(cached)
+                return cached
+
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": message},
-                ],
-                model=self.curr_model,
-            )
+            # queueing under the rate limits and retries included
+            with metrics.timer("llm.invoke"):
+                content = self.scheduler.run(
+                    self._request(message),
+                    tokens=estimate_tokens(self.system_prompt + message),
+                )
+
+            if self.cache is not None and content is not None:
+                self.cache.set(self.curr_model, self.system_prompt, message, content)
 
-            return chat_completion.choices[0].message.content
+            return content
 
         except groq.APIConnectionError as e:
-            print(f"The server could not be reached: {e}")
+            print(f"The server could not be reached: {e}", file=sys.stderr)
             return None
         except groq.RateLimitError as e:
-            print(f"The rate limit has been reached: {e}")
+            print(f"The rate limit has been reached: {e}", file=sys.stderr)
             return None
         except groq.APIStatusError as e:
-            print(f"API Error (status:{e.status_code}): {e}")
+            print(f"API Error (status:{e.status_code}): {e}", file=sys.stderr)
             return None
         except Exception as e:
-            print(f"Unexpected error: {e}")
+            print(f"Unexpected error: {e}", file=sys.stderr)
             return None
@@ -0,0 +1,276 @@
+import random
+import re
+import sys
+import threading
+import time
+from typing import Callable, Mapping, Optional, TypeVar
+
+import groq
+from pythonbridge.core import config, metrics
+
+T = TypeVar("T")
+
+# "2m59.56s", "7.66s", "120ms" or "1h2m" as sent in Groq's x-ratelimit-reset-* headers
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds of a Groq reset duration
+
+    Args:
+        value (Optional[str]): A header value like "2m59.56s" or a plain number of seconds
+
+    Returns:
+        Optional[float]: The duration in seconds, None when missing or unreadable
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    try:
+        return int(float(headers[name]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a request that failed with the error is worth sending again"""
+    if isinstance(error, groq.APIConnectionError):
+        return True
+    if isinstance(error, groq.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class RateLimitScheduler:
+    """Shares Groq's rate limits between every LLM call of the process.
+
+    Work is queued instead of failing: a request waits while the in-flight cap is
+    reached or the last seen x-ratelimit-remaining-* headers say the requests or
+    tokens of the current window are used up. 429s, 5xx and connection errors
+    are retried with full-jitter exponential backoff (at least Retry-After).
+
+    The in-flight cap adapts like TCP congestion control: it grows by one after
+    a run of successes and is halved on every 429.
+
+    Attributes:
+        max_concurrency (int): Upper bound of the in-flight cap
+        limit (int): Current in-flight cap
+        max_retries (int): Retries of one request before its error is raised
+        remaining_requests (Optional[int]): Requests left in the current window
+        remaining_tokens (Optional[int]): Tokens left in the current window
+        retries (int): Requests sent again so far
+        throttled (int): 429 responses seen so far
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """
+        Args:
+            max_concurrency (int): Upper bound of the in-flight cap
+            max_retries (int): Retries of one request before its error is raised
+            backoff_base (float): Seconds of the first backoff window
+            backoff_max (float): Max seconds of a backoff window
+            sleep (Callable[[float], None]): Sleeps out a retry's backoff (for tests)
+        """
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.remaining_requests: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self.retries = 0
+        self.throttled = 0
+        self._sleep = sleep
+        self._in_flight = 0
+        # estimated tokens of the requests in flight, not yet in the headers
+        self._reserved_tokens = 0
+        self._successes = 0
+        self._requests_reset_at = 0.0
+        self._tokens_reset_at = 0.0
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+
+    def run(
+        self, call: Callable[[], tuple[T, Mapping[str, str]]], tokens: int = 0
+    ) -> T:
+        """Send a request once the rate limits allow it, retrying transient failures
+
+        Args:
+            call (Callable[[], tuple[T, Mapping[str, str]]]): Sends the request and
+                returns its result along with the response headers
+            tokens (int): Estimated tokens of the request
+
+        Returns:
+            T: The result of the first successful call
+
+        Raises:
+            Exception: The last error once the retries are used up, or any error
+                that is not worth retrying
+        """
+        attempt = 0
+        while True:
+            self._acquire(tokens)
+            try:
+                result, headers = call()
+            except Exception as e:
+                self._release(tokens)
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                self._failed(e, attempt)
+                attempt += 1
+                continue
+
+            self._release(tokens, headers, success=True)
+            return result
+
+    def stats(self) -> dict:
+        """Counters for monitoring throughput under the rate limits
+
+        Returns:
+            dict: "limit", "in_flight", "remaining_requests", "remaining_tokens",
+                "retries" and "throttled"
+        """
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "remaining_requests": self.remaining_requests,
+                "remaining_tokens": self.remaining_tokens,
+                "retries": self.retries,
+                "throttled": self.throttled,
+            }
+
+    def _acquire(self, tokens: int) -> None:
+        with self._cond:
+            while True:
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    self._in_flight += 1
+                    self._reserved_tokens += tokens
+                    return
+                # a finishing request notifies, a window reset is waited out
+                self._cond.wait(timeout=None if wait == float("inf") else wait)
+
+    def _wait_time(self, tokens: int) -> float:
+        # Seconds until a request may go out (inf while waiting for a slot)
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._in_flight >= self.limit:
+            return float("inf")
+        if (
+            self.remaining_requests is not None
+            and self.remaining_requests <= self._in_flight
+            and now < self._requests_reset_at
+        ):
+            return self._requests_reset_at - now
+        if (
+            self.remaining_tokens is not None
+            and self.remaining_tokens - self._reserved_tokens < tokens
+            and now < self._tokens_reset_at
+        ):
+            return self._tokens_reset_at - now
+        return 0
+
+    def _release(
+        self,
+        tokens: int,
+        headers: Optional[Mapping[str, str]] = None,
+        success: bool = False,
+    ) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._reserved_tokens -= tokens
+            if headers is not None:
+                self._update(headers)
+            if success:
+                self._successes += 1
+                # additive increase, one more slot after every cap-worth of successes
+                if self._successes >= self.limit:
+                    self.limit = min(self.max_concurrency, self.limit + 1)
+                    self._successes = 0
+            self._cond.notify_all()
+
+    def _update(self, headers: Mapping[str, str]) -> None:
+        now = time.monotonic()
+        remaining = _header_int(headers, "x-ratelimit-remaining-requests")
+        if remaining is not None:
+            self.remaining_requests = remaining
+            reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            self._requests_reset_at = now + (reset or 0.0)
+        remaining = _header_int(headers, "x-ratelimit-remaining-tokens")
+        if remaining is not None:
+            self.remaining_tokens = remaining
+            reset = parse_duration(headers.get("x-ratelimit-reset-tokens"))
+            self._tokens_reset_at = now + (reset or 0.0)
+
+    def _failed(self, error: Exception, attempt: int) -> None:
+        # full jitter: a random delay in the exponentially growing window
+        window = min(self.backoff_max, self.backoff_base * 2**attempt)
+        delay = random.uniform(0, window)
+        response = getattr(error, "response", None)
+        headers = response.headers if response is not None else {}
+
+        metrics.increment("llm.retries")
+        with self._cond:
+            self.retries += 1
+            if headers:
+                self._update(headers)
+            if getattr(error, "status_code", None) == 429:
+                self.throttled += 1
+                metrics.increment("llm.throttled")
+                # multiplicative decrease of the in-flight cap
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+                retry_after = parse_duration(headers.get("retry-after"))
+                delay = max(delay, retry_after or 0.0)
+                # everyone waits out a throttle, not just the request that hit it
+                until = time.monotonic() + delay
+                self._blocked_until = max(self._blocked_until, until)
+            self._cond.notify_all()
+
+        # stdout is the bridge protocol, diagnostics go to stderr
+        print(
+            f"LLM request failed ({error}), retrying in {delay:.1f}s", file=sys.stderr
+        )
+        self._sleep(delay)
+
+
+_default_scheduler: Optional[RateLimitScheduler] = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RateLimitScheduler:
+    """The process-wide scheduler configured from the environment
+
+    Returns:
+        RateLimitScheduler: The scheduler shared by every GroqLLM
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = RateLimitScheduler(
+                max_concurrency=config.LLM_MAX_CONCURRENCY,
+                max_retries=config.LLM_MAX_RETRIES,
+                backoff_base=config.LLM_BACKOFF_BASE,
+                backoff_max=config.LLM_BACKOFF_MAX,
+            )
+        return _default_scheduler
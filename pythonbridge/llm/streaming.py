@@ -0,0 +1,90 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+from pythonbridge.core import config
+
+# Receives each piece of streamed completion text, None means "discard what was sent,
+# the completion starts over" (a retried request)
+Sink = Callable[[Optional[str]], None]
+
+_sink: ContextVar[Optional[Sink]] = ContextVar("llm_stream_sink", default=None)
+
+
+@contextmanager
+def stream_to(sink: Sink) -> Iterator[None]:
+    """Stream the completions of every LLM call in the block into sink.
+
+    The sink is found through a context variable, so it reaches GroqLLM through
+    the LangGraph graph without changing any node.
+
+    Example:
+        with stream_to(print):
+            graph.invoke({"pr_input": patch})
+    """
+    token = _sink.set(sink)
+    try:
+        yield
+    finally:
+        _sink.reset(token)
+
+
+def stream_sink() -> Optional[Sink]:
+    """The sink of the enclosing stream_to block, None when not streaming"""
+    return _sink.get()
+
+
+class CoalescingSink:
+    """Groups streamed text into fewer, larger events.
+
+    A token-sized delta per bridge frame would flood the pipe, so text is
+    emitted once min_chars are buffered or interval seconds have passed.
+
+    Attributes:
+        emit (Callable[[dict], None]): Receives {"delta": text} or {"reset": True}
+        min_chars (int): Buffered characters that trigger an event
+        interval (float): Max seconds text stays buffered
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[dict], None],
+        min_chars: int = config.STREAM_FLUSH_CHARS,
+        interval: float = config.STREAM_FLUSH_INTERVAL,
+    ) -> None:
+        self.emit = emit
+        self.min_chars = min_chars
+        self.interval = interval
+        self._parts: list[str] = []
+        self._size = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __call__(self, text: Optional[str]) -> None:
+        with self._lock:
+            if text is None:
+                self._parts = []
+                self._size = 0
+                self.emit({"reset": True})
+                return
+            self._parts.append(text)
+            self._size += len(text)
+            if (
+                self._size >= self.min_chars
+                or time.monotonic() - self._last >= self.interval
+            ):
+                self._flush()
+
+    def flush(self) -> None:
+        """Emit whatever text is still buffered"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._parts:
+            self.emit({"delta": "".join(self._parts)})
+        self._parts = []
+        self._size = 0
+        self._last = time.monotonic()
@@ -5,20 +5,36 @@ This receives all the messages from Elixir.
 It's going to import all the other Python modules (LangChain, ChromaDB, etc)
 When we're going for scaling we are going to use elixir workers
 All send request to the same bridge but the main.py routes the right function based on the type field.
-No multiple Python processes.
+Requests run concurrently (see core.dispatcher) so a slow review does not block the
+messages queued behind it. With BRIDGE_WORKERS set, this process only reads and writes
+the protocol and the requests run in that many worker processes (see core.workers).
+A "metrics" message returns the stage timings and counters of core.metrics.
+
+Only the dispatcher is imported at startup. langgraph, groq and PyGithub take over a
+second to import, so the modules of a message type are loaded by its first message
+(or ahead of time by a "warmup" message) and a restarted bridge answers "hello" right away.
 """
 
+import importlib
 import sys
-import json
+import time
+from dataclasses import dataclass
 from typing import Optional, Any
 
-from pydantic import BaseModel
+from pythonbridge.core import config
+from pythonbridge.core.dispatcher import current_emitter, serve
+from pythonbridge.core.metrics import get_metrics
+from pythonbridge.core.workers import supervise
 
-from pythonbridge.core.review import review_pr
-from pythonbridge.gh.client import post_comment
+# Heavy modules behind each message type, imported on first use
+HANDLER_MODULES = {
+    "comment": ["pythonbridge.gh.client"],
+    "main": ["pythonbridge.core.review"],
+}
 
 
-class BridgeResponse(BaseModel):
+@dataclass
+class BridgeResponse:
     """
     Represents the responses that is generated by Python processes and sent back to Elixir
     """
@@ -28,6 +44,41 @@ class BridgeResponse(BaseModel):
     error: Optional[str] = None
 
 
+def review_pr(payload: dict, emit=None) -> list[dict]:
+    """core.review.review_pr, imported on the first review"""
+    from pythonbridge.core.review import review_pr
+
+    return review_pr(payload, emit=emit)
+
+
+def post_comment(payload: dict, body: str) -> None:
+    """gh.client.post_comment, imported on the first comment"""
+    from pythonbridge.gh.client import post_comment
+
+    post_comment(payload, body)
+
+
+def warmup(types: Optional[list[str]] = None) -> dict:
+    """Import the modules of the given message types ahead of their first message
+
+    Messages of these types arriving meanwhile wait for the import to finish
+    instead of starting it a second time.
+
+    Args:
+        types (Optional[list[str]]): Message types to prepare, all of them by default
+
+    Returns:
+        dict: The "modules" imported and the "seconds" it took
+    """
+    start = time.perf_counter()
+    modules = []
+    for type in types or HANDLER_MODULES:
+        for module in HANDLER_MODULES.get(type, []):
+            importlib.import_module(module)
+            modules.append(module)
+    return {"modules": modules, "seconds": round(time.perf_counter() - start, 3)}
+
+
 def handle_msg(msg: dict) -> BridgeResponse:
     """Route messages based on type field.
 
@@ -45,6 +96,20 @@ def handle_msg(msg: dict) -> BridgeResponse:
         count = msg.get("count", 0)
         return BridgeResponse(status="ok", response=f"hello from python {count}")
 
+    elif type == "warmup":
+        # Sent by Elixir right after spawning the bridge, runs on the default pool
+        # so "hello" keeps being answered while the imports run
+        try:
+            return BridgeResponse(status="ok", response=warmup(msg.get("types")))
+        except Exception as e:
+            return BridgeResponse(status="error", error=str(e))
+
+    elif type == "metrics":
+        # Stage timings and counters of this process, "reset": true starts them over
+        # (with BRIDGE_WORKERS the front process adds up every worker's, see core.workers)
+        snapshot = get_metrics().snapshot(reset=bool(msg.get("reset")))
+        return BridgeResponse(status="ok", response=snapshot)
+
     elif type == "comment":
         payload = msg.get("payload")
         body = msg.get("body")
@@ -62,7 +127,8 @@ def handle_msg(msg: dict) -> BridgeResponse:
         if not payload:
             return BridgeResponse(status="error", error="Missing payload")
         try:
-            reviews = review_pr(payload)
+            # partial frames with the review text are sent when the message asks to stream
+            reviews = review_pr(payload, emit=current_emitter())
             return BridgeResponse(status="ok", response=reviews)
         except Exception as e:
             return BridgeResponse(status="error", error=str(e))
@@ -71,15 +137,43 @@ def handle_msg(msg: dict) -> BridgeResponse:
         return BridgeResponse(status="error", error=f"Unknown message type: {type}")
 
 
+def respond(msg: dict) -> dict:
+    """Handle a message and tag the response with its correlation ID.
+
+    Args:
+        msg (dict): Message received from Elixir
+
+    Returns:
+        dict: The JSON serializable response sent back to Elixir
+    """
+    response = handle_msg(msg)
+    return {
+        "status": response.status,
+        "response": response.response,
+        "error": response.error,
+        "_id": msg.get("_id"),
+    }
+
+
 # Do not run this file directly, it's only used by Elixir (with the `python -m` module running process)
 if __name__ == "__main__":
     try:
-        for line in sys.stdin:
-            msg = json.loads(line)
-            response = handle_msg(msg).model_dump()
-            response["_id"] = msg.get("_id")
-            print(json.dumps(response))
-            sys.stdout.flush()
+        if config.BRIDGE_WORKERS > 0:
+            supervise(
+                "pythonbridge.main:respond",
+                config.BRIDGE_WORKERS,
+                config.BRIDGE_CONCURRENCY,
+                config.BRIDGE_CONCURRENCY_DEFAULT,
+                framing=config.BRIDGE_FRAMING,
+                preload=[m for modules in HANDLER_MODULES.values() for m in modules],
+            )
+        else:
+            serve(
+                respond,
+                config.BRIDGE_CONCURRENCY,
+                config.BRIDGE_CONCURRENCY_DEFAULT,
+                framing=config.BRIDGE_FRAMING,
+            )
     except BrokenPipeError:
         # Elixir closed the connection, exit cleanly
         sys.exit(0)
@@ -0,0 +1,81 @@
+import io
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from pythonbridge.benchmarks import suite
+
+
+class TestCompare(unittest.TestCase):
+    def test_statuses(self):
+        """Test that medians beyond the threshold either way are reported"""
+        baseline = {
+            "slower": {"median": 1.0},
+            "faster": {"median": 1.0},
+            "same": {"median": 1.0},
+            "gone": {"median": 1.0},
+        }
+        results = {
+            "slower": {"median": 1.5},
+            "faster": {"median": 0.5},
+            "same": {"median": 1.1},
+            "added": {"median": 1.0},
+        }
+        rows = suite.compare(results, baseline, threshold=1.25)
+
+        self.assertEqual(
+            {row["name"]: row["status"] for row in rows},
+            {
+                "slower": "regression",
+                "faster": "faster",
+                "same": "same",
+                "added": "new",
+                "gone": "missing",
+            },
+        )
+        self.assertEqual(rows[0]["ratio"], 1.5)
+
+
+class TestSuite(unittest.TestCase):
+    def test_review_pr_runs_against_the_fakes(self):
+        """Test that the end to end benchmark reviews every file through the fakes"""
+        options = suite.parse_args(["--llm-latency", "0", "--github-latency", "0"])
+        with redirect_stderr(io.StringIO()), suite.review(options) as review_pr:
+            reviews = review_pr()
+
+        self.assertEqual(len(reviews), suite.DEFAULT_REVIEW_FILES)
+        self.assertTrue(all(r["review"] == "Looks good." for r in reviews))
+        self.assertTrue(all(r["error"] is None for r in reviews))
+
+    def test_results_and_baseline(self):
+        """Test that results are written as JSON and a slower run fails the comparison"""
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "results.json"
+            args = ["-k", "respond", "--rounds", "2", "--output", str(output)]
+            with redirect_stdout(io.StringIO()):
+                self.assertEqual(suite.main(args), 0)
+            results = json.loads(output.read_text())
+            self.assertEqual(
+                set(results["benchmarks"]["bridge.respond[hello]"]),
+                {"min", "median", "mean", "stddev", "rounds", "operations"},
+            )
+
+            # a baseline ten times faster than anything measurable
+            for stats in results["benchmarks"].values():
+                stats["median"] /= 10
+            baseline = Path(tmp) / "baseline.json"
+            baseline.write_text(json.dumps(results))
+            with redirect_stdout(io.StringIO()) as out:
+                status = suite.main(args + ["--baseline", str(baseline)])
+            self.assertEqual(status, 1)
+            self.assertIn("regression", out.getvalue())
+
+            with redirect_stdout(io.StringIO()):
+                missing = str(Path(tmp) / "missing.json")
+                self.assertEqual(suite.main(args + ["--baseline", missing]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
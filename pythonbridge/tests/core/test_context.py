@@ -0,0 +1,194 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from pythonbridge.ast.code_graph import CodeGraph
+from pythonbridge.ast.indexer import index_file
+from pythonbridge.core.context import (
+    CONTEXT_HEADER,
+    RepositoryGraph,
+    batch_context,
+    changed_lines,
+    enclosing,
+    file_context,
+    get_code_graph,
+)
+from pythonbridge.llm.chunking import estimate_tokens
+
+TESTS_DIR = Path(__file__).parent.parent
+RELATIONSHIPS_JSON = TESTS_DIR / "test_files" / "relationships.json"
+
+# Changes the body of Helper.run (lines 52-53 of relationships.py)
+RUN_PATCH = """@@ -51,3 +51,4 @@ class Helper(Config):
+     async def run(self, value):
+-        system.exit(validate(value))
++        checked = validate(value)
++        system.exit(checked)
+"""
+
+# Changes the body of load (lines 7-11)
+LOAD_PATCH = """@@ -9,2 +9,2 @@ def load(path=Path("."), reader=open):
+
+-    data = json.loads(reader(path).read())
++    data = json.loads(reader(path).read() or "{}")
+"""
+
+
+class TestChangedLines(unittest.TestCase):
+    def test_ranges_on_the_base_file(self):
+        """Test that removed lines and insertion points are merged into base ranges"""
+        patch_text = (
+            "@@ -3,4 +3,5 @@\n a\n-b\n-c\n+B\n d\n+e\n f\n@@ -20,0 +21,1 @@\n+added\n"
+        )
+        self.assertEqual(changed_lines(patch_text), [(3, 5), (19, 19)])
+
+    def test_enclosing_is_innermost_first(self):
+        """Test that a change inside a method lists the method before its class"""
+        graph = CodeGraph()
+        graph.add_file("relationships.py", json.loads(RELATIONSHIPS_JSON.read_text()))
+        found = enclosing(
+            graph.file_definitions("relationships.py"), changed_lines(RUN_PATCH)
+        )
+
+        self.assertEqual([d.name for d in found], ["Helper.run", "Helper"])
+
+
+class TestFileContext(unittest.TestCase):
+    def setUp(self):
+        self.graph = CodeGraph()
+        self.graph.add_file(
+            "relationships.py", json.loads(RELATIONSHIPS_JSON.read_text())
+        )
+
+    def test_changed_definitions_callees_and_callers(self):
+        """Test that the context lists the changed function and the code around it"""
+        self.graph.add_file(
+            "cli.py",
+            {
+                "function_def": [
+                    {
+                        "caller": "cli.py",
+                        "callee": "main",
+                        "location": [[0, 4], [0, 8]],
+                        "lines": [0, 1],
+                        "signature": "def main()",
+                    }
+                ],
+                "call": [
+                    {"caller": "main", "callee": "load", "location": [[1, 4], [1, 10]]}
+                ],
+            },
+        )
+        lines = file_context(self.graph, "relationships.py", LOAD_PATCH)
+
+        self.assertEqual(
+            lines,
+            [
+                "### relationships.py",
+                "Changed:",
+                '- def load(path=Path("."), reader=open)  (relationships.py:7)',
+                "Calls:",
+                "- class Config  (relationships.py:33)",
+                "Called by:",
+                "- def main()  (cli.py:1)",
+            ],
+        )
+
+    def test_unknown_file_has_no_context(self):
+        """Test that files the graph does not know get no context"""
+        self.assertEqual(file_context(self.graph, "new.py", LOAD_PATCH), [])
+
+    def test_batch_context_shares_the_budget(self):
+        """Test that every file of a request gets its share of a strict budget"""
+        contexts = {
+            "a.py": ["### a.py"] + [f"- def a{i}()  (a.py:{i})" for i in range(100)],
+            "b.py": ["### b.py"] + [f"- def b{i}()  (b.py:{i})" for i in range(100)],
+        }
+        context = batch_context(contexts, ["a.py", "b.py", "c.py"], 200)
+
+        self.assertTrue(context.startswith(CONTEXT_HEADER))
+        self.assertLessEqual(estimate_tokens(context), 200)
+        self.assertIn("### a.py", context)
+        self.assertIn("### b.py", context)
+        self.assertEqual(batch_context(contexts, ["c.py"], 200), "")
+
+
+class TestGetCodeGraph(unittest.TestCase):
+    def test_indexes_and_refreshes_the_checkout(self):
+        """Test that the checkout is indexed once and changed files are picked up"""
+        with tempfile.TemporaryDirectory() as tmp:
+            checkout = Path(tmp) / "owner" / "repo"
+            checkout.mkdir(parents=True)
+            source = checkout / "app.py"
+            source.write_text("def run():\n    step()\n")
+            payload = {"repository": {"full_name": "owner/repo"}}
+
+            with (
+                patch("pythonbridge.core.config.CODE_INDEX_DIR", tmp),
+                patch("pythonbridge.core.config.INDEX_WORKERS", 1),
+                patch("pythonbridge.core.config.CODE_INDEX_REFRESH_SECONDS", 0),
+                patch.dict("pythonbridge.core.context._graphs", clear=True),
+            ):
+                graph = get_code_graph(payload)
+                self.assertEqual(graph.callees("run"), ["step"])
+
+                source.write_text("def run():\n    other()\n")
+                # a different size is enough for the manifest to see the change
+                self.assertIs(get_code_graph(payload), graph)
+                self.assertEqual(graph.callees("run"), ["other"])
+
+                missing = {"repository": {"full_name": "owner/missing"}}
+                self.assertIsNone(get_code_graph(missing))
+
+    def test_restart_loads_the_saved_index(self):
+        """Test that a new graph of a saved checkout parses only the changed files"""
+        with tempfile.TemporaryDirectory() as tmp:
+            checkout = Path(tmp) / "repo"
+            checkout.mkdir()
+            (checkout / "app.py").write_text("def run():\n    step()\n")
+            (checkout / "lib.py").write_text("def step():\n    pass\n")
+            store_path = str(Path(tmp) / "index" / "repo.idx")
+
+            with patch("pythonbridge.core.config.INDEX_WORKERS", 1):
+                RepositoryGraph(str(checkout), store_path).refresh()
+
+                (checkout / "lib.py").write_text("def step():\n    done()\n")
+                with patch(
+                    "pythonbridge.ast.indexer.index_file", wraps=index_file
+                ) as parsed:
+                    graph = RepositoryGraph(str(checkout), store_path).refresh()
+
+            self.assertEqual([c.args[1] for c in parsed.call_args_list], ["lib.py"])
+            self.assertEqual(graph.callees("run"), ["step"])
+            self.assertEqual(graph.callees("step"), ["done"])
+
+    def test_recent_graph_is_not_walked_again(self):
+        """Test that a refresh within the interval or during another one does not walk the checkout"""
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / "app.py").write_text("def run():\n    step()\n")
+            repository = RepositoryGraph(tmp)
+
+            with patch("pythonbridge.core.config.INDEX_WORKERS", 1):
+                graph = repository.refresh()
+            with patch.object(repository.indexer, "index") as index:
+                self.assertIs(repository.refresh(), graph)
+
+                with patch("pythonbridge.core.config.CODE_INDEX_REFRESH_SECONDS", 0):
+                    # another review is refreshing, this one does not wait for it
+                    with repository._lock:
+                        self.assertIs(repository.refresh(), graph)
+                    index.assert_not_called()
+
+                    repository.refresh()
+                    index.assert_called_once()
+
+    def test_disabled_without_index_dir(self):
+        """Test that no graph is built when CODE_INDEX_DIR is unset"""
+        with patch("pythonbridge.core.config.CODE_INDEX_DIR", None):
+            self.assertIsNone(get_code_graph({}))
+
+
+if __name__ == "__main__":
+    unittest.main()
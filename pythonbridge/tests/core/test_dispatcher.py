@@ -0,0 +1,212 @@
+import io
+import json
+import threading
+import unittest
+from unittest.mock import patch
+
+from pythonbridge.core.dispatcher import (
+    Dispatcher,
+    ResponseWriter,
+    current_emitter,
+    serve,
+)
+from pythonbridge.core.framing import PacketFraming
+
+
+def read_lines(stream: io.BytesIO) -> list[dict]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+class TestDispatcher(unittest.TestCase):
+    def test_slow_request_does_not_block_fast_one(self):
+        """Test that a fast message is answered while a slow one is still running"""
+        release = threading.Event()
+        fast_done = threading.Event()
+
+        def respond(msg):
+            if msg["type"] == "main":
+                release.wait(timeout=5)
+            else:
+                fast_done.set()
+            return {"status": "ok", "_id": msg["_id"]}
+
+        out = io.BytesIO()
+        dispatcher = Dispatcher(respond, ResponseWriter(out), {"main": 1, "hello": 1})
+        dispatcher.submit({"type": "main", "_id": 1})
+        dispatcher.submit({"type": "hello", "_id": 2})
+
+        self.assertTrue(fast_done.wait(timeout=5))
+        release.set()
+        dispatcher.shutdown()
+
+        self.assertEqual([r["_id"] for r in read_lines(out)], [2, 1])
+
+    def test_concurrency_limit_per_type(self):
+        """Test that no more than the configured number of requests run at once"""
+        lock = threading.Lock()
+        running = 0
+        peak = 0
+
+        def respond(msg):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            threading.Event().wait(0.02)
+            with lock:
+                running -= 1
+            return {"status": "ok", "_id": msg["_id"]}
+
+        out = io.BytesIO()
+        dispatcher = Dispatcher(respond, ResponseWriter(out), {"main": 2})
+        for i in range(8):
+            dispatcher.submit({"type": "main", "_id": i})
+        dispatcher.shutdown()
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(sorted(r["_id"] for r in read_lines(out)), list(range(8)))
+
+    def test_handler_exception_becomes_error_response(self):
+        """Test that an unexpected exception is reported instead of killing the loop"""
+
+        def respond(msg):
+            raise ValueError("boom")
+
+        out = io.BytesIO()
+        dispatcher = Dispatcher(respond, ResponseWriter(out), {})
+        dispatcher.submit({"type": "anything", "_id": 7})
+        dispatcher.shutdown()
+
+        self.assertEqual(
+            read_lines(out),
+            [{"status": "error", "response": None, "error": "boom", "_id": 7}],
+        )
+
+    @patch("pythonbridge.core.dispatcher.metrics")
+    def test_latency_recorded_per_type(self, mock_metrics):
+        """Test that every message is timed by type and errors are counted"""
+
+        def respond(msg):
+            if msg["type"] == "main":
+                raise ValueError("boom")
+            return {"status": "ok", "response": None, "error": None, "_id": msg["_id"]}
+
+        dispatcher = Dispatcher(respond, ResponseWriter(io.BytesIO()), {})
+        dispatcher.submit({"type": "hello", "_id": 1})
+        dispatcher.submit({"type": "main", "_id": 2})
+        dispatcher.shutdown()
+
+        timed = [call.args[0] for call in mock_metrics.observe.call_args_list]
+        self.assertEqual(timed, ["bridge.message.hello", "bridge.message.main"])
+        mock_metrics.increment.assert_called_once_with("bridge.errors.main")
+
+    @patch("pythonbridge.core.dispatcher.metrics")
+    def test_failing_metrics_do_not_lose_the_response(self, mock_metrics):
+        """Test that the response is sent even if recording its latency fails"""
+        mock_metrics.observe.side_effect = OSError("disk full")
+        out = io.BytesIO()
+
+        dispatcher = Dispatcher(
+            lambda msg: {"status": "ok", "response": 1, "error": None, "_id": 3},
+            ResponseWriter(out),
+            {},
+        )
+        dispatcher.submit({"type": "hello", "_id": 3})
+        dispatcher.shutdown()
+
+        self.assertEqual(read_lines(out)[0]["response"], 1)
+
+    def test_unserializable_response_becomes_error_response(self):
+        """Test that a response JSON cannot represent is reported, not dropped"""
+        out = io.BytesIO()
+        dispatcher = Dispatcher(
+            lambda msg: {"status": "ok", "response": object(), "_id": msg["_id"]},
+            ResponseWriter(out),
+            {},
+        )
+        dispatcher.submit({"type": "anything", "_id": 3})
+        dispatcher.shutdown()
+
+        [response] = read_lines(out)
+        self.assertEqual(response["status"], "error")
+        self.assertEqual(response["_id"], 3)
+
+    def test_streaming_request_sends_partials_before_final(self):
+        """Test that partial frames of a streaming request precede its response"""
+
+        def respond(msg):
+            emit = current_emitter()
+            if emit is not None:
+                emit("first")
+                emit("second")
+            return {"status": "ok", "_id": msg["_id"]}
+
+        out = io.BytesIO()
+        dispatcher = Dispatcher(respond, ResponseWriter(out), {})
+        dispatcher.submit({"type": "main", "_id": 1, "stream": True})
+        dispatcher.shutdown()
+        dispatcher = Dispatcher(respond, ResponseWriter(out), {})
+        dispatcher.submit({"type": "main", "_id": 2})
+        dispatcher.shutdown()
+
+        self.assertEqual(
+            read_lines(out),
+            [
+                {"status": "partial", "response": "first", "error": None, "_id": 1},
+                {"status": "partial", "response": "second", "error": None, "_id": 1},
+                {"status": "ok", "_id": 1},
+                {"status": "ok", "_id": 2},
+            ],
+        )
+
+
+class TestServe(unittest.TestCase):
+    def test_serve_answers_every_line(self):
+        """Test that serve writes exactly one JSON line per message"""
+        stdin = io.BytesIO(
+            b'{"type": "hello", "_id": 1}\n\n{"type": "hello", "_id": 2}\nnot json\n'
+        )
+        out = io.BytesIO()
+
+        serve(
+            lambda msg: {"status": "ok", "_id": msg["_id"]},
+            {"hello": 2},
+            stdin=stdin,
+            stdout=out,
+        )
+
+        responses = read_lines(out)
+        self.assertEqual(len(responses), 3)
+        self.assertEqual(
+            sorted(r["_id"] for r in responses if r["status"] == "ok"), [1, 2]
+        )
+        errors = [r for r in responses if r["status"] == "error"]
+        self.assertEqual(len(errors), 1)
+        self.assertIn("Invalid JSON", errors[0]["error"])
+
+    def test_serve_packet_framing(self):
+        """Test that length prefixed frames are answered with length prefixed frames"""
+        framing = PacketFraming()
+        stdin = io.BytesIO(
+            b"".join(
+                framing.frame(json.dumps({"type": "hello", "_id": i}).encode())
+                for i in range(3)
+            )
+        )
+        out = io.BytesIO()
+
+        serve(
+            lambda msg: {"status": "ok", "_id": msg["_id"]},
+            {"hello": 1},
+            stdin=stdin,
+            stdout=out,
+            framing="packet",
+        )
+
+        out.seek(0)
+        responses = [json.loads(frame) for frame in framing.read(out)]
+        self.assertEqual([r["_id"] for r in responses], [0, 1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+from types import SimpleNamespace
+
+from pythonbridge.core.filters import (
+    FilterRules,
+    filter_files,
+    is_generated,
+    matches,
+    skip_reason,
+)
+from pythonbridge.llm.chunking import estimate_tokens
+
+PATCH = "@@ -10,2 +10,2 @@\n-old\n+new\n"
+
+
+class TestMatches(unittest.TestCase):
+    def test_name_and_directory_patterns(self):
+        """Test that plain globs match the file name and dir globs match at any depth"""
+        self.assertTrue(matches("mix.lock", "*.lock"))
+        self.assertTrue(matches("pythonbridge/uv.lock", "*.lock"))
+        self.assertTrue(matches("vendor/a/b.py", "vendor/*"))
+        self.assertTrue(matches("web/node_modules/x/index.js", "node_modules/*"))
+        self.assertFalse(matches("lib/vendored.py", "vendor/*"))
+        self.assertFalse(matches("lock.py", "*.lock"))
+
+
+class TestIsGenerated(unittest.TestCase):
+    def test_marker_at_top_of_new_file(self):
+        """Test that a generated header is found in an added file"""
+        patch = "@@ -0,0 +1,3 @@\n+# Code generated by protoc. DO NOT EDIT.\n+x = 1\n+y = 2\n"
+        self.assertTrue(is_generated(patch))
+
+    def test_marker_further_down_is_ignored(self):
+        """Test that a hunk in the middle of a file is not taken for a header"""
+        patch = "@@ -40,2 +40,2 @@\n-# do not edit this by hand\n+# do not edit\n"
+        self.assertFalse(is_generated(patch))
+        self.assertFalse(is_generated(PATCH))
+
+    def test_marker_kept_as_context_is_ignored(self):
+        """Test that a modified file is reviewed even if its header says generated"""
+        patch = (
+            "@@ -1,4 +1,4 @@\n # Code generated by protoc. DO NOT EDIT.\n"
+            " import os\n-x = 1\n+x = 2\n"
+        )
+        self.assertFalse(is_generated(patch))
+
+
+class TestSkipReason(unittest.TestCase):
+    def setUp(self):
+        self.rules = FilterRules(max_patch_tokens=100, max_line_length=80)
+
+    def test_reviewable_file(self):
+        """Test that an ordinary source change is kept"""
+        self.assertIsNone(skip_reason("app/main.py", "modified", PATCH, self.rules))
+
+    def test_reasons(self):
+        """Test every kind of unreviewable file"""
+        cases = {
+            ("old.py", "removed", None): "deleted",
+            ("new.py", "renamed", None): "renamed without changes",
+            ("logo.png", "added", None): "no textual diff",
+            ("assets/app.min.js", "modified", PATCH): "matches *.min.js",
+            ("api_pb2.py", "added", PATCH): "matches *_pb2.py",
+            ("data.json", "added", "@@ -0,0 +1 @@\n+" + "x" * 200): (
+                "minified or data file (line of 201 characters)"
+            ),
+        }
+        for (filename, status, patch), reason in cases.items():
+            with self.subTest(filename=filename):
+                self.assertEqual(
+                    skip_reason(filename, status, patch, self.rules), reason
+                )
+
+    def test_huge_patch(self):
+        """Test that a patch over the token threshold is skipped"""
+        patch = "@@ -1,400 +1,400 @@\n" + "+line\n" * 400
+
+        reason = skip_reason("big.py", "modified", patch, self.rules)
+
+        self.assertEqual(reason, f"patch too large (~{estimate_tokens(patch)} tokens)")
+
+    def test_extra_globs(self):
+        """Test that configured globs are applied on top of the defaults"""
+        rules = FilterRules(skip_globs=("docs/*",))
+        self.assertEqual(
+            skip_reason("docs/index.md", "modified", PATCH, rules), "matches docs/*"
+        )
+
+
+class TestFilterFiles(unittest.TestCase):
+    def test_report(self):
+        """Test that kept files stay in order and savings are counted"""
+        files = [
+            SimpleNamespace(filename="a.py", status="modified", patch=PATCH),
+            SimpleNamespace(filename="mix.lock", status="modified", patch=PATCH),
+            SimpleNamespace(filename="b.py", status="removed", patch=None),
+            SimpleNamespace(filename="c.py", status="added", patch=PATCH),
+        ]
+
+        report = filter_files(files, FilterRules())
+
+        self.assertEqual([f.filename for f in report.kept], ["a.py", "c.py"])
+        self.assertEqual(
+            report.skipped, {"mix.lock": "matches *.lock", "b.py": "deleted"}
+        )
+        self.assertEqual(report.saved_tokens, estimate_tokens(PATCH))
+
+
+if __name__ == "__main__":
+    unittest.main()
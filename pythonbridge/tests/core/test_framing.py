@@ -0,0 +1,86 @@
+import io
+import json
+import unittest
+
+from pythonbridge.core.framing import (
+    LineFraming,
+    PacketFraming,
+    decode,
+    encode,
+    get_framing,
+)
+
+
+class TestCodec(unittest.TestCase):
+    def test_round_trip(self):
+        """Test that messages survive encoding, including non-ASCII and newlines"""
+        msg = {"_id": 1, "review": "naïve\nfix", "files": ["a.py"], "stream": True}
+
+        payload = encode(msg)
+
+        self.assertNotIn(b"\n", payload)
+        self.assertEqual(decode(payload), msg)
+        self.assertEqual(json.loads(payload), msg)
+
+    def test_invalid_json_raises_json_error(self):
+        """Test that bad input raises the stdlib JSONDecodeError whatever the codec"""
+        with self.assertRaises(json.JSONDecodeError):
+            decode(b"not json")
+
+
+class TestLineFraming(unittest.TestCase):
+    def test_read_skips_blank_lines(self):
+        """Test that every non-empty line is one frame"""
+        stream = io.BytesIO(b'{"a": 1}\n\n  \n{"b": 2}\r\n{"c": 3}')
+
+        frames = list(LineFraming().read(stream))
+
+        self.assertEqual(frames, [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}'])
+
+
+class TestPacketFraming(unittest.TestCase):
+    def test_round_trip(self):
+        """Test that frames are read back as written, empty and large ones included"""
+        framing = PacketFraming()
+        payloads = [b"{}", b"", b"x" * 100_000]
+        stream = io.BytesIO(b"".join(framing.frame(p) for p in payloads))
+
+        self.assertEqual(framing.frame(b"{}"), b"\x00\x00\x00\x02{}")
+        self.assertEqual(list(framing.read(stream)), payloads)
+
+    def test_short_reads_are_completed(self):
+        """Test that a pipe returning a frame in pieces still yields it whole"""
+
+        class Trickle:
+            def __init__(self, data):
+                self.data = data
+
+            def read(self, size=-1):
+                size = min(size, 3)
+                chunk, self.data = self.data[:size], self.data[size:]
+                return chunk
+
+        framing = PacketFraming()
+
+        frames = list(framing.read(Trickle(framing.frame(b'{"_id": 12}'))))
+
+        self.assertEqual(frames, [b'{"_id": 12}'])
+
+    def test_truncated_frame_raises(self):
+        """Test that a stream ending inside a frame is an error, not a silent EOF"""
+        stream = io.BytesIO(PacketFraming().frame(b"0123456789")[:-3])
+
+        with self.assertRaises(EOFError):
+            list(PacketFraming().read(stream))
+
+
+class TestGetFraming(unittest.TestCase):
+    def test_unknown_framing(self):
+        """Test that a typo in BRIDGE_FRAMING fails at startup"""
+        self.assertEqual(get_framing("packet").name, "packet")
+        with self.assertRaises(ValueError):
+            get_framing("msgpack")
+
+
+if __name__ == "__main__":
+    unittest.main()
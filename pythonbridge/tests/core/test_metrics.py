@@ -0,0 +1,129 @@
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from pythonbridge.core.metrics import (
+    Histogram,
+    MetricsRegistry,
+    merge_snapshots,
+    timed,
+)
+
+
+class TestHistogram(unittest.TestCase):
+    def test_quantiles_are_bucket_bounds_capped_at_max(self):
+        """Test that quantiles come from the buckets and never exceed the slowest observation"""
+        histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+        for value in [0.005] * 90 + [0.05] * 9 + [0.3]:
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 100)
+        self.assertEqual(snapshot["p50"], 0.01)
+        self.assertEqual(snapshot["p95"], 0.1)
+        self.assertEqual(snapshot["p99"], 0.1)
+        self.assertEqual(histogram.quantile(1.0), 0.3)
+        self.assertEqual(
+            snapshot["buckets"], {"0.01": 90, "0.1": 9, "1.0": 1, "+Inf": 0}
+        )
+
+    def test_empty_snapshot(self):
+        """Test that an empty histogram reports zeros"""
+        snapshot = Histogram().snapshot()
+        self.assertEqual(
+            (snapshot["count"], snapshot["min"], snapshot["p99"]), (0, 0.0, 0.0)
+        )
+
+
+class TestMergeSnapshots(unittest.TestCase):
+    def test_counters_add_up_and_histograms_merge(self):
+        """Test that the snapshots of several processes add up to one"""
+        front, worker = MetricsRegistry(), MetricsRegistry()
+        front.increment("bridge.errors.main")
+        front.observe("bridge.message.hello", 0.002)
+        worker.increment("bridge.errors.main", 2)
+        worker.observe("bridge.message.hello", 0.2)
+        worker.observe("bridge.message.main", 3.0)
+
+        merged = merge_snapshots([front.snapshot(), worker.snapshot()])
+
+        self.assertEqual(merged["counters"], {"bridge.errors.main": 3})
+        hello = merged["histograms"]["bridge.message.hello"]
+        self.assertEqual((hello["count"], hello["min"], hello["max"]), (2, 0.002, 0.2))
+        self.assertAlmostEqual(hello["mean"], 0.101)
+        self.assertEqual(hello["buckets"]["0.0025"], 1)
+        self.assertEqual(hello["buckets"]["0.25"], 1)
+        self.assertEqual(merged["histograms"]["bridge.message.main"]["count"], 1)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_timer_counts_errors(self):
+        """Test that a failing block is timed and counted as an error"""
+        registry = MetricsRegistry()
+        with registry.timer("stage"):
+            pass
+        with self.assertRaises(ValueError):
+            with registry.timer("stage"):
+                raise ValueError("boom")
+
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot["histograms"]["stage"]["count"], 2)
+        self.assertEqual(snapshot["counters"], {"stage.errors": 1})
+
+    def test_concurrent_increments(self):
+        """Test that counters do not lose updates across threads"""
+        registry = MetricsRegistry()
+
+        def work():
+            for _ in range(1000):
+                registry.increment("calls")
+                registry.observe("latency", 0.001)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        snapshot = registry.snapshot(reset=True)
+        self.assertEqual(snapshot["counters"]["calls"], 4000)
+        self.assertEqual(snapshot["histograms"]["latency"]["count"], 4000)
+        self.assertEqual(registry.snapshot(), {"counters": {}, "histograms": {}})
+
+    def test_json_lines_sink(self):
+        """Test that every observation is appended to the metrics file"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "logs" / "metrics.jsonl"
+            registry = MetricsRegistry(str(path))
+            registry.increment("llm.prompt_tokens", 120)
+            registry.observe("review.total", 2.5)
+            registry.close()
+
+            lines = [json.loads(line) for line in path.read_text().splitlines()]
+
+        self.assertEqual(
+            [(line["kind"], line["name"], line["value"]) for line in lines],
+            [("counter", "llm.prompt_tokens", 120), ("timer", "review.total", 2.5)],
+        )
+
+    def test_timed_keeps_signature(self):
+        """Test that timed functions keep the name and signature LangGraph inspects"""
+        registry = MetricsRegistry()
+
+        def node(state: dict) -> dict:
+            return {"seen": state["input"]}
+
+        with patch("pythonbridge.core.metrics.get_metrics", return_value=registry):
+            wrapped = timed("agent.node")(node)
+            self.assertEqual(wrapped({"input": 1}), {"seen": 1})
+
+        self.assertEqual(wrapped.__name__, "node")
+        self.assertEqual(wrapped.__wrapped__, node)
+        self.assertEqual(registry.snapshot()["histograms"]["agent.node"]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
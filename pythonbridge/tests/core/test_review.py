@@ -1,20 +1,39 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
 from pathlib import Path
+from typing import TypedDict
 from unittest.mock import Mock, patch
-from pythonbridge.core.review import review_pr
+
+from langgraph.graph import END, START, StateGraph
+
+from pythonbridge.ast.code_graph import CodeGraph
+from pythonbridge.core.review import invoke_graph, review_pr
+from pythonbridge.core.store import ReviewStore
+from pythonbridge.llm.chunking import Batch, Chunk
+from pythonbridge.llm.streaming import stream_sink
 
 TESTS_DIR = Path(__file__).parent.parent
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
 HELLO_PATCH = (TESTS_DIR / "test_files" / "hello.patch").read_text()
 
 
 class TestReview(unittest.TestCase):
     @patch("pythonbridge.core.review.load_environment")
     @patch("pythonbridge.core.review.create_reaction")
-    @patch("pythonbridge.core.review.get_diff")
+    @patch("pythonbridge.core.review.prefetch_diff")
     @patch("pythonbridge.core.review.GraphBuilder")
     @patch("pythonbridge.core.review.post_review")
     def test_review_pr_reviews_files(
-        self, mock_post_review, mock_graph_builder, mock_get_diff, mock_create_reaction, mock_load_env
+        self,
+        mock_post_review,
+        mock_graph_builder,
+        mock_prefetch_diff,
+        mock_create_reaction,
+        mock_load_env,
     ):
         # https://docs.github.com/en/rest/pulls/pulls#list-pull-requests-files
         mock_file = Mock()
@@ -22,11 +41,11 @@ class TestReview(unittest.TestCase):
         mock_file.status = "added"
         mock_file.patch = HELLO_PATCH
 
-        mock_get_diff.return_value = [mock_file]
+        mock_prefetch_diff.return_value = [[mock_file]]
 
         mock_graph = Mock()
         mock_graph.invoke.return_value = {"pr_review": "Looks good, no issues found."}
-        mock_graph_builder.return_value.build_graph.return_value = mock_graph
+        mock_graph_builder.return_value.get_graph.return_value = mock_graph
 
         payload = {
             "number": 1,
@@ -42,17 +61,22 @@ class TestReview(unittest.TestCase):
         self.assertEqual(reviews[0]["review"], "Looks good, no issues found.")
 
         mock_load_env.assert_called_once()
-        mock_get_diff.assert_called_once_with(payload)
+        mock_prefetch_diff.assert_called_once_with(payload)
         mock_graph.invoke.assert_called_once_with({"pr_input": mock_file.patch})
         mock_post_review.assert_called_once()
 
     @patch("pythonbridge.core.review.load_environment")
     @patch("pythonbridge.core.review.create_reaction")
-    @patch("pythonbridge.core.review.get_diff")
+    @patch("pythonbridge.core.review.prefetch_diff")
     @patch("pythonbridge.core.review.GraphBuilder")
     @patch("pythonbridge.core.review.post_review")
     def test_review_pr_skips_files_without_patch(
-        self, mock_post_review, mock_graph_builder, mock_get_diff, mock_create_reaction, mock_load_env
+        self,
+        mock_post_review,
+        mock_graph_builder,
+        mock_prefetch_diff,
+        mock_create_reaction,
+        mock_load_env,
     ):
         # Deleted files have no patch (no diff to review)
         mock_file = Mock()
@@ -60,10 +84,10 @@ class TestReview(unittest.TestCase):
         mock_file.status = "removed"
         mock_file.patch = None
 
-        mock_get_diff.return_value = [mock_file]
+        mock_prefetch_diff.return_value = [[mock_file]]
 
         mock_graph = Mock()
-        mock_graph_builder.return_value.build_graph.return_value = mock_graph
+        mock_graph_builder.return_value.get_graph.return_value = mock_graph
 
         payload = {
             "number": 1,
@@ -76,13 +100,346 @@ class TestReview(unittest.TestCase):
         self.assertEqual(len(reviews), 1)
         self.assertEqual(reviews[0]["filename"], "deleted.py")
         self.assertIsNone(reviews[0]["review"])
+        self.assertEqual(reviews[0]["skipped"], "deleted")
 
         mock_load_env.assert_called_once()
-        mock_get_diff.assert_called_once_with(payload)
+        mock_prefetch_diff.assert_called_once_with(payload)
         mock_post_review.assert_called_once()
         # LLM should NOT be called
         mock_graph.invoke.assert_not_called()
 
+    @patch("pythonbridge.core.config.REVIEW_BATCH_MAX_FILES", 1)
+    @patch("pythonbridge.core.review.load_environment")
+    @patch("pythonbridge.core.review.create_reaction")
+    @patch("pythonbridge.core.review.prefetch_diff")
+    @patch("pythonbridge.core.review.GraphBuilder")
+    @patch("pythonbridge.core.review.post_review")
+    def test_review_pr_keeps_order_and_isolates_failures(
+        self,
+        mock_post_review,
+        mock_graph_builder,
+        mock_prefetch_diff,
+        mock_create_reaction,
+        mock_load_env,
+    ):
+        files = []
+        for i in range(6):
+            mock_file = Mock()
+            mock_file.filename = f"file{i}.py"
+            mock_file.status = "modified"
+            mock_file.patch = f"patch {i}"
+            files.append(mock_file)
+
+        mock_prefetch_diff.return_value = [files]
+
+        def invoke(state):
+            if state["pr_input"] == "patch 2":
+                raise RuntimeError("ReviewAgent's llm did not respond")
+            return {"pr_review": f"review of {state['pr_input']}"}
+
+        mock_graph = Mock()
+        mock_graph.invoke.side_effect = invoke
+        mock_graph_builder.return_value.get_graph.return_value = mock_graph
+
+        payload = {
+            "number": 1,
+            "repository": {"full_name": "owner/repo"},
+            "installation": {"id": "12345"},
+        }
+
+        reviews = review_pr(payload)
+
+        self.assertEqual([r["filename"] for r in reviews], [f.filename for f in files])
+        self.assertIsNone(reviews[2]["review"])
+        self.assertEqual(reviews[2]["error"], "ReviewAgent's llm did not respond")
+        self.assertEqual(reviews[5]["review"], "review of patch 5")
+        self.assertIsNone(reviews[5]["error"])
+        mock_post_review.assert_called_once_with(payload, reviews)
+
+    @patch("pythonbridge.core.review.load_environment")
+    @patch("pythonbridge.core.review.create_reaction")
+    @patch("pythonbridge.core.review.prefetch_diff")
+    @patch("pythonbridge.core.review.GraphBuilder")
+    @patch("pythonbridge.core.review.post_review")
+    def test_review_pr_batches_small_patches(
+        self,
+        mock_post_review,
+        mock_graph_builder,
+        mock_prefetch_diff,
+        mock_create_reaction,
+        mock_load_env,
+    ):
+        files = []
+        for i in range(3):
+            mock_file = Mock()
+            mock_file.filename = f"file{i}.py"
+            mock_file.status = "modified"
+            mock_file.patch = f"@@ -1 +1 @@\n-a{i}\n+b{i}\n"
+            files.append(mock_file)
+
+        mock_prefetch_diff.return_value = [files]
+
+        def invoke(state):
+            # Answer for the first two files only, the third has to be retried
+            if "=== FILE:" not in state["pr_input"]:
+                return {"pr_review": "single review"}
+            return {
+                "pr_review": "=== FILE: file0.py ===\nfirst\n=== END FILE: file0.py ===\n"
+                "=== FILE: file1.py ===\nsecond\n=== END FILE: file1.py ==="
+            }
+
+        mock_graph = Mock()
+        mock_graph.invoke.side_effect = invoke
+        mock_graph_builder.return_value.get_graph.return_value = mock_graph
+
+        reviews = review_pr({"number": 1})
+
+        self.assertEqual(
+            [r["review"] for r in reviews], ["first", "second", "single review"]
+        )
+        self.assertEqual(mock_graph.invoke.call_count, 2)
+        self.assertEqual(
+            mock_graph.invoke.call_args.args[0], {"pr_input": files[2].patch}
+        )
+
+    @patch("pythonbridge.core.review.load_environment")
+    @patch("pythonbridge.core.review.create_reaction")
+    @patch("pythonbridge.core.review.prefetch_diff")
+    @patch("pythonbridge.core.review.GraphBuilder")
+    @patch("pythonbridge.core.review.post_review")
+    @patch("pythonbridge.core.config.CODE_INDEX_DIR", "checkouts")
+    @patch("pythonbridge.core.context.get_code_graph")
+    def test_review_pr_sends_impact_context(
+        self,
+        mock_get_code_graph,
+        mock_post_review,
+        mock_graph_builder,
+        mock_prefetch_diff,
+        mock_create_reaction,
+        mock_load_env,
+    ):
+        mock_file = Mock()
+        mock_file.filename = "app.py"
+        mock_file.status = "modified"
+        mock_file.patch = "@@ -2 +2 @@\n-    step()\n+    other()\n"
+        mock_prefetch_diff.return_value = [[mock_file]]
+
+        code_graph = CodeGraph()
+        code_graph.add_file(
+            "app.py",
+            {
+                "function_def": [
+                    {
+                        "caller": "app.py",
+                        "callee": "run",
+                        "location": [[0, 4], [0, 7]],
+                        "lines": [0, 1],
+                        "signature": "def run()",
+                    }
+                ]
+            },
+        )
+        mock_get_code_graph.return_value = code_graph
+
+        mock_graph = Mock()
+        mock_graph.invoke.return_value = {"pr_review": "ok"}
+        mock_graph_builder.return_value.get_graph.return_value = mock_graph
+
+        review_pr({"number": 1})
+
+        state = mock_graph.invoke.call_args.args[0]
+        self.assertEqual(state["pr_input"], mock_file.patch)
+        self.assertIn("- def run()  (app.py:1)", state["pr_context"])
+
+    @patch("pythonbridge.core.review.load_environment")
+    @patch("pythonbridge.core.review.create_reaction")
+    @patch("pythonbridge.core.review.prefetch_diff")
+    @patch("pythonbridge.core.review.GraphBuilder")
+    @patch("pythonbridge.core.review.post_review")
+    def test_review_pr_skips_unreviewable_files(
+        self,
+        mock_post_review,
+        mock_graph_builder,
+        mock_prefetch_diff,
+        mock_create_reaction,
+        mock_load_env,
+    ):
+        files = []
+        for filename in ["uv.lock", "app.py", "vendor/lib/x.py"]:
+            mock_file = Mock()
+            mock_file.filename = filename
+            mock_file.status = "modified"
+            mock_file.patch = "@@ -5 +5 @@\n-a\n+b\n"
+            files.append(mock_file)
+        mock_prefetch_diff.return_value = [files]
+
+        mock_graph = Mock()
+        mock_graph.invoke.return_value = {"pr_review": "fine"}
+        mock_graph_builder.return_value.get_graph.return_value = mock_graph
+
+        reviews = review_pr({"number": 1})
+
+        self.assertEqual([r["filename"] for r in reviews], [f.filename for f in files])
+        self.assertEqual(
+            [r["skipped"] for r in reviews],
+            ["matches *.lock", None, "matches vendor/*"],
+        )
+        self.assertEqual([r["review"] for r in reviews], [None, "fine", None])
+        mock_graph.invoke.assert_called_once_with({"pr_input": files[1].patch})
+
+    @patch("pythonbridge.core.review.get_changed_since")
+    @patch("pythonbridge.core.review.get_head_sha")
+    @patch("pythonbridge.core.review.get_review_store")
+    @patch("pythonbridge.core.review.load_environment")
+    @patch("pythonbridge.core.review.create_reaction")
+    @patch("pythonbridge.core.review.prefetch_diff")
+    @patch("pythonbridge.core.review.GraphBuilder")
+    @patch("pythonbridge.core.review.post_review")
+    def test_review_pr_only_reviews_files_changed_since_last_review(
+        self,
+        mock_post_review,
+        mock_graph_builder,
+        mock_prefetch_diff,
+        mock_create_reaction,
+        mock_load_env,
+        mock_get_store,
+        mock_get_head_sha,
+        mock_get_changed_since,
+    ):
+        files = []
+        for i in range(3):
+            mock_file = Mock()
+            mock_file.filename = f"file{i}.py"
+            mock_file.status = "modified"
+            mock_file.patch = f"patch {i}"
+            files.append(mock_file)
+        mock_prefetch_diff.return_value = [files]
+
+        mock_graph = Mock()
+        mock_graph.invoke.side_effect = lambda state: {
+            "pr_review": f"review of {state['pr_input']}"
+        }
+        mock_graph_builder.return_value.get_graph.return_value = mock_graph
+
+        with tempfile.TemporaryDirectory() as tmp:
+            mock_get_store.return_value = ReviewStore(f"{tmp}/reviews.sqlite3")
+            payload = {"number": 7, "repository": {"full_name": "owner/repo"}}
+
+            with patch("pythonbridge.core.config.REVIEW_BATCH_MAX_FILES", 1):
+                mock_get_head_sha.return_value = "sha1"
+                review_pr(payload)
+                self.assertEqual(mock_graph.invoke.call_count, 3)
+
+                # one new commit touching file1.py
+                mock_get_head_sha.return_value = "sha2"
+                mock_get_changed_since.return_value = {"file1.py"}
+                files[1].patch = "patch 1 updated"
+                mock_graph.invoke.reset_mock()
+                reviews = review_pr(payload)
+
+        mock_get_changed_since.assert_called_once_with(payload, "sha1", "sha2")
+        mock_graph.invoke.assert_called_once_with({"pr_input": "patch 1 updated"})
+        self.assertEqual(
+            [r["review"] for r in reviews],
+            ["review of patch 0", "review of patch 1 updated", "review of patch 2"],
+        )
+
+    @patch("pythonbridge.core.review.load_environment")
+    @patch("pythonbridge.core.review.create_reaction")
+    @patch("pythonbridge.core.review.prefetch_diff")
+    @patch("pythonbridge.core.review.GraphBuilder")
+    @patch("pythonbridge.core.review.post_review")
+    def test_review_pr_starts_before_the_last_page(
+        self,
+        mock_post_review,
+        mock_graph_builder,
+        mock_prefetch_diff,
+        mock_create_reaction,
+        mock_load_env,
+    ):
+        files = []
+        for i in range(2):
+            mock_file = Mock()
+            mock_file.filename = f"file{i}.py"
+            mock_file.status = "modified"
+            mock_file.patch = f"patch {i}"
+            files.append(mock_file)
+        first_review_started = threading.Event()
+
+        def pages(payload):
+            yield [files[0]]
+            # the second page only arrives once the first one is being reviewed
+            if not first_review_started.wait(timeout=5):
+                raise AssertionError("review did not start before the last page")
+            yield [files[1]]
+
+        def invoke(state):
+            first_review_started.set()
+            return {"pr_review": f"review of {state['pr_input']}"}
+
+        mock_prefetch_diff.side_effect = pages
+        mock_graph = Mock()
+        mock_graph.invoke.side_effect = invoke
+        mock_graph_builder.return_value.get_graph.return_value = mock_graph
+
+        reviews = review_pr({"number": 1})
+
+        self.assertEqual(
+            [r["review"] for r in reviews], ["review of patch 0", "review of patch 1"]
+        )
+
+
+class TestInvokeGraph(unittest.TestCase):
+    def test_review_text_is_streamed_through_the_graph(self):
+        """Test that text a graph node streams reaches the bridge as partial frames"""
+
+        class State(TypedDict):
+            pr_input: str
+            pr_review: str
+
+        def node(state):
+            sink = stream_sink()
+            for word in ["no ", "issues"]:
+                sink(word)
+            return {"pr_review": "no issues"}
+
+        workflow = StateGraph(State)
+        workflow.add_node("review_agent", node)
+        workflow.add_edge(START, "review_agent")
+        workflow.add_edge("review_agent", END)
+        frames = []
+
+        review = invoke_graph(
+            workflow.compile(), Batch([Chunk("a.py", "@@ -1 +1 @@\n")]), frames.append
+        )
+
+        self.assertEqual(review, "no issues")
+        self.assertEqual(
+            "".join(frame.get("delta", "") for frame in frames), "no issues"
+        )
+        self.assertTrue(all(frame["files"] == ["a.py"] for frame in frames))
+
+
+class TestImport(unittest.TestCase):
+    def test_review_does_not_need_tree_sitter(self):
+        """Test that reviews without CODE_INDEX_DIR work without tree-sitter installed"""
+        code = (
+            "import sys; sys.modules['tree_sitter'] = None; "
+            "import pythonbridge.core.review; "
+            "print('pythonbridge.core.context' in sys.modules)"
+        )
+        env = {**os.environ, "PYTHONPATH": str(PROJECT_ROOT)}
+
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        self.assertEqual(result.stdout.strip(), "False")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,39 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from pythonbridge.core.store import ReviewStore, patch_hash
+
+
+class TestReviewStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp.name) / "reviews" / "store.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_save_replaces_previous_review(self):
+        """Test that only the latest review of a PR is kept, and survives a reopen"""
+        store = ReviewStore(self.path)
+        self.assertIsNone(store.get("owner/repo", 1))
+
+        store.save(
+            "owner/repo", 1, "sha1", {"a.py": ("h1", "old"), "b.py": ("h2", "b")}
+        )
+        store.save("owner/repo", 1, "sha2", {"a.py": ("h3", "new")})
+        store.save("owner/repo", 2, "sha9", {"c.py": ("h4", "other PR")})
+
+        stored = ReviewStore(self.path).get("owner/repo", 1)
+        self.assertEqual(stored.head_sha, "sha2")
+        self.assertEqual(stored.files, {"a.py": ("h3", "new")})
+
+    def test_patch_hash(self):
+        """Test that the hash follows the patch content"""
+        self.assertEqual(patch_hash("@@ x"), patch_hash("@@ x"))
+        self.assertNotEqual(patch_hash("@@ x"), patch_hash("@@ y"))
+        self.assertEqual(patch_hash(None), patch_hash(""))
+
+
+if __name__ == "__main__":
+    unittest.main()
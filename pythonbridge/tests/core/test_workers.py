@@ -0,0 +1,125 @@
+import io
+import json
+import os
+import time
+import unittest
+
+from pythonbridge.core.dispatcher import ResponseWriter
+from pythonbridge.core.workers import WorkerPool, supervise
+
+HANDLER = "pythonbridge.tests.core.test_workers:respond"
+
+
+def respond(msg: dict) -> dict:
+    """Handler run by the test workers"""
+    if msg["type"] == "crash":
+        os._exit(3)
+    if msg["type"] == "slow":
+        time.sleep(msg.get("seconds", 0.2))
+    if msg["type"] == "metrics":
+        snapshot = {"counters": {f"pid.{os.getpid()}": 1}, "histograms": {}}
+        return {"status": "ok", "response": snapshot, "error": None, "_id": msg["_id"]}
+    return {"status": "ok", "response": os.getpid(), "error": None, "_id": msg["_id"]}
+
+
+def read_lines(stream: io.BytesIO) -> list[dict]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.out = io.BytesIO()
+        self.writer = ResponseWriter(self.out)
+        self.pool = WorkerPool(HANDLER, 2, self.writer, {}, default_limit=2)
+        self.pool.start()
+        self.wait_alive()
+
+    def tearDown(self):
+        self.pool.shutdown()
+        self.writer.close()
+
+    def wait_alive(self) -> None:
+        deadline = time.monotonic() + 20
+        while not all(w["alive"] for w in self.pool.stats()):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def wait_for(self, count: int) -> list[dict]:
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            lines = read_lines(self.out)
+            if len(lines) >= count:
+                return lines
+            time.sleep(0.01)
+        self.fail(f"Got {read_lines(self.out)}, expected {count} responses")
+
+    def test_requests_spread_over_workers(self):
+        """Test that concurrent requests go to the least busy worker"""
+        for i in range(4):
+            self.pool.submit({"type": "slow", "_id": i})
+
+        responses = self.wait_for(4)
+
+        self.assertEqual(sorted(r["_id"] for r in responses), [0, 1, 2, 3])
+        self.assertEqual(len({r["response"] for r in responses}), 2)
+        self.assertNotIn(os.getpid(), {r["response"] for r in responses})
+
+    def test_crashed_worker_is_replaced(self):
+        """Test that a dead worker's requests fail and a new worker takes its slot"""
+        self.pool.submit({"type": "slow", "_id": 1})
+        self.pool.submit({"type": "crash", "_id": 2})
+
+        responses = self.wait_for(2)
+        crashed = [r for r in responses if r["_id"] == 2][0]
+        self.assertEqual(crashed["status"], "error")
+        self.assertIn("crashed", crashed["error"])
+
+        self.wait_alive()
+        self.pool.submit({"type": "hello", "_id": 3})
+        self.pool.submit({"type": "hello", "_id": 4})
+        self.assertEqual(len(self.wait_for(4)), 4)
+        self.assertEqual(sum(w["restarts"] for w in self.pool.stats()), 1)
+
+    def test_stats_report_queue_depth(self):
+        """Test that requests in flight show up in their worker's depth"""
+        for i in range(3):
+            self.pool.submit({"type": "slow", "seconds": 0.5, "_id": i})
+
+        self.assertEqual(sum(w["depth"] for w in self.pool.stats()), 3)
+        self.wait_for(3)
+        self.assertEqual(sum(w["depth"] for w in self.pool.stats()), 0)
+        self.assertEqual(sum(w["handled"] for w in self.pool.stats()), 3)
+
+    def test_broadcast_returns_every_worker_response(self):
+        """Test that a broadcast reaches each worker and its responses are not written"""
+        responses = self.pool.broadcast({"type": "hello"}, timeout=20)
+
+        self.assertEqual(len({r["response"] for r in responses}), 2)
+        self.assertEqual(read_lines(self.out), [])
+        self.assertEqual(sum(w["handled"] for w in self.pool.stats()), 0)
+
+
+class TestSupervise(unittest.TestCase):
+    def test_front_answers_hello_workers_and_metrics(self):
+        """Test that health checks, pool stats and metrics are answered by the front process"""
+        stdin = io.BytesIO(
+            b'{"type": "hello", "_id": 1}\n'
+            b'{"type": "slow", "seconds": 0, "_id": 2}\n'
+            b'{"type": "workers", "_id": 3}\n'
+            b'{"type": "metrics", "_id": 4}\n'
+        )
+        out = io.BytesIO()
+
+        supervise(HANDLER, 1, {}, stdin=stdin, stdout=out)
+
+        responses = {r["_id"]: r for r in read_lines(out)}
+        self.assertEqual(responses[1]["response"], os.getpid())
+        self.assertNotEqual(responses[2]["response"], os.getpid())
+        self.assertEqual(len(responses[3]["response"]), 1)
+        self.assertIn("depth", responses[3]["response"][0])
+        # the front's own metrics, added up with those of the workers already up
+        self.assertIn(f"pid.{os.getpid()}", responses[4]["response"]["counters"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, patch
+
+from pythonbridge.gh import auth
+from pythonbridge.gh.auth import TokenCache, get_installation_token
+
+
+def authorization(token: str, expires_in: timedelta) -> Mock:
+    mock_authorization = Mock()
+    mock_authorization.token = token
+    mock_authorization.expires_at = datetime.now(timezone.utc) + expires_in
+    return mock_authorization
+
+
+class TestTokenCache(unittest.TestCase):
+    def test_reuses_token_until_expiry(self):
+        """Test that a valid token is minted once and then served from the cache"""
+        cache = TokenCache()
+        mint = Mock(return_value=authorization("tok", timedelta(hours=1)))
+
+        self.assertEqual(cache.get("1", mint), "tok")
+        self.assertEqual(cache.get("1", mint), "tok")
+
+        mint.assert_called_once_with("1")
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    def test_refreshes_inside_margin(self):
+        """Test that a token about to expire is refreshed"""
+        cache = TokenCache(refresh_margin=timedelta(minutes=5))
+        mint = Mock(
+            side_effect=[
+                authorization("old", timedelta(minutes=2)),
+                authorization("new", timedelta(hours=1)),
+            ]
+        )
+
+        self.assertEqual(cache.get("1", mint), "old")
+        self.assertEqual(cache.get("1", mint), "new")
+        self.assertEqual(mint.call_count, 2)
+
+    def test_tokens_are_keyed_by_installation(self):
+        """Test that installations do not share tokens"""
+        cache = TokenCache()
+        mint = Mock(side_effect=lambda i: authorization(f"tok-{i}", timedelta(hours=1)))
+
+        self.assertEqual(cache.get("1", mint), "tok-1")
+        self.assertEqual(cache.get(2, mint), "tok-2")
+        self.assertEqual(cache.get("2", mint), "tok-2")
+        self.assertEqual(mint.call_count, 2)
+
+    def test_concurrent_refreshes_are_collapsed(self):
+        """Test that threads asking for the same installation share one mint"""
+        cache = TokenCache()
+        started = threading.Event()
+        release = threading.Event()
+
+        def mint(installation_id):
+            started.set()
+            release.wait(timeout=5)
+            return authorization("tok", timedelta(hours=1))
+
+        mock_mint = Mock(side_effect=mint)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get("1", mock_mint)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        started.wait(timeout=5)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ["tok"] * 5)
+        mock_mint.assert_called_once()
+        self.assertEqual(cache.stats()["misses"], 1)
+
+
+class TestGetInstallationToken(unittest.TestCase):
+    def setUp(self):
+        auth._token_cache.clear()
+
+    def tearDown(self):
+        auth._token_cache.clear()
+
+    @patch("pythonbridge.gh.auth.GithubIntegration")
+    def test_get_installation_token_is_cached(self, mock_integration):
+        """Test that repeated calls only hit GitHub once"""
+        mock_integration.return_value.get_access_token.return_value = authorization(
+            "tok", timedelta(hours=1)
+        )
+
+        self.assertEqual(get_installation_token("12345"), "tok")
+        self.assertEqual(get_installation_token("12345"), "tok")
+        self.assertEqual(get_installation_token("12345"), "tok")
+
+        mock_integration.return_value.get_access_token.assert_called_once_with("12345")
+        self.assertEqual(auth.token_cache_stats()["hits"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from github import GithubException
+
+from pythonbridge.gh import client
+from pythonbridge.gh.client import (
+    ClientManager,
+    InstallationAuth,
+    DiffFile,
+    get_changed_since,
+    get_diff,
+    iter_diff_pages,
+    parse_diff,
+    prefetch_diff,
+    post_comment,
+    request_context,
+)
+
+PAYLOAD = {
+    "number": 1,
+    "repository": {"full_name": "owner/repo"},
+    "installation": {"id": "12345"},
+}
+
+
+class TestClientManager(unittest.TestCase):
+    @patch("pythonbridge.gh.client.Github")
+    def test_one_client_per_installation(self, mock_github):
+        """Test that clients are created once and reused per installation"""
+        manager = ClientManager(pool_size=3)
+
+        first = manager.get("1")
+        self.assertIs(manager.get("1"), first)
+        manager.get("2")
+
+        self.assertEqual(mock_github.call_count, 2)
+        self.assertEqual(mock_github.call_args.kwargs["pool_size"], 3)
+        self.assertIsInstance(mock_github.call_args.kwargs["auth"], InstallationAuth)
+
+
+class TestRequestContext(unittest.TestCase):
+    def setUp(self):
+        client._clients.clear()
+
+    def tearDown(self):
+        client._clients.clear()
+
+    @patch("pythonbridge.gh.client.Github")
+    def test_repo_and_pull_fetched_once_per_context(self, mock_github):
+        """Test that a review fetches the repo and PR only once"""
+        repo = mock_github.return_value.get_repo.return_value
+
+        with request_context():
+            get_diff(PAYLOAD)
+            post_comment(PAYLOAD, "hi")
+
+        mock_github.return_value.get_repo.assert_called_once_with("owner/repo")
+        repo.get_pull.assert_called_once_with(1)
+        repo.get_pull.return_value.create_issue_comment.assert_called_once_with("hi")
+
+    @patch("pythonbridge.gh.client.Github")
+    def test_no_caching_outside_context(self, mock_github):
+        """Test that handles are not shared between requests"""
+        get_diff(PAYLOAD)
+        get_diff(PAYLOAD)
+
+        self.assertEqual(mock_github.return_value.get_repo.call_count, 2)
+
+    @patch("pythonbridge.gh.client.get_installation_token", return_value="tok")
+    def test_installation_auth_counts_requests(self, _mock_token):
+        """Test that each authenticated request is counted against the context"""
+        auth = InstallationAuth("12345")
+
+        with request_context() as ctx:
+            headers = {}
+            auth.authentication(headers)
+            auth.authentication({})
+
+        self.assertEqual(headers["Authorization"], "token tok")
+        self.assertEqual(ctx.http_requests, 2)
+
+
+class TestGetChangedSince(unittest.TestCase):
+    def setUp(self):
+        client._clients.clear()
+
+    def tearDown(self):
+        client._clients.clear()
+
+    @patch("pythonbridge.gh.client.Github")
+    def test_changed_files_of_new_commits(self, mock_github):
+        """Test that the files of the compared commits are returned, renames both ways"""
+        compare = mock_github.return_value.get_repo.return_value.compare
+        compare.return_value = SimpleNamespace(
+            status="ahead",
+            files=[
+                SimpleNamespace(filename="a.py", previous_filename=None),
+                SimpleNamespace(filename="new.py", previous_filename="old.py"),
+            ],
+        )
+
+        changed = get_changed_since(PAYLOAD, "base", "head")
+
+        self.assertEqual(changed, {"a.py", "new.py", "old.py"})
+        compare.assert_called_once_with("base", "head")
+
+    @patch("pythonbridge.gh.client.Github")
+    def test_rewritten_history_is_not_incremental(self, mock_github):
+        """Test that a force push or a vanished commit means a full review"""
+        compare = mock_github.return_value.get_repo.return_value.compare
+        compare.return_value = SimpleNamespace(status="diverged", files=[])
+        self.assertIsNone(get_changed_since(PAYLOAD, "base", "head"))
+
+        compare.side_effect = GithubException(404, "No common ancestor", None)
+        self.assertIsNone(get_changed_since(PAYLOAD, "base", "head"))
+
+
+RAW_DIFF = """diff --git a/app.py b/app.py
+index 1111111..2222222 100644
+--- a/app.py
++++ b/app.py
+@@ -1,2 +1,2 @@
+-old
++new
+ same
+diff --git a/new.txt b/new.txt
+new file mode 100644
+index 0000000..3333333
+--- /dev/null
++++ b/new.txt
+@@ -0,0 +1 @@
++hello
+diff --git a/logo.png b/logo.png
+new file mode 100644
+index 0000000..4444444
+Binary files /dev/null and b/logo.png differ
+diff --git a/old_name.py b/new_name.py
+similarity index 100%
+rename from old_name.py
+rename to new_name.py
+"""
+
+
+class TestParseDiff(unittest.TestCase):
+    def test_files_of_a_raw_diff(self):
+        """Test that a raw diff is split into per-file patches like the files API's"""
+        files = parse_diff(RAW_DIFF)
+
+        self.assertEqual(
+            files,
+            {
+                "app.py": DiffFile(
+                    "app.py", "modified", "@@ -1,2 +1,2 @@\n-old\n+new\n same", 2
+                ),
+                "new.txt": DiffFile("new.txt", "added", "@@ -0,0 +1 @@\n+hello", 1),
+                "logo.png": DiffFile("logo.png", "added", None, 0),
+                "new_name.py": DiffFile("new_name.py", "renamed", None, 0),
+            },
+        )
+
+
+def file(filename: str, patch, changes: int = 1) -> SimpleNamespace:
+    return SimpleNamespace(
+        filename=filename, status="modified", patch=patch, changes=changes
+    )
+
+
+class TestDiffPages(unittest.TestCase):
+    def setUp(self):
+        client._clients.clear()
+
+    def tearDown(self):
+        client._clients.clear()
+
+    def mock_pull(self, mock_github, pages, changed_files):
+        pr = mock_github.return_value.get_repo.return_value.get_pull.return_value
+        pr.get_files.return_value.get_page.side_effect = lambda i: (
+            pages[i] if i < len(pages) else []
+        )
+        pr.changed_files = changed_files
+        return pr
+
+    @patch("pythonbridge.gh.client.Github")
+    def test_pages_in_order(self, mock_github):
+        """Test that every page of files is yielded as it is fetched"""
+        pages = [[file("a.py", "@@ a")], [file("b.py", "@@ b"), file("c.py", "@@ c")]]
+        self.mock_pull(mock_github, pages, 3)
+
+        with request_context():
+            self.assertEqual(list(iter_diff_pages(PAYLOAD)), pages)
+            self.assertEqual(list(prefetch_diff(PAYLOAD, depth=1)), pages)
+
+    @patch("pythonbridge.gh.client.get_raw_diff", return_value=RAW_DIFF)
+    @patch("pythonbridge.gh.client.LIST_FILES_MAX", 2)
+    @patch("pythonbridge.gh.client.Github")
+    def test_truncated_and_unlisted_files_come_from_the_raw_diff(
+        self, mock_github, mock_raw_diff
+    ):
+        """Test that left out patches and files past the listing limit are recovered"""
+        # app.py's patch was left out, the listing stopped before new.txt and logo.png
+        pages = [[file("app.py", None, changes=2), file("new_name.py", None, 0)]]
+        self.mock_pull(mock_github, pages, 4)
+
+        with request_context():
+            result = list(iter_diff_pages(PAYLOAD))
+
+        self.assertEqual(result[0], [pages[0][1]])
+        self.assertEqual(
+            [(f.filename, f.patch is not None) for f in result[1]],
+            [("app.py", True), ("new.txt", True), ("logo.png", False)],
+        )
+
+    def test_prefetch_raises_fetch_errors_after_earlier_pages(self):
+        """Test that a failed page fetch reaches the consumer in order"""
+
+        def pages(payload):
+            yield ["first"]
+            raise RuntimeError("GitHub is down")
+
+        with patch("pythonbridge.gh.client.iter_diff_pages", side_effect=pages):
+            iterator = prefetch_diff(PAYLOAD)
+            self.assertEqual(next(iterator), ["first"])
+            with self.assertRaisesRegex(RuntimeError, "GitHub is down"):
+                next(iterator)
+
+
+if __name__ == "__main__":
+    unittest.main()
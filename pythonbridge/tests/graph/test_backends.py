@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import MagicMock
+
+from pythonbridge.graph.backends import EDGE_TYPES, NODE_KEYS, Neo4jBackend
+
+
+def fake_driver():
+    driver = MagicMock()
+    session = driver.session.return_value
+    tx = MagicMock()
+    session.execute_write.side_effect = lambda work: work(tx)
+    return driver, session, tx
+
+
+class TestNeo4jBackend(unittest.TestCase):
+    def test_rows_are_sent_in_unwind_batches(self):
+        """Test that rows go out as parameters of a few UNWIND queries"""
+        driver, session, tx = fake_driver()
+        backend = Neo4jBackend(driver, batch_size=2)
+        rows = [{"key": f"f{i}.py", "props": {"path": f"f{i}.py"}} for i in range(5)]
+
+        backend.merge_nodes("File", rows)
+
+        driver.session.assert_called_once_with(database=None)
+        self.assertEqual(tx.run.call_count, 3)
+        query = tx.run.call_args_list[0].args[0]
+        self.assertTrue(
+            query.startswith("UNWIND $rows AS row MERGE (n:File {path: row.key})")
+        )
+        self.assertEqual(
+            [len(c.kwargs["rows"]) for c in tx.run.call_args_list], [2, 2, 1]
+        )
+        self.assertEqual(backend.queries, 3)
+
+    def test_edges_match_both_ends(self):
+        """Test that edge queries match the source and target by their key"""
+        driver, _, tx = fake_driver()
+        backend = Neo4jBackend(driver)
+
+        rows = [{"source": "a::f", "target": "g", "props": {}}]
+        backend.merge_edges("CALLS", "Function", "Name", rows)
+
+        query = tx.run.call_args.args[0]
+        self.assertIn("MATCH (a:Function {id: row.source})", query)
+        self.assertIn("MATCH (b:Name {name: row.target})", query)
+        self.assertIn("CREATE (a)-[r:CALLS]->(b)", query)
+
+    def test_unknown_labels_are_rejected(self):
+        """Test that labels formatted into Cypher must be known ones"""
+        driver, _, _ = fake_driver()
+        backend = Neo4jBackend(driver)
+
+        with self.assertRaises(ValueError):
+            backend.merge_nodes("File) DETACH DELETE (n", [])
+
+    def test_schema_creates_constraints_and_indexes(self):
+        """Test that every key gets a uniqueness constraint and every edge type a file index"""
+        driver, session, _ = fake_driver()
+        Neo4jBackend(driver).ensure_schema()
+
+        queries = [c.args[0] for c in session.run.call_args_list]
+        self.assertEqual(
+            sum("REQUIRE" in query and "IS UNIQUE" in query for query in queries),
+            len(NODE_KEYS),
+        )
+        for edge_type in EDGE_TYPES:
+            self.assertTrue(any(f"[r:{edge_type}]" in query for query in queries))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+
+from pythonbridge.ast.ast_manager import AST_manager
+from pythonbridge.graph.backends import MemoryBackend
+from pythonbridge.graph.ingest import GraphIngestor, imported_modules
+
+SERVICE = b"""import os, sys as system
+from pathlib import (Path,
+    PurePath)
+
+
+def load(path):
+    return Path(os.getcwd()).read_text()
+
+
+class Service:
+    def run(self):
+        pass
+"""
+
+UTIL = b"""def helper():
+    print("hi")
+"""
+
+
+def relationships(file_path: str, source: bytes) -> dict:
+    manager = AST_manager()
+    manager.create_ast(file_path, source)
+    return manager.get_relationships()
+
+
+def edge_set(backend: MemoryBackend) -> set[tuple[str, str, str]]:
+    return {(edge[0], edge[2], edge[4]) for edge in backend.edges}
+
+
+class TestImportedModules(unittest.TestCase):
+    def test_import_statements(self):
+        """Test that module names are taken from every import form"""
+        self.assertEqual(
+            imported_modules("import os.path as p, sys"), ["os.path", "sys"]
+        )
+        self.assertEqual(imported_modules("from . import x"), ["."])
+        self.assertEqual(
+            imported_modules("from pathlib import (Path,\n    PurePath)"), ["pathlib"]
+        )
+
+
+class TestGraphIngestor(unittest.TestCase):
+    def setUp(self):
+        self.backend = MemoryBackend()
+        self.ingestor = GraphIngestor(self.backend)
+
+    def test_ingest_creates_nodes_and_edges(self):
+        """Test that every relationship becomes an edge between keyed nodes"""
+        stats = self.ingestor.ingest(
+            [("svc/service.py", relationships("service.py", SERVICE))]
+        )
+
+        self.assertEqual(stats, {"files": 1, "edges": 9})
+        self.assertEqual(
+            edge_set(self.backend),
+            {
+                ("IMPORTS", "svc/service.py", "os"),
+                ("IMPORTS", "svc/service.py", "sys"),
+                ("IMPORTS", "svc/service.py", "pathlib"),
+                ("DEFINES", "svc/service.py", "svc/service.py::load"),
+                ("DEFINES", "svc/service.py", "svc/service.py::Service"),
+                (
+                    "HAS_METHOD",
+                    "svc/service.py::Service",
+                    "svc/service.py::Service.run",
+                ),
+                (
+                    "INSTANTIATES",
+                    "svc/service.py::load",
+                    "Path(os.getcwd()).read_text",
+                ),
+                ("CALLS", "svc/service.py::load", "os.getcwd"),
+                ("INSTANTIATES", "svc/service.py::load", "Path"),
+            },
+        )
+        calls = [edge for edge in self.backend.edges if edge[0] == "CALLS"]
+        self.assertEqual(
+            calls[0][5], {"file": "svc/service.py", "line": 7, "end_line": 7}
+        )
+
+    def test_writes_are_batched(self):
+        """Test that a flush writes each label and edge kind once, not once per edge"""
+        self.ingestor.ingest(
+            [
+                ("service.py", relationships("service.py", SERVICE)),
+                ("util.py", relationships("util.py", UTIL)),
+            ]
+        )
+
+        # 7 deletes, File/Module/Class/Function/Name nodes and 6 edge kinds
+        self.assertEqual(self.backend.queries, 7 + 5 + 6)
+
+    def test_small_batch_size_flushes_early(self):
+        """Test that the buffer is flushed once batch_size rows are pending"""
+        ingestor = GraphIngestor(self.backend, batch_size=1)
+        ingestor.add("util.py", relationships("util.py", UTIL))
+
+        self.assertEqual(ingestor.files_written, 1)
+        self.assertIn(("CALLS", "util.py::helper", "print"), edge_set(self.backend))
+
+    def test_reindex_rewrites_only_changed_files(self):
+        """Test that re-ingesting a file replaces its edges and keeps the others"""
+        self.ingestor.ingest(
+            [
+                ("service.py", relationships("service.py", SERVICE)),
+                ("util.py", relationships("util.py", UTIL)),
+            ]
+        )
+        changed = b"def helper():\n    return len([])\n"
+        self.ingestor.ingest([("util.py", relationships("util.py", changed))])
+
+        edges = edge_set(self.backend)
+        self.assertIn(("CALLS", "util.py::helper", "len"), edges)
+        self.assertNotIn(("CALLS", "util.py::helper", "print"), edges)
+        self.assertIn(("CALLS", "service.py::load", "os.getcwd"), edges)
+        self.assertEqual(
+            sum(1 for edge in self.backend.edges if edge[5]["file"] == "util.py"), 2
+        )
+
+    def test_removed_files_are_deleted(self):
+        """Test that removed files lose their node, owned nodes and edges"""
+        self.ingestor.ingest([("service.py", relationships("service.py", SERVICE))])
+        self.ingestor.ingest([], removed=["service.py"])
+
+        self.assertEqual(self.backend.edges, [])
+        self.assertEqual(self.backend.nodes["File"], {})
+        self.assertEqual(self.backend.nodes["Function"], {})
+        # shared nodes stay for other files
+        self.assertIn("os", self.backend.nodes["Module"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from pythonbridge.llm.agents import base
+from pythonbridge.llm.agents.base import load_prompt
+
+
+class TestLoadPrompt(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.prompt_dir = Path(self.tmp.name)
+        patcher = patch.object(base, "PROMPT_DIR", self.prompt_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(base._prompts.clear)
+
+    def test_prompt_is_read_once(self):
+        """Test that an unchanged prompt file is served from memory"""
+        (self.prompt_dir / "p.md").write_text("first")
+
+        self.assertEqual(load_prompt("p.md"), "first")
+        with patch.object(Path, "read_text") as mock_read_text:
+            self.assertEqual(load_prompt("p.md"), "first")
+            mock_read_text.assert_not_called()
+
+    def test_prompt_is_reloaded_when_file_changes(self):
+        """Test that editing the prompt file invalidates the cached text"""
+        path = self.prompt_dir / "p.md"
+        path.write_text("first")
+        self.assertEqual(load_prompt("p.md"), "first")
+
+        path.write_text("second")
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        self.assertEqual(load_prompt("p.md"), "second")
+
+
+if __name__ == "__main__":
+    unittest.main()
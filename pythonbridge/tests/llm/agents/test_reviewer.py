@@ -69,6 +69,18 @@ class TestReviewAgent(unittest.TestCase):
 
         mock_llm_instance.invoke.assert_called_once_with("the actual diff content")
 
+    @patch("pythonbridge.llm.agents.reviewer.GroqLLM")
+    def test_review_sends_pr_context_ahead_of_the_patch(self, mock_groq_llm):
+        """Test that the per-request impact context is prepended to the patch"""
+        mock_llm_instance = Mock()
+        mock_llm_instance.invoke.return_value = "Response"
+        mock_groq_llm.return_value = mock_llm_instance
+
+        agent = ReviewAgent("")
+        agent.review({"pr_input": "the diff", "pr_context": "Context: def f()"})
+
+        mock_llm_instance.invoke.assert_called_once_with("Context: def f()\n\nthe diff")
+
     @patch("pythonbridge.llm.agents.reviewer.GroqLLM")
     def test_review_raises_on_none_response(self, mock_groq_llm):
         """Test that review raises RuntimeError when LLM returns None"""
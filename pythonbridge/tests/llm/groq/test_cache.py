@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from pythonbridge.llm.groq.cache import CompletionCache, cache_key
+
+
+class TestCompletionCache(unittest.TestCase):
+    def test_key_depends_on_model_prompt_and_message(self):
+        """Test that changing any part of the request changes the key"""
+        key = cache_key("model", "prompt", "message")
+
+        self.assertEqual(key, cache_key("model", "prompt", "message"))
+        self.assertNotEqual(key, cache_key("other", "prompt", "message"))
+        self.assertNotEqual(key, cache_key("model", "other", "message"))
+        self.assertNotEqual(key, cache_key("model", "prompt", "other"))
+
+    def test_memory_hit_and_miss(self):
+        """Test that stored completions are returned and counted"""
+        cache = CompletionCache()
+
+        self.assertIsNone(cache.get("m", "p", "patch"))
+        cache.set("m", "p", "patch", "review")
+        self.assertEqual(cache.get("m", "p", "patch"), "review")
+
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_memory_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = CompletionCache(max_entries=2)
+        cache.set("m", "p", "a", "A")
+        cache.set("m", "p", "b", "B")
+        cache.get("m", "p", "a")
+        cache.set("m", "p", "c", "C")
+
+        self.assertEqual(cache.get("m", "p", "a"), "A")
+        self.assertIsNone(cache.get("m", "p", "b"))
+        self.assertEqual(cache.get("m", "p", "c"), "C")
+
+    def test_ttl_expiry(self):
+        """Test that entries older than the TTL are not returned"""
+        cache = CompletionCache(ttl=10)
+        with patch("pythonbridge.llm.groq.cache.time.time", return_value=1000.0):
+            cache.set("m", "p", "a", "A")
+        with patch("pythonbridge.llm.groq.cache.time.time", return_value=1011.0):
+            self.assertIsNone(cache.get("m", "p", "a"))
+
+    def test_disk_tier_survives_new_cache(self):
+        """Test that the SQLite tier answers after the memory tier is gone"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "llm.sqlite")
+            CompletionCache(path=path).set("m", "p", "a", "A")
+
+            cache = CompletionCache(path=path)
+            self.assertEqual(cache.get("m", "p", "a"), "A")
+            self.assertEqual(cache.stats()["memory_size"], 1)
+
+    def test_disk_tier_size_eviction(self):
+        """Test that the SQLite tier keeps at most disk_max_entries rows"""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = CompletionCache(
+                path=str(Path(tmp) / "llm.sqlite"), disk_max_entries=3
+            )
+            for i in range(5):
+                cache.set("m", "p", str(i), str(i))
+
+            self.assertEqual(cache.stats()["disk_size"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import Mock, patch
+
+import groq as groq_sdk
+import httpx
+
+from pythonbridge.llm.groq import CompletionCache, GroqLLM
+from pythonbridge.llm.groq import groq
+from pythonbridge.llm.groq.scheduler import RateLimitScheduler
+from pythonbridge.llm.streaming import stream_to
+
+
+def raw_response(content: str) -> Mock:
+    completion = Mock()
+    completion.choices = [Mock(message=Mock(content=content))]
+    return Mock(parse=Mock(return_value=completion), headers={})
+
+
+def stream_chunk(content: str) -> Mock:
+    return Mock(choices=[Mock(delta=Mock(content=content))])
+
+
+def raw_stream(*items) -> Mock:
+    def chunks():
+        for item in items:
+            if isinstance(item, Exception):
+                raise item
+            yield stream_chunk(item)
+
+    return Mock(parse=Mock(side_effect=chunks), headers={})
+
+
+class TestGroqLLM(unittest.TestCase):
+    def setUp(self):
+        groq._clients.clear()
+
+    def tearDown(self):
+        groq._clients.clear()
+
+    @patch("pythonbridge.llm.groq.groq.Groq")
+    def test_client_is_shared_between_instances(self, mock_groq):
+        """Test that every GroqLLM reuses the same Groq client"""
+        first = GroqLLM(system_prompt="review", cache=CompletionCache())
+        second = GroqLLM(system_prompt="validate", cache=CompletionCache())
+
+        self.assertIs(first.client, second.client)
+        mock_groq.assert_called_once()
+
+    @patch("pythonbridge.llm.groq.groq.Groq")
+    def test_invoke_reuses_cached_completion(self, mock_groq):
+        """Test that the same request is only sent to Groq once"""
+        create = mock_groq.return_value.chat.completions.with_raw_response.create
+        create.return_value = raw_response("review")
+
+        llm = GroqLLM(system_prompt="prompt", cache=CompletionCache())
+
+        self.assertEqual(llm.invoke("patch"), "review")
+        self.assertEqual(llm.invoke("patch"), "review")
+        create.assert_called_once()
+
+    @patch("pythonbridge.llm.groq.groq.Groq")
+    def test_invoke_does_not_cache_failures(self, mock_groq):
+        """Test that a failed request is retried on the next call"""
+        create = mock_groq.return_value.chat.completions.with_raw_response.create
+        create.side_effect = [Exception("boom"), raw_response("review")]
+
+        llm = GroqLLM(system_prompt="prompt", cache=CompletionCache())
+
+        self.assertIsNone(llm.invoke("patch"))
+        self.assertEqual(llm.invoke("patch"), "review")
+
+    @patch("pythonbridge.llm.groq.groq.Groq")
+    def test_client_leaves_retries_to_the_scheduler(self, mock_groq):
+        """Test that the SDK's own retries are off so only the scheduler retries"""
+        GroqLLM(cache=CompletionCache())
+
+        self.assertEqual(mock_groq.call_args.kwargs["max_retries"], 0)
+
+    @patch("pythonbridge.llm.groq.groq.Groq")
+    def test_invoke_goes_through_the_scheduler(self, mock_groq):
+        """Test that requests are sent by the scheduler with their estimated size"""
+        create = mock_groq.return_value.chat.completions.with_raw_response.create
+        create.return_value = raw_response("review")
+        scheduler = RateLimitScheduler()
+
+        llm = GroqLLM(
+            system_prompt="prompt", cache=CompletionCache(), scheduler=scheduler
+        )
+        with patch.object(scheduler, "run", wraps=scheduler.run) as run:
+            self.assertEqual(llm.invoke("patch"), "review")
+
+        self.assertGreater(run.call_args.kwargs["tokens"], 0)
+
+    @patch("pythonbridge.llm.groq.groq.Groq")
+    def test_invoke_streams_inside_stream_to(self, mock_groq):
+        """Test that the streaming API is used and every delta reaches the sink"""
+        create = mock_groq.return_value.chat.completions.with_raw_response.create
+        create.return_value = raw_stream("Looks ", "good", None)
+        received = []
+
+        llm = GroqLLM(system_prompt="prompt", cache=CompletionCache())
+        with stream_to(received.append):
+            self.assertEqual(llm.invoke("patch"), "Looks good")
+
+        self.assertTrue(create.call_args.kwargs["stream"])
+        self.assertEqual(received, ["Looks ", "good"])
+
+    @patch("pythonbridge.llm.groq.groq.Groq")
+    def test_retried_stream_resets_the_sink(self, mock_groq):
+        """Test that a stream cut off midway is restarted and the sink told so"""
+        request = httpx.Request("POST", "https://api.groq.com")
+        create = mock_groq.return_value.chat.completions.with_raw_response.create
+        create.side_effect = [
+            raw_stream("Loo", groq_sdk.APIConnectionError(request=request)),
+            raw_stream("Looks good"),
+        ]
+        received = []
+        scheduler = RateLimitScheduler(sleep=lambda _: None)
+
+        llm = GroqLLM(cache=CompletionCache(), scheduler=scheduler)
+        with stream_to(received.append):
+            self.assertEqual(llm.invoke("patch"), "Looks good")
+
+        self.assertEqual(received, ["Loo", None, "Looks good"])
+
+
+if __name__ == "__main__":
+    unittest.main()
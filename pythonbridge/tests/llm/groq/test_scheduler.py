@@ -0,0 +1,144 @@
+import threading
+import time
+import unittest
+
+import groq
+import httpx
+
+from pythonbridge.llm.groq.scheduler import RateLimitScheduler, parse_duration
+
+REQUEST = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+
+
+def status_error(cls, status: int, headers: dict = None):
+    response = httpx.Response(status, headers=headers or {}, request=REQUEST)
+    return cls(f"status {status}", response=response, body=None)
+
+
+class TestParseDuration(unittest.TestCase):
+    def test_groq_reset_formats(self):
+        """Test that every duration format Groq sends is understood"""
+        self.assertAlmostEqual(parse_duration("2m59.56s"), 179.56)
+        self.assertAlmostEqual(parse_duration("7.66s"), 7.66)
+        self.assertAlmostEqual(parse_duration("120ms"), 0.12)
+        self.assertAlmostEqual(parse_duration("1h2m"), 3720)
+        self.assertEqual(parse_duration("3"), 3)
+        self.assertIsNone(parse_duration(None))
+        self.assertIsNone(parse_duration("soon"))
+
+
+class TestRateLimitScheduler(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self.scheduler = RateLimitScheduler(
+            max_concurrency=4, max_retries=3, sleep=self.sleeps.append
+        )
+
+    def test_throttle_is_retried(self):
+        """Test that a 429 is retried after Retry-After and halves the in-flight cap"""
+        calls = [
+            status_error(groq.RateLimitError, 429, {"retry-after": "0.01"}),
+            ("review", {}),
+        ]
+
+        def call():
+            result = calls.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        self.assertEqual(self.scheduler.run(call), "review")
+        self.assertGreaterEqual(self.sleeps[0], 0.01)
+        self.assertEqual(self.scheduler.limit, 2)
+        self.assertEqual(self.scheduler.stats()["throttled"], 1)
+
+    def test_server_errors_are_retried_until_exhausted(self):
+        """Test that 5xx errors are retried max_retries times and then raised"""
+        error = status_error(groq.InternalServerError, 503)
+
+        def call():
+            raise error
+
+        with self.assertRaises(groq.InternalServerError):
+            self.scheduler.run(call)
+        self.assertEqual(self.scheduler.retries, 3)
+        self.assertEqual(len(self.sleeps), 3)
+
+    def test_client_errors_are_not_retried(self):
+        """Test that a bad request fails right away"""
+        error = status_error(groq.BadRequestError, 400)
+
+        def call():
+            raise error
+
+        with self.assertRaises(groq.BadRequestError):
+            self.scheduler.run(call)
+        self.assertEqual(self.scheduler.retries, 0)
+
+    def test_in_flight_requests_are_capped(self):
+        """Test that no more than the cap of requests run at the same time"""
+        scheduler = RateLimitScheduler(max_concurrency=2)
+        lock = threading.Lock()
+        running = 0
+        peak = 0
+
+        def call():
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+            return None, {}
+
+        threads = [
+            threading.Thread(target=scheduler.run, args=(call,)) for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(peak, 2)
+
+    def test_waits_for_the_window_reset(self):
+        """Test that requests queue until the window resets once its budget is used up"""
+        headers = {
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "0.2s",
+        }
+        self.scheduler.run(lambda: (None, headers))
+        self.assertEqual(self.scheduler.remaining_requests, 0)
+
+        start = time.monotonic()
+        self.scheduler.run(lambda: (None, {}))
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_token_budget_is_respected(self):
+        """Test that a request larger than the remaining tokens waits for the reset"""
+        headers = {
+            "x-ratelimit-remaining-tokens": "100",
+            "x-ratelimit-reset-tokens": "0.2s",
+        }
+        self.scheduler.run(lambda: (None, headers))
+
+        start = time.monotonic()
+        self.scheduler.run(lambda: (None, {}), tokens=50)
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.scheduler.run(lambda: (None, {}), tokens=500)
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_cap_grows_back_after_successes(self):
+        """Test that the in-flight cap is raised again once requests succeed"""
+        self.scheduler.limit = 1
+
+        for _ in range(3):
+            self.scheduler.run(lambda: (None, {}))
+
+        self.assertEqual(self.scheduler.limit, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+
+from pythonbridge.llm.chunking import (
+    Batch,
+    Chunk,
+    estimate_tokens,
+    plan_batches,
+    split_patch,
+)
+
+
+def hunk(start: int, lines: int) -> str:
+    body = "".join(f"+line {start + i}\n" for i in range(lines))
+    return f"@@ -{start},0 +{start},{lines} @@\n{body}"
+
+
+class TestSplitPatch(unittest.TestCase):
+    def test_small_patch_is_not_split(self):
+        """Test that a patch within the budget is kept whole"""
+        patch = hunk(1, 3)
+        self.assertEqual(split_patch(patch, 1000), [patch])
+
+    def test_split_on_hunk_boundaries(self):
+        """Test that hunks are packed together while they fit and never cut"""
+        # same sized hunks, two of them fit the budget
+        hunks = [hunk(100 * (i + 1), 10) for i in range(6)]
+        budget = estimate_tokens(hunks[0] + hunks[1])
+
+        pieces = split_patch("".join(hunks), budget)
+
+        self.assertEqual(
+            pieces, [hunks[0] + hunks[1], hunks[2] + hunks[3], hunks[4] + hunks[5]]
+        )
+        self.assertTrue(all(estimate_tokens(piece) <= budget for piece in pieces))
+
+    def test_oversized_hunk_is_split_between_lines(self):
+        """Test that a single hunk over the budget repeats its header on every piece"""
+        patch = hunk(1, 200)
+
+        pieces = split_patch(patch, 100)
+
+        self.assertGreater(len(pieces), 1)
+        for piece in pieces:
+            self.assertTrue(piece.startswith("@@ -1,0 +1,200 @@\n"))
+            self.assertLessEqual(estimate_tokens(piece), 100)
+        self.assertEqual(
+            "".join(piece.partition("\n")[2] for piece in pieces),
+            patch.partition("\n")[2],
+        )
+
+    def test_header_stays_with_first_hunk(self):
+        """Test that lines before the first hunk are not sent on their own"""
+        header = "diff --git a/x.py b/x.py\n--- a/x.py\n+++ b/x.py\n"
+        hunks = [hunk(1, 10), hunk(100, 10)]
+        budget = estimate_tokens(header + hunks[0])
+
+        pieces = split_patch(header + "".join(hunks), budget)
+
+        self.assertEqual(pieces, [header + hunks[0], hunks[1]])
+
+
+class TestPlanBatches(unittest.TestCase):
+    def test_small_patches_share_requests(self):
+        """Test that many small patches are packed into few requests, in diff order"""
+        patches = [(f"file{i}.py", hunk(1, 2)) for i in range(10)]
+
+        batches = plan_batches(patches, budget=10_000, max_files=4)
+
+        self.assertEqual([len(b.chunks) for b in batches], [4, 4, 2])
+        self.assertEqual(
+            [c.filename for b in batches for c in b.chunks], [p[0] for p in patches]
+        )
+
+    def test_every_batch_fits_the_budget(self):
+        """Test that no request goes over the budget, whatever the patch sizes"""
+        patches = [("big.py", hunk(1, 400)), ("mid.py", hunk(1, 40))]
+        patches += [(f"small{i}.py", hunk(1, 3)) for i in range(20)]
+
+        batches = plan_batches(patches, budget=500, max_files=50)
+
+        for batch in batches:
+            self.assertLessEqual(estimate_tokens(batch.message()), 500)
+        big = [c for b in batches for c in b.chunks if c.filename == "big.py"]
+        self.assertEqual([c.part for c in big], list(range(1, big[0].parts + 1)))
+
+
+class TestBatch(unittest.TestCase):
+    def test_single_chunk_is_sent_raw(self):
+        """Test that a batch of one file keeps the plain patch and answer"""
+        batch = Batch([Chunk("a.py", "@@ -1 +1 @@\n")])
+
+        self.assertEqual(batch.message(), "@@ -1 +1 @@\n")
+        self.assertEqual(batch.split_response("fine"), {"a.py": "fine"})
+
+    def test_split_response_per_file(self):
+        """Test that each delimited section goes back to its file"""
+        batch = Batch(
+            [Chunk("a.py", "x"), Chunk("b.py", "y", 1, 2), Chunk("c.py", "z")]
+        )
+        self.assertIn(
+            "=== FILE: b.py (part 1/2) ===\ny\n=== END FILE: b.py (part 1/2) ===",
+            batch.message(),
+        )
+
+        response = (
+            "Here you go\n"
+            "=== FILE: a.py ===\nreview a\n=== END FILE: a.py ===\n"
+            "=== FILE: b.py (part 1/2) ===\nreview b\n"
+            "=== FILE: unknown.py ===\nignored\n=== END FILE: unknown.py ===\n"
+        )
+
+        self.assertEqual(
+            batch.split_response(response),
+            {"a.py": "review a", "b.py (part 1/2)": "review b", "c.py": None},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
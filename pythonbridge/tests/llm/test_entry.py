@@ -7,6 +7,41 @@ from pythonbridge.llm.entry import GraphBuilder
 
 
 class TestGraphBuilder(unittest.TestCase):
+    def setUp(self):
+        GraphBuilder.clear()
+
+    def tearDown(self):
+        GraphBuilder.clear()
+
+    @patch("pythonbridge.llm.entry.ReviewAgent")
+    @patch("pythonbridge.llm.entry.ValidateAgent")
+    def test_get_graph_is_memoized_per_context(
+        self, mock_validate_agent, mock_review_agent
+    ):
+        """Test that get_graph builds each context's graph only once"""
+        first = GraphBuilder().get_graph()
+        second = GraphBuilder().get_graph()
+        other = GraphBuilder().get_graph(review_context="other")
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(mock_review_agent.call_count, 2)
+
+    @patch("pythonbridge.llm.entry.prompt_version")
+    @patch("pythonbridge.llm.entry.ReviewAgent")
+    @patch("pythonbridge.llm.entry.ValidateAgent")
+    def test_get_graph_rebuilds_when_prompt_changes(
+        self, mock_validate_agent, mock_review_agent, mock_prompt_version
+    ):
+        """Test that a modified prompt file invalidates the memoized graph"""
+        mock_prompt_version.return_value = 1
+        first = GraphBuilder().get_graph()
+        mock_prompt_version.return_value = 2
+        second = GraphBuilder().get_graph()
+
+        self.assertIsNot(first, second)
+        self.assertEqual(len(GraphBuilder._graphs), 1)
+
     def test_build_graph_returns_compiled_graph(self):
         """Test that build_graph returns a CompiledStateGraph"""
         builder = GraphBuilder()
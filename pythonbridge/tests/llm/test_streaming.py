@@ -0,0 +1,53 @@
+import unittest
+
+from pythonbridge.llm.streaming import CoalescingSink, stream_sink, stream_to
+
+
+class TestStreamTo(unittest.TestCase):
+    def test_sink_only_set_inside_block(self):
+        """Test that the sink is visible inside the block and reset after it"""
+        received = []
+
+        self.assertIsNone(stream_sink())
+        with stream_to(received.append):
+            stream_sink()("text")
+        self.assertIsNone(stream_sink())
+        self.assertEqual(received, ["text"])
+
+
+class TestCoalescingSink(unittest.TestCase):
+    def test_small_deltas_are_grouped(self):
+        """Test that deltas are emitted once enough characters are buffered"""
+        events = []
+        sink = CoalescingSink(events.append, min_chars=5, interval=60)
+
+        for delta in ["ab", "cd", "ef", "g"]:
+            sink(delta)
+        sink.flush()
+
+        self.assertEqual(events, [{"delta": "abcdef"}, {"delta": "g"}])
+
+    def test_interval_flushes_slow_streams(self):
+        """Test that buffered text does not wait for min_chars forever"""
+        events = []
+        sink = CoalescingSink(events.append, min_chars=1000, interval=0)
+
+        sink("slow")
+
+        self.assertEqual(events, [{"delta": "slow"}])
+
+    def test_reset_drops_buffered_text(self):
+        """Test that a restarted completion discards what was not sent yet"""
+        events = []
+        sink = CoalescingSink(events.append, min_chars=1000, interval=60)
+
+        sink("stale")
+        sink(None)
+        sink("fresh")
+        sink.flush()
+
+        self.assertEqual(events, [{"reset": True}, {"delta": "fresh"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
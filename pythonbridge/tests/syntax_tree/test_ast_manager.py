@@ -0,0 +1,188 @@
+import io
+import json
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+from pythonbridge.ast.ast_manager import AST_manager, blob_sha
+
+TESTS_DIR = Path(__file__).parent.parent
+HELLO_PY = TESTS_DIR / "test_files" / "hello.py"
+HELLO_PATCH = (TESTS_DIR / "test_files" / "hello.patch").read_text()
+RELATIONSHIPS_PY = TESTS_DIR / "test_files" / "relationships.py"
+RELATIONSHIPS_JSON = TESTS_DIR / "test_files" / "relationships.json"
+
+SOURCE = b"""import os
+
+
+def first():
+    return os.getcwd()
+
+
+def second():
+    return first()
+
+
+class Greeter:
+    def greet(self):
+        print("hi")
+"""
+
+# Two hunks against SOURCE: first() changes and greet() gains a call
+PATCH = """diff --git a/greeter.py b/greeter.py
+--- a/greeter.py
++++ b/greeter.py
+@@ -3,3 +3,3 @@ import os
+ 
+ def first():
+-    return os.getcwd()
++    return os.path.abspath(os.getcwd())
+@@ -13,2 +13,3 @@ class Greeter:
+     def greet(self):
+         print("hi")
++        second()
+"""
+
+
+class TestParseCache(unittest.TestCase):
+    def test_create_ast_from_file(self):
+        """Test that create_ast parses a file from disk"""
+        manager = AST_manager()
+        manager.create_ast(str(HELLO_PY))
+
+        self.assertEqual(manager.current_file_name, "hello.py")
+        self.assertEqual(manager.tree.root_node.type, "module")
+        self.assertIn(str(HELLO_PY), manager.files)
+
+    def test_same_content_is_parsed_once(self):
+        """Test that files with identical content share one parse"""
+        manager = AST_manager()
+        manager.create_ast("a.py", SOURCE)
+
+        with patch.object(manager, "parser") as mock_parser:
+            manager.create_ast("b.py", SOURCE)
+            mock_parser.parse.assert_not_called()
+
+        self.assertIs(manager.files["a.py"].tree, manager.files["b.py"].tree)
+        self.assertEqual(manager.files["b.py"].sha, blob_sha(SOURCE))
+
+    def test_cache_is_bounded(self):
+        """Test that the oldest trees are evicted from the content cache"""
+        manager = AST_manager(max_cached_trees=2)
+        for i in range(3):
+            manager.create_ast(f"{i}.py", f"x = {i}\n".encode())
+
+        self.assertEqual(len(manager._trees), 2)
+        self.assertEqual(len(manager.files), 3)
+
+
+class TestIncrementalParse(unittest.TestCase):
+    def assertSameTree(self, manager, content):
+        fresh = AST_manager().parser.parse(content)
+        self.assertEqual(str(manager.tree.root_node), str(fresh.root_node))
+
+    def test_update_ast_matches_full_parse(self):
+        """Test that an incremental re-parse gives the same tree as parsing from scratch"""
+        manager = AST_manager()
+        manager.create_ast("greeter.py", SOURCE)
+
+        new_source = SOURCE.replace(b'print("hi")', b'print("hi")\n        first()')
+        manager.update_ast("greeter.py", new_source)
+
+        self.assertEqual(manager.files["greeter.py"].source, new_source)
+        self.assertSameTree(manager, new_source)
+
+    def test_apply_patch_edits_every_hunk(self):
+        """Test that a multi hunk patch is applied and parsed incrementally"""
+        manager = AST_manager()
+        manager.create_ast("greeter.py", SOURCE)
+
+        content = manager.apply_patch("greeter.py", PATCH)
+
+        expected = SOURCE.replace(
+            b"return os.getcwd()", b"return os.path.abspath(os.getcwd())"
+        ).replace(b'print("hi")\n', b'print("hi")\n        second()\n')
+        self.assertEqual(content, expected)
+        self.assertSameTree(manager, expected)
+
+    def test_apply_patch_to_new_file(self):
+        """Test that a patch adding a file (without trailing newline) applies to empty content"""
+        manager = AST_manager()
+        manager.create_ast("hello.py", b"")
+
+        content = manager.apply_patch("hello.py", HELLO_PATCH)
+
+        self.assertEqual(content, b"def hello():\n    print('world')")
+        self.assertSameTree(manager, content)
+
+    def test_apply_patch_rejects_mismatch(self):
+        """Test that a patch for other content is refused"""
+        manager = AST_manager()
+        manager.create_ast("greeter.py", SOURCE.replace(b"os.getcwd()", b"'.'"))
+
+        with self.assertRaises(ValueError):
+            manager.apply_patch("greeter.py", PATCH)
+
+
+class TestGetRelationships(unittest.TestCase):
+    def setUp(self):
+        self.manager = AST_manager()
+        self.manager.create_ast(str(RELATIONSHIPS_PY))
+
+    def test_matches_expected_output(self):
+        """Test every relationship kind, including nested classes and functions"""
+        relationships = self.manager.get_relationships()
+
+        # json round trip turns the location Points into lists
+        self.assertEqual(
+            json.loads(json.dumps(relationships)),
+            json.loads(RELATIONSHIPS_JSON.read_text()),
+        )
+        self.assertEqual(
+            list(relationships),
+            [
+                "imports",
+                "imports_from",
+                "class_def",
+                "function_def",
+                "method",
+                "call",
+                "instantiation",
+            ],
+        )
+
+    def test_calls_are_attributed_to_enclosing_functions(self):
+        """Test that calls belong to every standalone function whose body contains them"""
+        relationships = self.manager.get_relationships()
+        calls = {(r["caller"], r["callee"]) for r in relationships["call"]}
+
+        self.assertIn(("inner", "transform"), calls)
+        self.assertIn(("build", "transform"), calls)
+        # Local.method is inside build, but methods are never callers
+        self.assertIn(("build", "compute"), calls)
+        self.assertNotIn(("method", "compute"), calls)
+        # default arguments are not part of the function body
+        self.assertNotIn(("load", "Path"), calls)
+
+    def test_methods_belong_to_every_enclosing_class(self):
+        """Test that nested class methods are reported for the outer class too"""
+        relationships = self.manager.get_relationships()
+        methods = [(r["caller"], r["callee"]) for r in relationships["method"]]
+
+        self.assertIn(("Nested", "deep"), methods)
+        self.assertIn(("Config", "deep"), methods)
+        self.assertIn(("Helper", "run"), methods)
+        self.assertNotIn(("Helper", "deep"), methods)
+
+    def test_does_not_write_to_stdout(self):
+        """Test that extraction stays off stdout (the bridge protocol)"""
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.manager.get_relationships()
+
+        self.assertEqual(out.getvalue(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import unittest
+from pathlib import Path
+
+from pythonbridge.ast.code_graph import CodeGraph, Definition, call_name
+
+TESTS_DIR = Path(__file__).parent.parent
+RELATIONSHIPS_JSON = TESTS_DIR / "test_files" / "relationships.json"
+
+
+def calls(*pairs: tuple[str, str]) -> dict:
+    return {
+        "call": [
+            {"caller": caller, "callee": callee, "location": [[0, 0], [0, 1]]}
+            for caller, callee in pairs
+        ]
+    }
+
+
+class TestCodeGraph(unittest.TestCase):
+    def setUp(self):
+        self.graph = CodeGraph()
+        self.graph.add_file(
+            "relationships.py", json.loads(RELATIONSHIPS_JSON.read_text())
+        )
+
+    def test_call_name(self):
+        """Test that calls resolve to their last identifier"""
+        self.assertEqual(call_name("json.loads"), "loads")
+        self.assertEqual(call_name("reader(path).read"), "read")
+        self.assertEqual(call_name("transform"), "transform")
+        self.assertIsNone(call_name("f()"))
+
+    def test_callers_and_callees(self):
+        """Test direct lookups on the relationships of a real file"""
+        self.assertEqual(
+            set(self.graph.callees("load")), {"loads", "read", "reader", "Config"}
+        )
+        self.assertEqual(set(self.graph.callers("transform")), {"build", "inner"})
+        self.assertEqual(self.graph.callers("missing"), [])
+
+    def test_definitions(self):
+        """Test that plain and qualified names find their definitions"""
+        self.assertEqual(
+            self.graph.definitions("Helper.run"),
+            [
+                Definition(
+                    "relationships.py",
+                    "Helper.run",
+                    "method",
+                    51,
+                    52,
+                    "async def run(self, value)",
+                )
+            ],
+        )
+        self.assertEqual(
+            {d.name for d in self.graph.definitions("deep")},
+            {"Config.deep", "Nested.deep"},
+        )
+        self.assertEqual(self.graph.definitions("Config")[0].kind, "class")
+        self.assertEqual(
+            [
+                (d.name, d.start_line, d.end_line)
+                for d in self.graph.definitions("load")
+            ],
+            [("load", 6, 10)],
+        )
+        self.assertEqual(len(self.graph.file_definitions("relationships.py")), 16)
+
+    def test_reachable_and_dependents_respect_depth(self):
+        """Test transitive queries in both directions with a depth limit"""
+        graph = CodeGraph()
+        graph.add_file("a.py", calls(("a", "b.step"), ("b", "c"), ("c", "a")))
+        graph.add_file("d.py", calls(("step", "c"), ("d", "a")))
+
+        self.assertEqual(graph.reachable("a"), {"step": 1, "c": 2})
+        self.assertEqual(graph.reachable("d", max_depth=2), {"a": 1, "step": 2})
+        self.assertEqual(graph.dependents("c"), {"b": 1, "step": 1, "a": 2, "d": 3})
+        self.assertEqual(graph.dependents("c", max_depth=1), {"b": 1, "step": 1})
+
+    def test_replace_and_remove_file(self):
+        """Test that replacing or removing a file only drops what that file added"""
+        graph = CodeGraph()
+        graph.add_file("a.py", calls(("a", "shared"), ("a", "old")))
+        graph.add_file("b.py", calls(("a", "shared")))
+
+        graph.add_file("a.py", calls(("a", "new")))
+        self.assertEqual(set(graph.callees("a")), {"shared", "new"})
+        self.assertEqual(graph.callers("old"), [])
+
+        graph.remove_file("b.py")
+        self.assertEqual(graph.callees("a"), ["new"])
+        graph.update([], removed=lambda: ["a.py"])
+        self.assertEqual(graph.stats()["edges"], 0)
+        self.assertEqual(graph.files, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
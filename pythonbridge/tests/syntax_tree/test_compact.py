@@ -0,0 +1,127 @@
+import io
+import json
+import pickle
+import unittest
+import zipfile
+from pathlib import Path
+
+from pythonbridge.ast.ast_manager import AST_manager
+from pythonbridge.ast.code_graph import CodeGraph
+from pythonbridge.ast.compact import CompactRelationships
+
+TESTS_DIR = Path(__file__).parent.parent
+RELATIONSHIPS_PY = TESTS_DIR / "test_files" / "relationships.py"
+RELATIONSHIPS_JSON = TESTS_DIR / "test_files" / "relationships.json"
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def as_json(relationships) -> dict:
+    # tuples and lists compare equal once both went through JSON
+    return json.loads(json.dumps({kind: list(v) for kind, v in relationships.items()}))
+
+
+class TestCompactRelationships(unittest.TestCase):
+    def setUp(self):
+        self.manager = AST_manager()
+        self.manager.create_ast(str(RELATIONSHIPS_PY))
+        self.expected = json.loads(RELATIONSHIPS_JSON.read_text())
+
+    def test_view_matches_get_relationships(self):
+        """Test that the compact records read back as the dict output"""
+        compact = self.manager.get_compact_relationships()
+        view = compact.view("relationships.py")
+
+        self.assertEqual(as_json(view), self.expected)
+        self.assertEqual(set(view), set(self.expected))
+        self.assertEqual(view["instantiation"][-1], compact.record(len(compact) - 1))
+        self.assertEqual(
+            as_json({"call": view["call"][:2]}), {"call": self.expected["call"][:2]}
+        )
+
+    def test_from_dicts_and_code_graph(self):
+        """Test that dict input round trips and a view feeds a CodeGraph"""
+        compact = CompactRelationships.from_relationships("a.py", self.expected)
+        self.assertEqual(as_json(compact.view("a.py")), self.expected)
+
+        graph = CodeGraph()
+        graph.add_file("a.py", compact.view("a.py"))
+        expected = CodeGraph()
+        expected.add_file("a.py", self.expected)
+        self.assertEqual(graph.stats(), expected.stats())
+        self.assertEqual(
+            graph.definitions("Helper.run"), expected.definitions("Helper.run")
+        )
+
+    def test_replace_remove_and_extend(self):
+        """Test that files are replaced and removed without touching the others"""
+        compact = CompactRelationships()
+        self.manager.get_compact_relationships(compact, "a.py")
+        self.manager.get_compact_relationships(compact, "b.py")
+        size = len(compact)
+
+        call = {"caller": "f", "callee": "g", "location": [[0, 0], [0, 3]]}
+        compact.add("a.py", {"call": [call]})
+        self.assertEqual(compact.files, ["b.py", "a.py"])
+        self.assertEqual(len(compact), size // 2 + 1)
+        self.assertEqual(as_json(compact.view("b.py")), self.expected)
+
+        compact.remove("b.py")
+        self.assertEqual(as_json(compact.view("a.py"))["call"][0]["callee"], "g")
+
+        merged = CompactRelationships()
+        merged.extend(compact)
+        self.manager.get_compact_relationships(merged, "c.py")
+        self.assertEqual(merged.files, ["a.py", "c.py"])
+        self.assertEqual(as_json(merged.view("c.py")), self.expected)
+        with self.assertRaises(KeyError):
+            merged.view("b.py")
+
+    def test_pickle_sends_the_arrays(self):
+        """Test that a view pickles as the compact records of its file only"""
+        compact = CompactRelationships()
+        self.manager.get_compact_relationships(compact, "a.py")
+        self.manager.get_compact_relationships(compact, "b.py")
+
+        view = pickle.loads(pickle.dumps(compact.view("b.py")))
+        self.assertEqual(view.compact.files, ["b.py"])
+        self.assertEqual(as_json(view), self.expected)
+
+    def test_npz_round_trip(self):
+        """Test that save_npz writes .npy members that load_npz reads back"""
+        compact = CompactRelationships()
+        self.manager.get_compact_relationships(compact, "a.py")
+        self.manager.get_compact_relationships(compact, "b.py")
+        buffer = io.BytesIO()
+        compact.save_npz(buffer)
+
+        with zipfile.ZipFile(io.BytesIO(buffer.getvalue())) as archive:
+            self.assertIn("callee.npy", archive.namelist())
+            self.assertTrue(archive.read("kind.npy").startswith(b"\x93NUMPY"))
+
+        buffer.seek(0)
+        loaded = CompactRelationships.load_npz(buffer)
+        self.assertEqual(loaded.files, ["a.py", "b.py"])
+        self.assertEqual(as_json(loaded.view("b.py")), self.expected)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_shares_memory(self):
+        """Test that the numpy export and numpy.load see the same columns"""
+        compact = self.manager.get_compact_relationships()
+        arrays = compact.to_numpy()
+        self.assertEqual(
+            arrays["start_row"].tolist(), compact.columns["start_row"].tolist()
+        )
+
+        buffer = io.BytesIO()
+        compact.save_npz(buffer)
+        buffer.seek(0)
+        loaded = numpy.load(buffer)
+        self.assertEqual(loaded["callee"].tolist(), compact.columns["callee"].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+
+from pythonbridge.ast.ast_manager import AST_manager
+from pythonbridge.ast.index_store import INDEX_VERSION, MAGIC, IndexStore
+from pythonbridge.ast.indexer import FileState
+
+TESTS_DIR = Path(__file__).parent.parent
+RELATIONSHIPS_PY = TESTS_DIR / "test_files" / "relationships.py"
+RELATIONSHIPS_JSON = TESTS_DIR / "test_files" / "relationships.json"
+
+
+def as_json(relationships) -> dict:
+    return json.loads(json.dumps({kind: list(v) for kind, v in relationships.items()}))
+
+
+class TestIndexStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "owner" / "repo.idx"
+        self.expected = json.loads(RELATIONSHIPS_JSON.read_text())
+
+        self.manager = AST_manager()
+        self.manager.create_ast(str(RELATIONSHIPS_PY))
+        store = IndexStore(str(self.path))
+        for name in ("a.py", "b.py"):
+            self.manager.get_compact_relationships(store.relationships, name)
+            store.manifest.files[name] = FileState(1, 2, f"sha-{name}")
+        store.save()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_save_and_map(self):
+        """Test that a saved index is mapped back with its records and file states"""
+        store = IndexStore(str(self.path))
+
+        self.assertIsInstance(store.relationships.columns["callee"], memoryview)
+        self.assertEqual(store.relationships.files, ["a.py", "b.py"])
+        self.assertEqual(as_json(store.relationships.view("b.py")), self.expected)
+        self.assertEqual(store.manifest.files["a.py"], FileState(1, 2, "sha-a.py"))
+        self.assertFalse(self.path.with_name("repo.idx.tmp").exists())
+
+    def test_incremental_update(self):
+        """Test that changed and removed files are applied over a mapped index"""
+        store = IndexStore(str(self.path))
+        call = {"caller": "f", "callee": "g", "location": [[0, 0], [0, 3]]}
+        results = [("c.py", {"call": [call]}), ("a.py", {"call": [call, call]})]
+
+        passed = list(store.update(results, removed=lambda: ["b.py"]))
+        self.assertEqual([path for path, _ in passed], ["c.py", "a.py"])
+        store.save()
+
+        reloaded = IndexStore(str(self.path))
+        self.assertEqual(reloaded.relationships.files, ["c.py", "a.py"])
+        self.assertEqual(len(reloaded.relationships.view("a.py")["call"]), 2)
+        self.assertEqual(reloaded.relationships.view("c.py")["call"][0]["callee"], "g")
+
+    def test_unusable_files_are_ignored(self):
+        """Test that other versions, garbage, truncated and corrupted files give an empty index"""
+        data = self.path.read_bytes()
+        for content in (
+            MAGIC + struct.pack("<II", INDEX_VERSION + 1, 0) + data[16:],
+            b"not an index",
+            data[: len(data) // 2],
+            b"",
+            # the string section comes last, this is not UTF-8 any more
+            data[:-1] + b"\xff",
+        ):
+            self.path.write_bytes(content)
+            store = IndexStore(str(self.path))
+            self.assertEqual(len(store.relationships), 0)
+            self.assertEqual(store.manifest.files, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from pythonbridge.ast import indexer as indexer_module
+from pythonbridge.ast.indexer import Manifest, RepositoryIndexer, index_file
+
+TESTS_DIR = Path(__file__).parent.parent
+RELATIONSHIPS_PY = TESTS_DIR / "test_files" / "relationships.py"
+
+
+class TestRepositoryIndexer(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name) / "repo"
+        (self.root / "pkg").mkdir(parents=True)
+        (self.root / ".git").mkdir()
+        (self.root / "main.py").write_text(
+            "import os\n\n\ndef run():\n    os.getcwd()\n"
+        )
+        (self.root / "pkg" / "util.py").write_text(
+            "class Tool:\n    def use(self):\n        pass\n"
+        )
+        (self.root / "pkg" / "notes.txt").write_text("not python")
+        (self.root / ".git" / "hook.py").write_text("import sys\n")
+        self.manifest_path = str(Path(self._tmp.name) / "manifest.json")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def index(self, workers=1):
+        indexer = RepositoryIndexer(str(self.root), self.manifest_path, workers)
+        return indexer, dict(indexer.index())
+
+    def test_indexes_every_python_file(self):
+        """Test that every .py file outside skipped directories is indexed"""
+        _, results = self.index()
+
+        self.assertEqual(set(results), {"main.py", "pkg/util.py"})
+        self.assertEqual(results["main.py"]["call"][0]["callee"], "os.getcwd")
+        self.assertEqual(results["pkg/util.py"]["method"][0]["caller"], "Tool")
+
+    def test_process_pool_matches_single_process(self):
+        """Test that the pool streams back the same picklable results"""
+        _, serial = self.index(workers=1)
+        os.remove(self.manifest_path)
+        _, parallel = self.index(workers=2)
+
+        self.assertEqual(parallel, serial)
+        location = parallel["main.py"]["imports"][0]["location"]
+        self.assertEqual(location, ((0, 0), (0, 9)))
+
+    def test_unchanged_files_are_skipped(self):
+        """Test that a second run only yields files that changed"""
+        self.index()
+        (self.root / "main.py").write_text("import sys\n")
+        indexer, results = self.index()
+
+        self.assertEqual(set(results), {"main.py"})
+        self.assertEqual(set(indexer.manifest.files), {"main.py", "pkg/util.py"})
+
+    def test_touched_file_with_same_content_is_skipped(self):
+        """Test that a new mtime alone does not re-index a file"""
+        self.index()
+        util = self.root / "pkg" / "util.py"
+        stat = util.stat()
+        os.utime(util, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        indexer, results = self.index()
+
+        self.assertEqual(results, {})
+        self.assertEqual(
+            indexer.manifest.files["pkg/util.py"].mtime_ns, stat.st_mtime_ns + 10**9
+        )
+
+    def test_removed_files_are_reported(self):
+        """Test that deleted files are dropped from the manifest"""
+        self.index()
+        (self.root / "pkg" / "util.py").unlink()
+        indexer, _ = self.index()
+
+        self.assertEqual(indexer.removed, ["pkg/util.py"])
+        saved = json.loads(Path(self.manifest_path).read_text())
+        self.assertEqual(set(saved["files"]), {"main.py"})
+
+    def test_vanished_and_unreadable_files_are_removed(self):
+        """Test that files which can not be stat'ed or read are reported as removed"""
+        self.index()
+        paths = list(indexer_module.iter_python_files(self.root))
+        (self.root / "pkg" / "util.py").unlink()
+        (self.root / "main.py").write_text("def run():\n    pass\n")
+
+        def unreadable(path, rel_path, previous_sha=None):
+            return rel_path, None, None
+
+        # util.py vanishes after the walk and main.py can not be read any more
+        with (
+            patch.object(indexer_module, "iter_python_files", return_value=iter(paths)),
+            patch.object(indexer_module, "index_file", unreadable),
+        ):
+            indexer, results = self.index()
+
+        self.assertEqual(results, {})
+        self.assertEqual(sorted(indexer.removed), ["main.py", "pkg/util.py"])
+        saved = json.loads(Path(self.manifest_path).read_text())
+        self.assertEqual(saved["files"], {})
+
+    def test_corrupt_manifest_indexes_everything(self):
+        """Test that an unreadable manifest is treated as a first run"""
+        Path(self.manifest_path).write_text("{not json")
+
+        self.assertEqual(Manifest(self.manifest_path).files, {})
+        _, results = self.index()
+        self.assertEqual(set(results), {"main.py", "pkg/util.py"})
+
+
+class TestIndexFile(unittest.TestCase):
+    def test_result_is_picklable(self):
+        """Test that a result can be sent back from a worker process"""
+        result = index_file(str(RELATIONSHIPS_PY), "relationships.py")
+
+        self.assertEqual(pickle.loads(pickle.dumps(result)), result)
+
+    def test_same_content_returns_no_relationships(self):
+        """Test that the worker skips extraction when the hash did not change"""
+        _, state, _ = index_file(str(RELATIONSHIPS_PY), "relationships.py")
+        _, _, relationships = index_file(
+            str(RELATIONSHIPS_PY), "relationships.py", state.sha
+        )
+
+        self.assertIsNone(relationships)
+
+
+if __name__ == "__main__":
+    unittest.main()
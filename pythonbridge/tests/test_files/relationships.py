@@ -0,0 +1,57 @@
+import os
+import sys as system
+from pathlib import Path
+from collections import OrderedDict, defaultdict
+
+
+def load(path=Path("."), reader=open):
+    import json
+
+    data = json.loads(reader(path).read())
+    return Config(data)
+
+
+@decorate(register())
+def build(config):
+    def inner(value):
+        helper = Helper(value)
+        return helper.run(transform(value))
+
+    class Local:
+        def method(self):
+            return compute()
+
+    items = [inner(x) for x in config.items()]
+    return Result(items, key=lambda i: sorted(i))
+
+
+async def fetch(session):
+    response = await session.get(url())
+    return response.json()
+
+
+class Config:
+    DEFAULT = OrderedDict()
+
+    def __init__(self, data):
+        self.data = defaultdict(list, data)
+
+    @property
+    def name(self):
+        return self.data.get("name")
+
+    class Nested:
+        def deep(self):
+            def helper():
+                return os.getcwd()
+
+            return helper()
+
+
+class Helper(Config):
+    async def run(self, value):
+        system.exit(validate(value))
+
+
+if __name__ == "__main__":
+    main(load())
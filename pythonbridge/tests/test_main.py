@@ -1,7 +1,13 @@
+import os
+import subprocess
+import sys
 import unittest
+from pathlib import Path
 from unittest.mock import patch
 
-from pythonbridge.main import handle_msg
+from pythonbridge.main import handle_msg, respond
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
 
 
 class TestMain(unittest.TestCase):
@@ -58,7 +64,7 @@ class TestMain(unittest.TestCase):
         self.assertEqual(
             response.response, [{"filename": "test.py", "review": "Looks good"}]
         )
-        mock_review_pr.assert_called_once_with(msg["payload"])
+        mock_review_pr.assert_called_once_with(msg["payload"], emit=None)
 
     @patch("pythonbridge.main.review_pr")
     def test_handle_msg_main_exception(self, mock_review_pr):
@@ -78,6 +84,56 @@ class TestMain(unittest.TestCase):
         self.assertEqual(response.status, "error")
         self.assertEqual(response.error, "Something went wrong")
 
+    def test_handle_msg_warmup(self):
+        """Test that warmup imports the modules of the requested message types"""
+        response = handle_msg({"type": "warmup", "types": ["comment", "unknown"]})
+
+        self.assertEqual(response.status, "ok")
+        self.assertEqual(response.response["modules"], ["pythonbridge.gh.client"])
+        self.assertIn("pythonbridge.gh.client", sys.modules)
+
+    def test_handle_msg_metrics(self):
+        """Test that metrics returns the timings of the messages handled so far"""
+        respond({"type": "hello", "_id": 1})
+        response = handle_msg({"type": "metrics"})
+
+        self.assertEqual(response.status, "ok")
+        self.assertIn("counters", response.response)
+        self.assertIn("histograms", response.response)
+
+    def test_respond_tags_id(self):
+        """Test that the response dict carries the message's correlation ID"""
+        self.assertEqual(
+            respond({"type": "hello", "count": 3, "_id": 9}),
+            {
+                "status": "ok",
+                "response": "hello from python 3",
+                "error": None,
+                "_id": 9,
+            },
+        )
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_skips_heavy_modules(self):
+        """Test that starting the bridge does not import langgraph, groq or PyGithub"""
+        heavy = ["langgraph", "groq", "github", "pydantic", "pythonbridge.core.review"]
+        code = (
+            "import sys, pythonbridge.main; "
+            f"print([m for m in {heavy!r} if m in sys.modules])"
+        )
+        env = {**os.environ, "PYTHONPATH": str(PROJECT_ROOT)}
+
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        self.assertEqual(result.stdout.strip(), "[]")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -13,6 +13,20 @@ defmodule Sniper.PythonBridgeTest do
       assert result["status"] == "ok"
     end
 
+    test "stream_message returns the final response" do
+      test_pid = self()
+
+      result =
+        Sniper.PythonBridge.stream_message(%{type: "hello", count: 7}, fn partial ->
+          send(test_pid, {:partial, partial})
+        end)
+
+      assert result["status"] == "ok"
+      assert result["response"] == "hello from python 7"
+      # hello answers in one go, nothing partial is sent
+      refute_received {:partial, _}
+    end
+
     test "handles multiple sequential messages" do
       result1 = Sniper.PythonBridge.send_message(%{type: "hello", count: 1})
       result2 = Sniper.PythonBridge.send_message(%{type: "hello", count: 2})